@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, InlineQuery, Message, TelegramObject
+
+import db
+from db import DATE_FMT, User
+
+
+# === 🔐 Користувачі, ролі та офіси ===
+# Таблиця users невелика й читається на кожен апдейт, тому вся вона живе в пам'яті;
+# зміни йдуть через Members — спершу в базу, потім у кеш.
+ROLE_LABELS = {"owner": "👑 власник", "admin": "🛠️ адміністратор"}
+
+
+class Members:
+    def __init__(self):
+        self._users: dict[int, User] = {}
+
+    async def load(self):
+        self._users = {u.user_id: u for u in await db.list_users()}
+
+    def get(self, user_id: int) -> User | None:
+        return self._users.get(user_id)
+
+    def of_tenant(self, tenant_id: int) -> list[User]:
+        return sorted((u for u in self._users.values() if u.tenant_id == tenant_id), key=lambda u: u.user_id)
+
+    async def save(self, user: User):
+        await db.save_user(user, datetime.now().strftime(DATE_FMT))
+        old = self._users.get(user.user_id)
+        self._users[user.user_id] = user._replace(name=user.name or (old.name if old else None))
+
+    async def remove(self, user_id: int) -> bool:
+        removed = await db.delete_user(user_id)
+        self._users.pop(user_id, None)
+        return removed
+
+
+members = Members()
+
+
+def is_owner(user: User | None) -> bool:
+    return user is not None and user.role == "owner"
+
+
+class AccessMiddleware(BaseMiddleware):
+    """Пропускає лише відомих користувачів і передає обробнику user (db.User)."""
+
+    async def __call__(self, handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: dict[str, Any]) -> Any:
+        user = members.get(event.from_user.id) if event.from_user else None
+        if user is None:
+            if isinstance(event, CallbackQuery):
+                return await event.answer("⛔ Немає доступу", show_alert=True)
+            if isinstance(event, InlineQuery):
+                return await event.answer([], cache_time=60, is_personal=True)
+            if isinstance(event, Message):
+                return await event.answer("⛔ У вас немає доступу.")
+            return None
+        data["user"] = user
+        return await handler(event, data)
@@ -0,0 +1,310 @@
+import asyncio
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import NamedTuple
+
+import db
+from config import (
+    BACKUP_DIR, BACKUP_INTERVAL, SNAPSHOT_INTERVAL, SNAPSHOT_KEEP_DAILY, SNAPSHOT_KEEP_WEEKLY,
+    ARCHIVE_PATH, ARCHIVE_AFTER_DAYS,
+)
+
+
+# === 💾 Резервні копії бази ===
+# Онлайн-копія — backup API SQLite з окремого з'єднання для читання, по BACKUP_PAGES
+# сторінок за крок з паузою між кроками: у WAL-режимі бот пише далі, не чекаючи копії.
+# Запис з іншого з'єднання посеред копії змушує SQLite почати її спочатку; якщо це
+# трапляється надто часто, копія робиться одним кроком (у WAL це лише читання).
+# Знімок — VACUUM INTO (компактна копія без вільних сторінок), перевірений quick_check
+# і стиснутий gzip; старі знімки прибирає ротація «N днів + M тижнів».
+# Архівний файл (партії, перенесені archive_batches) копіюється і знімається разом
+# з основною базою з тією ж міткою часу — інакше після ротації він лишився б без копії.
+BACKUP_PAGES = 256        # ~1 МБ за крок при сторінці 4 КБ
+BACKUP_STEP_SLEEP = 0.05  # с між кроками
+MAX_RESTARTS = 3
+ONLINE_NAME = "cartridges-online.db"
+ARCHIVE_ONLINE_NAME = "archive-online.db"
+SNAPSHOT_PREFIX = "cartridges-"
+ARCHIVE_PREFIX = "archive-"
+SNAPSHOT_SUFFIX = ".db.gz"
+SNAPSHOT_STAMP = "%Y%m%d-%H%M%S"
+ARCHIVE_CHUNK = 50        # партій за транзакцію — потік БД не зайнятий надовго
+
+
+class _Restarted(Exception):
+    pass
+
+
+def online_backup(src_path: str, dest_path: str) -> int:
+    """Блокуюча онлайн-копія src_path → dest_path (через тимчасовий файл); повертає кількість сторінок."""
+    tmp = dest_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    src = db.connect(src_path)
+    src.execute("PRAGMA query_only=ON")
+    dest = sqlite3.connect(tmp)
+    try:
+        state = {"remaining": None, "restarts": 0}
+
+        def progress(status, remaining, total):
+            if state["remaining"] is not None and remaining > state["remaining"]:
+                state["restarts"] += 1
+                if state["restarts"] > MAX_RESTARTS:
+                    raise _Restarted
+            state["remaining"] = remaining
+            # sleep= у backup() спрацьовує лише на BUSY/LOCKED — паузу між кроками робимо тут
+            if remaining:
+                time.sleep(BACKUP_STEP_SLEEP)
+
+        try:
+            src.backup(dest, pages=BACKUP_PAGES, progress=progress)
+        except _Restarted:
+            print(f"💾 База змінювалася під час копії понад {MAX_RESTARTS} рази — копіюємо одним кроком")
+            src.backup(dest)
+        pages = dest.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dest.close()
+        src.close()
+    os.replace(tmp, dest_path)
+    return pages
+
+
+def snapshot(src_path: str, directory: str, now: datetime, prefix: str = SNAPSHOT_PREFIX) -> str:
+    """Блокуючий стиснений знімок: VACUUM INTO, quick_check, gzip. Повертає шлях до .db.gz."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{prefix}{now.strftime(SNAPSHOT_STAMP)}{SNAPSHOT_SUFFIX}")
+    raw = path[:-len(".gz")] + ".tmp"
+    for leftover in (raw, path + ".tmp"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    conn = db.connect(src_path)
+    try:
+        conn.execute("VACUUM INTO ?", (raw,))
+    finally:
+        conn.close()
+    try:
+        check = sqlite3.connect(raw)
+        try:
+            result = check.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            check.close()
+        if result != "ok":
+            raise RuntimeError(f"знімок не пройшов quick_check: {result}")
+        with open(raw, "rb") as f, gzip.open(path + ".tmp", "wb", compresslevel=6) as out:
+            shutil.copyfileobj(f, out, 1024 * 1024)
+        os.replace(path + ".tmp", path)
+    finally:
+        if os.path.exists(raw):
+            os.remove(raw)
+    return path
+
+
+# === 🗂️ Ротація знімків ===
+class Snapshot(NamedTuple):
+    path: str
+    taken_at: datetime
+    size: int
+
+
+def list_snapshots(directory: str, prefix: str = SNAPSHOT_PREFIX) -> list[Snapshot]:
+    """Знімки каталогу з префіксом prefix, від найновішого."""
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for name in os.listdir(directory):
+        if not (name.startswith(prefix) and name.endswith(SNAPSHOT_SUFFIX)):
+            continue
+        try:
+            taken_at = datetime.strptime(name[len(prefix):-len(SNAPSHOT_SUFFIX)], SNAPSHOT_STAMP)
+        except ValueError:
+            continue
+        path = os.path.join(directory, name)
+        found.append(Snapshot(path, taken_at, os.path.getsize(path)))
+    return sorted(found, key=lambda s: s.taken_at, reverse=True)
+
+
+def _newest_per(snapshots: list[Snapshot], period, limit: int) -> set[str]:
+    keep, seen = set(), set()
+    for s in snapshots:
+        key = period(s.taken_at)
+        if key in seen:
+            continue
+        if len(seen) == limit:
+            break
+        seen.add(key)
+        keep.add(s.path)
+    return keep
+
+
+def prune_snapshots(directory: str, daily: int = SNAPSHOT_KEEP_DAILY, weekly: int = SNAPSHOT_KEEP_WEEKLY,
+                    prefix: str = SNAPSHOT_PREFIX) -> list[str]:
+    """Лишає найновіший знімок кожного з daily останніх днів і кожного з weekly тижнів; повертає видалені."""
+    snapshots = list_snapshots(directory, prefix)
+    if not snapshots:
+        return []
+    keep = {snapshots[0].path}
+    keep |= _newest_per(snapshots, lambda ts: ts.date(), daily)
+    keep |= _newest_per(snapshots, lambda ts: ts.isocalendar()[:2], weekly)
+    removed = []
+    for s in snapshots:
+        if s.path not in keep:
+            os.remove(s.path)
+            removed.append(s.path)
+    return removed
+
+
+def archive_counts(path: str) -> tuple[int, int]:
+    """(партій, картриджів) в архівному файлі; (0, 0), якщо архіву ще немає."""
+    if not os.path.exists(path):
+        return 0, 0
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute(
+            "SELECT (SELECT COUNT(*) FROM batches), (SELECT COUNT(*) FROM cartridges)"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return 0, 0
+    finally:
+        conn.close()
+
+
+# === ⏲️ Фоновий воркер ===
+class BackupWorker:
+    """Онлайн-копія кожні backup_interval с, знімок + ротація + архів кожні snapshot_interval с.
+
+    Розклад рахується від часу останньої копії на диску, тож перезапуск бота
+    не зсуває і не пропускає їх. Важкі операції не перетинаються.
+    on_archive({офіс: (партій, картриджів)}) викликається, якщо щось перенесено в архів.
+    """
+
+    def __init__(self, directory: str = BACKUP_DIR, backup_interval: float = BACKUP_INTERVAL,
+                 snapshot_interval: float = SNAPSHOT_INTERVAL, archive_path: str = ARCHIVE_PATH,
+                 archive_after_days: int = ARCHIVE_AFTER_DAYS, on_archive=None):
+        self.directory = directory
+        self.backup_interval = backup_interval
+        self.snapshot_interval = snapshot_interval
+        self.archive_path = archive_path
+        self.archive_after_days = archive_after_days
+        self.on_archive = on_archive
+        self.last_error: str | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._lock = asyncio.Lock()
+
+    @property
+    def online_path(self) -> str:
+        return os.path.join(self.directory, ONLINE_NAME)
+
+    @property
+    def archive_online_path(self) -> str:
+        return os.path.join(self.directory, ARCHIVE_ONLINE_NAME)
+
+    def _has_archive(self) -> bool:
+        return os.path.exists(self.archive_path)
+
+    def start(self):
+        if self._tasks:
+            return
+        if self.backup_interval > 0:
+            self._tasks.append(asyncio.create_task(self._every(self.backup_interval, self._online_age, self.backup)))
+        if self.snapshot_interval > 0:
+            self._tasks.append(asyncio.create_task(
+                self._every(self.snapshot_interval, self._snapshot_age, self.scheduled_snapshot)
+            ))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def _online_age(self) -> float | None:
+        if not os.path.exists(self.online_path):
+            return None
+        return time.time() - os.path.getmtime(self.online_path)
+
+    def _snapshot_age(self) -> float | None:
+        snapshots = list_snapshots(self.directory)
+        return (datetime.now() - snapshots[0].taken_at).total_seconds() if snapshots else None
+
+    async def _every(self, interval: float, age, job):
+        while True:
+            elapsed = age()
+            if elapsed is not None and elapsed < interval:
+                await asyncio.sleep(interval - elapsed)
+            try:
+                await job()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ Помилка резервного копіювання ({job.__name__}):", e)
+                # не повторюємо відразу — наступна спроба через інтервал
+                await asyncio.sleep(interval)
+
+    async def backup(self) -> str:
+        """Онлайн-копія бази (і архіву, якщо він є) зараз."""
+        os.makedirs(self.directory, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            started = time.perf_counter()
+            pages = await loop.run_in_executor(None, online_backup, db.database.path, self.online_path)
+            if self._has_archive():
+                pages += await loop.run_in_executor(None, online_backup, self.archive_path, self.archive_online_path)
+        print(f"💾 Онлайн-копія: {pages} сторінок за {time.perf_counter() - started:.1f} с")
+        return self.online_path
+
+    async def snapshot(self) -> Snapshot:
+        """Стиснений знімок бази (і архіву, якщо він є) зараз — без ротації й архівування."""
+        loop = asyncio.get_running_loop()
+        now = datetime.now()
+        async with self._lock:
+            path = await loop.run_in_executor(None, snapshot, db.database.path, self.directory, now)
+            if self._has_archive():
+                await loop.run_in_executor(None, snapshot, self.archive_path, self.directory, now, ARCHIVE_PREFIX)
+        print(f"🗜️ Знімок бази: {os.path.basename(path)} ({os.path.getsize(path) / 1024:.0f} КБ)")
+        return list_snapshots(self.directory)[0]
+
+    async def scheduled_snapshot(self):
+        await self.snapshot()
+        loop = asyncio.get_running_loop()
+        removed = await loop.run_in_executor(None, prune_snapshots, self.directory)
+        removed += await loop.run_in_executor(None, partial(prune_snapshots, self.directory, prefix=ARCHIVE_PREFIX))
+        if removed:
+            print(f"🧹 Видалено старих знімків: {len(removed)}")
+        # архів — лише після свіжого знімка, щоб стан до перенесення лишився в копії
+        if self.archive_after_days > 0:
+            await self.archive()
+
+    async def archive(self) -> dict[int, tuple[int, int]]:
+        """Переносить давно закриті партії в архівний файл порціями по ARCHIVE_CHUNK."""
+        cutoff = (date.today() - timedelta(days=self.archive_after_days)).strftime(db.DATE_FMT)
+        total: dict[int, tuple[int, int]] = {}
+        async with self._lock:
+            while moved := await db.archive_batches(self.archive_path, cutoff, datetime.now().strftime(db.DATE_FMT),
+                                                    ARCHIVE_CHUNK):
+                for tenant_id, (batches, cartridges) in moved.items():
+                    b, c = total.get(tenant_id, (0, 0))
+                    total[tenant_id] = (b + batches, c + cartridges)
+        if total:
+            batches = sum(b for b, _ in total.values())
+            cartridges = sum(c for _, c in total.values())
+            print(f"📦 В архів перенесено партій: {batches}, картриджів: {cartridges}")
+            if self.on_archive:
+                self.on_archive(total)
+        return total
+
+    def status(self) -> dict:
+        snapshots = list_snapshots(self.directory)
+        online_age = self._online_age()
+        return {
+            "last_backup": datetime.now() - timedelta(seconds=online_age) if online_age is not None else None,
+            "snapshots": snapshots,
+            "archive_snapshots": list_snapshots(self.directory, ARCHIVE_PREFIX),
+            "last_error": self.last_error,
+        }
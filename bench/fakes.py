@@ -0,0 +1,163 @@
+"""Локальні замінники Bot API та gspread для бенчмарків."""
+import itertools
+import re
+from collections import Counter
+from datetime import datetime
+
+from aiogram import types
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import EditMessageText, GetMe, SendMessage
+
+import gsheets
+
+
+# === 🤖 Bot API ===
+CHAT = types.Chat(id=1, type="private")
+
+
+class FakeTelegramSession(BaseSession):
+    """Відповідає на всі методи Bot API без мережі й рахує виклики за типом."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: Counter = Counter()
+        self._ids = itertools.count(1000)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if isinstance(method, GetMe):
+            return types.User(id=bot.id, is_bot=True, first_name="Bench", username="bench_bot")
+        if isinstance(method, (SendMessage, EditMessageText)):
+            return types.Message(message_id=next(self._ids), date=datetime.now(), chat=CHAT, text=method.text)
+        if hasattr(method, "document"):
+            return types.Message(message_id=next(self._ids), date=datetime.now(), chat=CHAT)
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class Updates:
+    """Будує апдейти від імені адміністратора."""
+
+    def __init__(self, user_id: int):
+        self.user = types.User(id=user_id, is_bot=False, first_name="Admin")
+        self._ids = itertools.count(1)
+
+    def message(self, text: str) -> types.Update:
+        return types.Update(update_id=next(self._ids), message=types.Message(
+            message_id=next(self._ids), date=datetime.now(), chat=CHAT, from_user=self.user, text=text,
+        ))
+
+    def callback(self, data: str, text: str = "…") -> types.Update:
+        message = types.Message(message_id=1, date=datetime.now(), chat=CHAT, from_user=self.user, text=text)
+        return types.Update(update_id=next(self._ids), callback_query=types.CallbackQuery(
+            id=str(next(self._ids)), from_user=self.user, chat_instance="bench", message=message, data=data,
+        ))
+
+
+# === 📗 gspread ===
+class FakeSpreadsheet:
+    def __init__(self, ws: "FakeWorksheet"):
+        self.ws = ws
+
+    def batch_update(self, body: dict):
+        self.ws.calls["spreadsheet.batch_update"] += 1
+        for req in body["requests"]:
+            rng = req["deleteDimension"]["range"]
+            del self.ws.rows[rng["startIndex"]:rng["endIndex"]]
+
+
+def _cells(values) -> list[str]:
+    # get_all_values повертає відформатовані рядки; значення пишуться RAW
+    return ["" if v is None else str(v) for v in values]
+
+
+class FakeWorksheet:
+    """Аркуш у пам'яті; виклики й записані клітинки рахуються.
+
+    Рядок — або список клітинок (записаний синхронізацією), або лише ID-рядок:
+    вміст такого рядка збігається з базою, і load(ids) → {id: рядок бази} читає його
+    тільки для get_all_values. Так аркуш на 1M картриджів займає ~60 МБ (лише ID).
+    get_all_values і повна перебудова, як і справжні, оперують усіма клітинками
+    (~1 ГБ при 1M рядків); інкрементна синхронізація, яку міряє бенчмарк, їх не викликає.
+    """
+
+    id = 0
+    title = gsheets.WORKSHEET_TITLE
+
+    def __init__(self, rows: list[list[str] | str] | None = None, load=None):
+        self.rows = [list(gsheets.HEADERS)] + (rows or [])
+        self.load = load
+        self.row_count = max(len(self.rows), 2000)
+        self.calls: Counter = Counter()
+        self.cells_written = 0
+        self.spreadsheet = FakeSpreadsheet(self)
+
+    def col_values(self, col: int) -> list[str]:
+        self.calls["col_values"] += 1
+        rows = self._materialized() if col > 1 else self.rows
+        return [r if isinstance(r, str) else r[col - 1] if len(r) >= col else "" for r in rows]
+
+    def clear(self):
+        self.calls["clear"] += 1
+        self.rows = []
+
+    def append_rows(self, rows, **kwargs):
+        self.calls["append_rows"] += 1
+        self.rows += [_cells(r) for r in rows]
+        self.cells_written += sum(len(r) for r in rows)
+
+    def batch_update(self, updates, **kwargs):
+        self.calls["batch_update"] += 1
+        for u in updates:
+            row = int(re.match(r"A(\d+)", u["range"]).group(1))
+            if len(self.rows) < row:
+                self.rows += [[] for _ in range(row - len(self.rows))]
+            self.rows[row - 1] = _cells(u["values"][0])
+            self.cells_written += len(u["values"][0])
+
+    def add_rows(self, n: int):
+        self.calls["add_rows"] += 1
+        self.row_count += n
+
+    def format(self, *args, **kwargs):
+        self.calls["format"] += 1
+
+    def freeze(self, *args, **kwargs):
+        self.calls["freeze"] += 1
+
+    def _materialized(self) -> list[list[str]]:
+        lazy = [int(r) for r in self.rows if isinstance(r, str)]
+        loaded = self.load(lazy) if lazy else {}
+        # картридж, уже видалений з бази, у неоновленому аркуші лишається рядком з одним ID
+        return [
+            (_cells(gsheets._sheet_row(loaded[int(r)])) if int(r) in loaded else [r]) if isinstance(r, str)
+            else list(r)
+            for r in self.rows
+        ]
+
+    def get_all_values(self):
+        self.calls["get_all_values"] += 1
+        return self._materialized()
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+def fake_worksheet_from_db(conn) -> FakeWorksheet:
+    """Аркуш у стані «вже синхронізовано»: ID у порядку карти sheet_rows, вміст — з бази на вимогу."""
+    ids = [str(cid) for cid, in conn.execute("SELECT cartridge_id FROM sheet_rows ORDER BY row")]
+    return FakeWorksheet(ids, load=lambda lazy: gsheets.fetch_rows.sync(gsheets.DEFAULT_TENANT, lazy))
+
+
+def install_fake_sheets(ws: FakeWorksheet) -> gsheets.SheetsClient:
+    """Клієнт першого офісу, що пише у фейковий аркуш."""
+    client = gsheets.SheetsClient("bench")
+    client.key_data = "bench"
+    client.worksheet = lambda: (ws, False)
+    return client
@@ -0,0 +1,109 @@
+"""Синтетична база для бенчмарків.
+
+    python -m bench.generate --db /tmp/bench.db --cartridges 1000000 --batches 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from db import DATE_FMT, STATUS_MAP  # noqa: E402
+
+
+# === 🏭 Генератор даних ===
+DEPARTMENTS = [
+    f"{name} {n}" if n else name
+    for name in ("Бухгалтерія", "Кадри", "ІТ відділ", "Юридичний", "Склад", "Приймальня", "Канцелярія",
+                 "Фінансовий", "Постачання", "Охорона праці", "Архів", "Кабінет директора")
+    for n in range(0, 25)
+]
+CHUNK = 20_000
+
+
+def _cartridge(rng: random.Random, batch_id: int, created: date) -> tuple:
+    received = created + timedelta(days=rng.randint(0, 10))
+    # кожен картридж доходить до випадкового статусу, дати йдуть одна за одною
+    stage = rng.choices(range(4), weights=(3, 2, 2, 3))[0]
+    dates = [received]
+    for _ in range(stage):
+        dates.append(dates[-1] + timedelta(days=rng.randint(1, 20)))
+    dates += [None] * (4 - len(dates))
+    status = list(STATUS_MAP.values())[stage][0]
+    d_recv, d_sent, d_ret, d_giv = (d.strftime(DATE_FMT) if d else None for d in dates)
+    return d_recv, rng.choice(DEPARTMENTS), status, d_sent, d_ret, d_giv, batch_id
+
+
+def generate(path: str, cartridges: int, batches: int, synced: bool = True, seed: int = 1):
+    """Заповнює базу: batches партій (остання активна) і cartridges картриджів між ними.
+
+    synced — позначити все як уже вивантажене в аркуш (порожній outbox, заповнена карта рядків),
+    як у робочої бази, що давно синхронізується.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    conn = db.connect(path)
+    db.migrate(conn)
+
+    first_day = date.today() - timedelta(days=3 * 365)
+    step = max(1, 3 * 365 // max(batches, 1))
+    with conn:
+        conn.execute("UPDATE batches SET status='closed'")
+        cur = conn.executemany(
+            "INSERT INTO batches (created_at, status) VALUES (?, 'closed')",
+            (((first_day + timedelta(days=i * step)).strftime(DATE_FMT),) for i in range(batches)),
+        )
+        ids = [r for r, in conn.execute("SELECT id FROM batches ORDER BY id DESC LIMIT ?", (batches,))][::-1]
+        conn.execute("UPDATE batches SET status='active' WHERE id=?", (ids[-1],))
+    created = dict(conn.execute("SELECT id, created_at FROM batches").fetchall())
+
+    done = 0
+    while done < cartridges:
+        n = min(CHUNK, cartridges - done)
+        rows = []
+        for _ in range(n):
+            bid = rng.choice(ids)
+            created_at = date.fromisoformat(created[bid])
+            rows.append(_cartridge(rng, bid, created_at))
+        with conn:
+            conn.executemany("""
+                INSERT INTO cartridges (date_received, department, status, date_sent, date_returned, date_given, batch_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+        done += n
+        print(f"\r🏭 Картриджів: {done}/{cartridges}", end="", flush=True)
+    print()
+
+    if synced:
+        with conn:
+            conn.execute("DELETE FROM sheet_dirty")
+            conn.execute("DELETE FROM sheet_rows")
+            conn.execute("""
+                INSERT INTO sheet_rows (cartridge_id, row)
+                SELECT id, ROW_NUMBER() OVER (ORDER BY batch_id, id) + 1 FROM cartridges
+            """)
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    print(f"✅ {path}: {cartridges} картриджів у {batches} партіях за {time.perf_counter() - started:.1f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетична база картриджів")
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--cartridges", type=int, default=100_000)
+    parser.add_argument("--batches", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--unsynced", action="store_true", help="лишити всі рядки в outbox для аркуша")
+    args = parser.parse_args()
+    if os.path.exists(args.db):
+        sys.exit(f"❌ {args.db} вже існує")
+    generate(args.db, args.cartridges, args.batches, synced=not args.unsynced, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
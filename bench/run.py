@@ -0,0 +1,204 @@
+"""Бенчмарк обробників: повтор потоків апдейтів через dp.feed_update на синтетичній базі.
+
+    python -m bench.run --db /tmp/bench.db --cartridges 100000 --batches 2000 --iterations 300
+
+Для кожного обробника — p50/p99 затримки, SQL-запитів і викликів Bot API на апдейт,
+а для змін — викликів Google Sheets на одну зміну (фейковий gspread).
+
+Вихідні виклики йдуть через той самий планувальник, що й у боті (злиття редагувань,
+відповіді на callback), але без лімітів Telegram — інакше затримки вимірювали б
+секунди очікування черги. --throttle вмикає ліміти як у продакшені.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+from typing import NamedTuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADMIN = 1
+os.environ.setdefault("TOKEN", "42:BENCH")
+os.environ["ADMIN_ID"] = str(ADMIN)
+os.environ.setdefault("SHEETS_PULL_INTERVAL", "0")
+
+from aiogram.fsm.storage.base import StorageKey  # noqa: E402
+
+import db  # noqa: E402
+import gsheets  # noqa: E402
+from access import members  # noqa: E402
+from throttle import RateLimit  # noqa: E402
+from bench.fakes import FakeTelegramSession, Updates, fake_worksheet_from_db, install_fake_sheets  # noqa: E402
+from bench.generate import DEPARTMENTS, generate  # noqa: E402
+
+
+# === 📏 Лічильники ===
+class SqlCounter:
+    """Рахує інструкції через trace callback з'єднання бота (без рядків тригерів)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, sql: str):
+        if not sql.startswith("--"):
+            self.count += 1
+
+
+class Result(NamedTuple):
+    name: str
+    latencies: list[float]
+    queries: int
+    api_calls: int
+    sheets_calls: int | None
+    mutations: int
+
+
+def quiet_sync(client: gsheets.SheetsClient):
+    # звіт «✅ Дані синхронізовано» на кожну зміну лише засмічує вивід
+    with contextlib.redirect_stdout(io.StringIO()):
+        gsheets.sync_to_sheets(client)
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# === 🎬 Сценарії ===
+class Bench:
+    def __init__(self, iterations: int, seed: int = 1, throttle: bool = False):
+        import cartridges_bot  # імпорт після налаштування оточення й шляху до бази
+
+        self.bot_module = cartridges_bot
+        self.bot = cartridges_bot.bot
+        self.dp = cartridges_bot.dp
+        self.session = self.bot.session = FakeTelegramSession()
+        # нова сесія не має middleware бота — реєструємо той самий планувальник
+        outgoing = cartridges_bot.outgoing
+        self.session.middleware(outgoing)
+        if not throttle:
+            outgoing.global_limit = RateLimit(1e6, 1_000_000)
+            outgoing.chat_rate = outgoing.group_rate = 1e6
+        self.updates = Updates(ADMIN)
+        self.iterations = iterations
+        self.rng = random.Random(seed)
+        self.sql = SqlCounter()
+        db.database.call_sync(lambda conn: conn.set_trace_callback(self.sql))
+        self.ws = db.database.call_sync(fake_worksheet_from_db)
+        self.sheets = install_fake_sheets(self.ws)
+        self.batch_ids = [r for r, in db.fetchall.sync("SELECT id FROM batches")]
+        self.max_cid = db.fetchone.sync("SELECT MAX(id) FROM cartridges")[0] or 0
+        self.fsm_key = StorageKey(bot_id=self.bot.id, chat_id=ADMIN, user_id=ADMIN)
+
+    async def _feed(self, update, mutation: bool, stats: dict):
+        sql, api = self.sql.count, sum(self.session.calls.values())
+        started = time.perf_counter()
+        await self.dp.feed_update(self.bot, update)
+        stats["latencies"].append(time.perf_counter() - started)
+        stats["queries"] += self.sql.count - sql
+        stats["api"] += sum(self.session.calls.values()) - api
+        if mutation:
+            # те, що зробив би воркер синхронізації після дебаунсу, — по одній зміні
+            sheets = self.ws.total_calls
+            await asyncio.get_running_loop().run_in_executor(None, quiet_sync, self.sheets)
+            stats["sheets"] += self.ws.total_calls - sheets
+
+    async def scenario(self, name: str, make_update, mutation: bool = False, prepare=None) -> Result:
+        stats = {"latencies": [], "queries": 0, "api": 0, "sheets": 0}
+        for _ in range(self.iterations):
+            if prepare:
+                await prepare()
+            await self._feed(make_update(), mutation, stats)
+        return Result(name, stats["latencies"], stats["queries"], stats["api"],
+                      stats["sheets"] if mutation else None, self.iterations)
+
+    def _batch(self) -> int:
+        return self.rng.choice(self.batch_ids)
+
+    def _view_batches(self):
+        # перша сторінка або випадкова сторінка списку
+        if self.rng.random() < 0.5:
+            return self.updates.callback("menu_view")
+        return self.updates.callback(f"view_pg_a{self._batch()}")
+
+    def _open_batch(self):
+        return self.updates.callback(f"open_batch_{self._batch()}")
+
+    def _set_status(self):
+        cid = self.rng.randint(1, self.max_cid)
+        return self.updates.callback(f"set_{cid}_s{self.rng.randint(1, 4)}")
+
+    async def _enter_add_flow(self):
+        storage = self.dp.fsm.storage
+        await storage.set_state(self.fsm_key, self.bot_module.AddFlow.entering_data)
+        await storage.set_data(self.fsm_key, {"chosen_batch_id": self._batch()})
+
+    def _add_message(self):
+        lines = [f"{self.rng.randint(1, 28):02d}.0{self.rng.randint(1, 9)}.2025, {self.rng.choice(DEPARTMENTS)}"
+                 for _ in range(self.rng.randint(1, 5))]
+        return self.updates.message("\n".join(lines))
+
+    async def run(self) -> list[Result]:
+        return [
+            await self.scenario("view_batches", self._view_batches),
+            await self.scenario("open_batch", self._open_batch),
+            await self.scenario("set_status", self._set_status, mutation=True),
+            await self.scenario("add_save_info", self._add_message, mutation=True, prepare=self._enter_add_flow),
+        ]
+
+
+def report(results: list[Result]) -> str:
+    lines = [f"{'обробник':<15}{'n':>6}{'p50, мс':>10}{'p99, мс':>10}{'SQL/апд':>10}{'Bot API/апд':>13}{'Sheets/зміну':>14}"]
+    for r in results:
+        n = len(r.latencies)
+        sheets = f"{r.sheets_calls / r.mutations:.2f}" if r.sheets_calls is not None else "—"
+        lines.append(
+            f"{r.name:<15}{n:>6}{percentile(r.latencies, 0.5) * 1000:>10.2f}{percentile(r.latencies, 0.99) * 1000:>10.2f}"
+            f"{r.queries / n:>10.1f}{r.api_calls / n:>13.1f}{sheets:>14}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк обробників бота")
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--cartridges", type=int, default=100_000, help="розмір бази, якщо її треба згенерувати")
+    parser.add_argument("--batches", type=int, default=2_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-view-cache", action="store_true", help="вимкнути кеш відмальованих екранів")
+    parser.add_argument("--throttle", action="store_true", help="ліміти Bot API як у продакшені (повільно)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        generate(args.db, args.cartridges, args.batches, seed=args.seed)
+    db.database.path = args.db
+
+    async def run():
+        await db.init_schema(time.strftime(db.DATE_FMT), ADMIN)
+        await members.load()
+        bench = Bench(args.iterations, args.seed, args.throttle)
+        if args.no_view_cache:
+            from views import view_cache
+            view_cache.size = 0
+        try:
+            results = await bench.run()
+        finally:
+            await bench.bot.session.close()
+        count = db.fetchone.sync("SELECT COUNT(*) FROM cartridges")[0]
+        print(f"📊 {args.db}: {count} картриджів, {len(bench.batch_ids)} партій, {args.iterations} повторів\n")
+        print(report(results))
+        print(f"\nBot API: {dict(bench.session.calls)}\nSheets: {dict(bench.ws.calls)}")
+
+    try:
+        asyncio.run(run())
+    finally:
+        db.database.close()
+
+
+if __name__ == "__main__":
+    main()
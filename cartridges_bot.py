@@ -1,155 +1,90 @@
 import asyncio
-import sqlite3
 import os
-import json
 from datetime import datetime
 
 from aiogram import Bot, Dispatcher, types, F
-from aiogram.filters import Command
+from aiogram.types import (
+    FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+)
+from aiogram.filters import Command, CommandObject
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
 
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import db
+import export
+import intake
+import metrics
+import stats
+from search import FIND_HELP, parse_query
+from config import TOKEN, ADMIN_ID, BOT_MODE, METRICS_HOST, METRICS_PORT
+from fsm_storage import SQLiteStorage
+from backup import BackupWorker, archive_counts
+from access import members, AccessMiddleware, is_owner, ROLE_LABELS
+from db import display_date, DATE_FMT, STATUS_MAP, STATUS_WITHDRAWN, ROLES, User
+from gsheets import SheetsSyncPool
+from throttle import OutgoingScheduler, CallbackAnswerMiddleware
+from views import View, view_cache, show_view, list_scope, batch_scope
+from webhook import run_webhook
 
 
-# === 🔧 Налаштування ===
-TOKEN = os.getenv("TOKEN")
-ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
-GSHEET_ID = os.getenv("GSHEET_ID")
-DB_PATH = os.path.join(os.path.dirname(__file__), "cartridges.db")
-
 bot = Bot(token=TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
+dp = Dispatcher(storage=SQLiteStorage())
+# ліміти Bot API, злиття редагувань і гарантована відповідь на кожну кнопку
+outgoing = OutgoingScheduler()
+bot.session.middleware(outgoing)
+dp.callback_query.outer_middleware(CallbackAnswerMiddleware(outgoing))
+sync_workers = SheetsSyncPool(on_import=lambda tenant_id: view_cache.invalidate_tenant(tenant_id))
+# онлайн-копії, стиснені знімки з ротацією та архів давно закритих партій
+backups = BackupWorker(on_archive=lambda moved: archived(moved))  # archived — нижче
+# лише користувачі з таблиці users; обробники отримують user (офіс і роль)
+for observer in (dp.message, dp.callback_query, dp.inline_query):
+    observer.outer_middleware(AccessMiddleware())
+# час кожного апдейта (за командою / префіксом callback) і кожного виклику БД
+dp.update.outer_middleware(metrics.MetricsMiddleware())
+db.database.instrument = metrics.observe_db
 
 
 # === 🗓️ Форматування дат ===
-def normalize_date(date_str: str) -> str:
-    for fmt in ("%d.%m.%Y", "%d.%m.%y", "%Y-%m-%d", "%d-%m-%Y", "%Y/%m/%d", "%d/%m/%Y"):
-        try:
-            return datetime.strptime(date_str.strip(), fmt).strftime("%d.%m.%Y")
-        except ValueError:
-            continue
-    return date_str.strip()
-
-
 def current_date() -> str:
-    return datetime.now().strftime("%d.%m.%Y")
+    return datetime.now().strftime(DATE_FMT)
 
 
 # === 📁 Ініціалізація бази ===
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS cartridges(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date_received TEXT,
-            department TEXT,
-            status TEXT,
-            date_sent TEXT,
-            date_returned TEXT,
-            date_given TEXT,
-            batch_id INTEGER
-        )
-    """)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS batches(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            created_at TEXT,
-            status TEXT
-        )
-    """)
-    # гарантуємо хоч одну активну партію
-    cur.execute("SELECT id FROM batches WHERE status='active'")
-    if not cur.fetchone():
-        cur.execute("INSERT INTO batches (created_at, status) VALUES (?, 'active')", (current_date(),))
-    conn.commit()
-    conn.close()
+async def init_db():
+    await db.init_schema(current_date(), ADMIN_ID)
+    await members.load()
 
 
-# === 🔗 Google Sheets ===
-def init_gsheets():
-    try:
-        key_data = os.getenv("GOOGLE_SERVICE_KEY")
-        if not key_data or not GSHEET_ID:
-            print("⚠️ GOOGLE_SERVICE_KEY або GSHEET_ID не задані.")
-            return None
-
-        creds_dict = json.loads(key_data)
-        scope = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key(GSHEET_ID)
-        return sheet
-    except Exception as e:
-        print("⚠️ Помилка підключення до Google Sheets:", e)
-        return None
+# === Службові ===
+def data_changed(tenant_id: int, batch_id: int | None = None):
+    """Після зміни даних: скидаємо кешовані екрани офісу й ставимо синхронізацію з його аркушем."""
+    view_cache.invalidate(tenant_id, batch_id)
+    sync_workers.notify(tenant_id)
 
 
-def setup_gsheet_format(ws):
-    headers = [
-        "ID", "Дата вилучення", "Відділ", "Статус",
-        "Дата відправлення", "Дата повернення", "Дата видачі", "№ партії"
-    ]
-    ws.clear()
-    ws.append_row(headers)
-    ws.format("A1:H1", {
-        "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9},
-        "textFormat": {"bold": True},
-        "horizontalAlignment": "CENTER"
-    })
-    ws.freeze(rows=1)
-
-
-def sync_to_sheets():
-    sheet = init_gsheets()
-    if sheet is None:
-        return
-
-    # читаємо БД
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, date_received, department, status,
-               date_sent, date_returned, date_given, batch_id
-        FROM cartridges
-        ORDER BY batch_id ASC, id ASC
-    """)
-    rows = cur.fetchall()
-    conn.close()
+def archived(moved: dict[int, tuple[int, int]]):
+    """Після перенесення партій в архів: екрани цих офісів застаріли, рядки зникають з аркушів."""
+    for tenant_id in moved:
+        view_cache.invalidate_tenant(tenant_id)
+        sync_workers.notify(tenant_id)
 
-    try:
-        try:
-            ws = sheet.worksheet("Cartridges")
-        except gspread.WorksheetNotFound:
-            ws = sheet.add_worksheet(title="Cartridges", rows="2000", cols="8")
-            setup_gsheet_format(ws)
-
-        ws.clear()
-        headers = [
-            "ID", "Дата вилучення", "Відділ", "Статус",
-            "Дата відправлення", "Дата повернення", "Дата видачі", "№ партії"
-        ]
-        ws.append_row(headers)
-        if rows:
-            ws.append_rows(rows, value_input_option="USER_ENTERED")
-        ws.format("A1:H1", {"textFormat": {"bold": True}, "horizontalAlignment": "CENTER"})
-        ws.freeze(rows=1)
-        print("✅ Дані синхронізовано з Google Sheets")
-    except Exception as e:
-        print("⚠️ Помилка синхронізації:", e)
+
+# === 📄 Сторінки ===
+# Курсор у callback_data: "a<id>" — наступна сторінка після id, "b<id>" — попередня перед id.
+def parse_cursor(raw: str | None):
+    if not raw:
+        return None
+    return raw[0], int(raw[1:])
 
 
-# === Службові ===
-def is_admin(uid: int) -> bool:
-    return uid == ADMIN_ID
+def page_nav(page, prefix: str) -> list[InlineKeyboardButton]:
+    buttons = []
+    if page.has_prev:
+        buttons.append(InlineKeyboardButton(text="⬅️ Попередні", callback_data=f"{prefix}b{page.items[0].id}"))
+    if page.has_next:
+        buttons.append(InlineKeyboardButton(text="Наступні ➡️", callback_data=f"{prefix}a{page.items[-1].id}"))
+    return buttons
 
 
 # === 🏠 Головне меню ===
@@ -170,27 +105,242 @@ async def show_main_menu(message: types.Message):
 
 # === /start ===
 @dp.message(Command("start"))
-async def start(message: types.Message):
-    if not is_admin(message.from_user.id):
-        return await message.answer("⛔ У вас немає доступу.")
+async def start(message: types.Message, command: CommandObject, user: User):
+    # посилання з inline-пошуку: /start cart_<id> — картка картриджа
+    if command.args and command.args.startswith("cart_") and command.args[5:].isdigit():
+        return await show_cart_card(message, user, int(command.args[5:]))
     await show_main_menu(message)
 
 
+# === /sync — стан синхронізації з Google Sheets ===
+def fmt_dt(dt) -> str:
+    return dt.strftime("%d.%m.%Y %H:%M:%S") if dt else "—"
+
+
+@dp.message(Command("sync"))
+async def sync_status(message: types.Message, user: User):
+    worker = sync_workers.get(user.tenant_id)
+    if not worker.client.configured:
+        return await message.answer("⚠️ Google Sheets для цього офісу не налаштовано.")
+    worker.notify()
+    st = await worker.status()
+    text = (
+        "🔄 *Синхронізація з Google Sheets*\n\n"
+        f"✅ Остання успішна: {fmt_dt(st['last_success'])}\n"
+        f"⬇️ Останній імпорт з таблиці: {fmt_dt(st['last_pull'])}\n"
+        f"🕓 Змін в очікуванні: {st['pending_changes']}\n"
+        f"⚙️ Виконується зараз: {'так' if st['running'] else 'ні'}\n"
+    )
+    if st["last_error"]:
+        text += f"⚠️ Остання помилка ({fmt_dt(st['last_error_at'])}): `{st['last_error'].replace('`', chr(39))}`\n"
+    if st["attempt"]:
+        text += f"🔁 Невдалих спроб поспіль: {st['attempt']}, наступна: {fmt_dt(st['next_attempt'])}\n"
+    await message.answer(text, parse_mode="Markdown")
+
+
+# === /pull — імпорт правок, зроблених прямо в таблиці ===
+def format_pull_report(report) -> str:
+    lines = [f"⬇️ Імпорт з Google Sheets: перевірено рядків {report.checked}, застосовано {len(report.applied)}"]
+    if report.applied:
+        lines.append("✅ " + ", ".join(f"#{cid}" for cid in report.applied[:intake.MAX_ERRORS_SHOWN]))
+    if report.conflicts:
+        lines += ["", f"⚔️ Конфлікти: {len(report.conflicts)}"]
+        lines += [f"• #{cid}: {reason}" for cid, reason in report.conflicts[:intake.MAX_ERRORS_SHOWN]]
+    if report.errors:
+        lines += ["", f"⚠️ Не імпортовано: {len(report.errors)}", intake.format_errors(report.errors)]
+    return "\n".join(lines)
+
+
+@dp.message(Command("pull"))
+async def pull(message: types.Message, user: User):
+    try:
+        report = await sync_workers.get(user.tenant_id).pull()
+    except Exception as e:
+        return await message.answer(f"❌ Не вдалося прочитати таблицю: {e}")
+    if report is None:
+        return await message.answer("⚠️ Google Sheets не налаштовано.")
+    await message.answer(format_pull_report(report))
+
+
+# === /recount — перевірка лічильників партій ===
+@dp.message(Command("recount"))
+async def recount(message: types.Message, user: User):
+    if not is_owner(user):
+        return await message.answer("⛔ Лише для власника.")
+    fixed = await db.rebuild_batch_summary()
+    if fixed:
+        for tenant_id, batch_id in fixed:
+            view_cache.invalidate(tenant_id, batch_id)
+        await message.answer(f"🧮 Лічильники перераховано, виправлено партій: {len(fixed)}")
+    else:
+        await message.answer("🧮 Лічильники партій узгоджені з даними.")
+
+
+# === /stats — час обробки, пропускна здатність і поточний стан ===
+@dp.message(Command("stats"))
+async def stats_report(message: types.Message, user: User):
+    # /stats 2025-Q3 — інший квартал
+    parts = message.text.split(maxsplit=1)
+    period = None
+    if len(parts) > 1:
+        period = stats.parse_period(parts[1])
+        if period is None:
+            return await message.answer(f"⚠️ Невідомий період «{parts[1].strip()}».\n{stats.STATS_USAGE}")
+    await message.answer(await stats.build_report(user.tenant_id, period))
+
+
+# === /perf — затримки обробників, БД і Google Sheets з моменту запуску ===
+@dp.message(Command("perf"))
+async def perf(message: types.Message, user: User):
+    if not is_owner(user):
+        return await message.answer("⛔ Лише для власника.")
+    await message.answer(metrics.perf_report())
+
+
+# === 💾 /backup — останній знімок бази документом (для власника) ===
+MAX_DOCUMENT = 50 * 1024 * 1024   # ліміт Bot API на файл
+
+
+@dp.message(Command("backup"))
+async def backup_cmd(message: types.Message, command: CommandObject, user: User):
+    if not is_owner(user):
+        return await message.answer("⛔ Лише для власника.")
+    # /backup now — свіжий знімок замість останнього запланованого
+    if command.args == "now" or not backups.status()["snapshots"]:
+        await bot.send_chat_action(message.chat.id, "upload_document")
+        try:
+            await backups.snapshot()
+        except Exception as e:
+            return await message.answer(f"❌ Не вдалося зробити знімок: {e}")
+    st = backups.status()
+    latest = st["snapshots"][0]
+    batches, cartridges = await asyncio.get_running_loop().run_in_executor(
+        None, archive_counts, backups.archive_path
+    )
+
+    caption = (
+        f"💾 Знімок від {fmt_dt(latest.taken_at)}, {latest.size / 1024:.0f} КБ\n"
+        f"Онлайн-копія: {fmt_dt(st['last_backup'])} · знімків збережено: {len(st['snapshots'])}"
+        + (f"\n📦 В архіві партій: {batches}, картриджів: {cartridges} — їх не видно в /find, /export "
+           f"і таблиці; архів копіюється разом з базою" if batches else "")
+        + (f"\n⚠️ Остання помилка: {st['last_error']}" if st["last_error"] else "")
+    )
+    # знімок архіву з тією ж міткою часу, що й знімок бази
+    documents = [latest] + [s for s in st["archive_snapshots"][:1] if s.taken_at == latest.taken_at]
+    too_big = [s.path for s in documents if s.size > MAX_DOCUMENT]
+    if too_big:
+        return await message.answer(caption + "\n\nФайл завеликий для Telegram: " + ", ".join(too_big))
+    for i, s in enumerate(documents):
+        await bot.send_document(message.chat.id, FSInputFile(s.path), caption=caption if i == 0 else None)
+
+
+# === 🏢 /tenant — офіси (для власника) ===
+TENANT_HELP = (
+    "🏢 *Офіси*\n"
+    "/tenant — список\n"
+    "/tenant 2 — перейти в офіс 2\n"
+    "/tenant new Назва — створити офіс\n"
+    "/tenant sheet <id таблиці> — таблиця Google Sheets поточного офісу (`-` — вимкнути)"
+)
+
+
+@dp.message(Command("tenant"))
+async def tenant_cmd(message: types.Message, command: CommandObject, user: User):
+    if not is_owner(user):
+        return await message.answer("⛔ Лише для власника.")
+    args = (command.args or "").split(maxsplit=1)
+
+    if not args:
+        lines = ["🏢 *Офіси:*"]
+        for t in await db.list_tenants():
+            mark = "👉 " if t.id == user.tenant_id else ""
+            sheet = "📗" if sync_workers.sheet_for(t) else "—"
+            lines.append(f"{mark}#{t.id} {t.name} · таблиця {sheet} · людей {len(members.of_tenant(t.id))}")
+        return await message.answer("\n".join(lines) + "\n\n" + TENANT_HELP, parse_mode="Markdown")
+
+    if args[0] == "new" and len(args) > 1:
+        tenant_id = await db.create_tenant(args[1].strip(), current_date())
+        await sync_workers.refresh()
+        await members.save(user._replace(tenant_id=tenant_id))
+        return await message.answer(f"🏢 Створено офіс #{tenant_id} «{args[1].strip()}» — ви тепер у ньому.")
+
+    if args[0] == "sheet" and len(args) > 1:
+        sheet_id = None if args[1].strip() == "-" else args[1].strip()
+        await db.set_tenant_sheet(user.tenant_id, sheet_id)
+        await sync_workers.refresh()
+        if sheet_id:
+            sync_workers.notify(user.tenant_id, full=True)
+            return await message.answer("📗 Таблицю підключено, дані вивантажуються.")
+        return await message.answer("📕 Синхронізацію з таблицею для офісу вимкнено.")
+
+    if args[0].isdigit():
+        tenant = next((t for t in await db.list_tenants() if t.id == int(args[0])), None)
+        if tenant is None:
+            return await message.answer("⚠️ Такого офісу немає.")
+        await members.save(user._replace(tenant_id=tenant.id))
+        return await message.answer(f"👉 Поточний офіс: #{tenant.id} {tenant.name}")
+
+    await message.answer(TENANT_HELP, parse_mode="Markdown")
+
+
+# === 👥 /users, /adduser, /deluser — доступ до офісу ===
+@dp.message(Command("users"))
+async def users_cmd(message: types.Message, user: User):
+    lines = ["👥 *Доступ до офісу:*"]
+    for u in members.of_tenant(user.tenant_id):
+        lines.append(f"• `{u.user_id}` {u.name or ''} — {ROLE_LABELS[u.role]}")
+    lines.append("\n/adduser <id> [admin|owner] [ім'я] · /deluser <id>")
+    await message.answer("\n".join(lines), parse_mode="Markdown")
+
+
+@dp.message(Command("adduser"))
+async def add_user(message: types.Message, command: CommandObject, user: User):
+    args = (command.args or "").split()
+    if not args or not args[0].isdigit():
+        return await message.answer("Формат: /adduser <id> [admin|owner] [ім'я]")
+    rest = args[1:]
+    role = rest.pop(0) if rest and rest[0] in ROLES else "admin"
+    name = " ".join(rest) or None
+    if role == "owner" and not is_owner(user):
+        return await message.answer("⛔ Призначати власників може лише власник.")
+
+    target = members.get(int(args[0]))
+    if target is not None and target.tenant_id != user.tenant_id and not is_owner(user):
+        return await message.answer("⛔ Цей користувач належить іншому офісу.")
+    if target is not None and is_owner(target) and not is_owner(user):
+        return await message.answer("⛔ Змінювати власника може лише власник.")
+
+    await members.save(User(int(args[0]), user.tenant_id, role, name))
+    await message.answer(f"✅ Користувач `{args[0]}` — {ROLE_LABELS[role]} цього офісу.", parse_mode="Markdown")
+
+
+@dp.message(Command("deluser"))
+async def del_user(message: types.Message, command: CommandObject, user: User):
+    if not command.args or not command.args.strip().isdigit():
+        return await message.answer("Формат: /deluser <id>")
+    target = members.get(int(command.args.strip()))
+    if target is None or target.tenant_id != user.tenant_id:
+        return await message.answer("⚠️ У цьому офісі такого користувача немає.")
+    if target.user_id == user.user_id:
+        return await message.answer("⚠️ Себе видалити не можна.")
+    if is_owner(target) and not is_owner(user):
+        return await message.answer("⛔ Видаляти власника може лише власник.")
+    await members.remove(target.user_id)
+    await message.answer(f"🗑️ Доступ користувача `{target.user_id}` скасовано.", parse_mode="Markdown")
+
+
 # === Меню кнопок (роутер) ===
 @dp.callback_query(F.data.startswith("menu_"))
-async def menu_actions(callback: types.CallbackQuery, state: FSMContext):
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("⛔ Немає доступу", show_alert=True)
-
+async def menu_actions(callback: types.CallbackQuery, state: FSMContext, user: User):
     action = callback.data.split("_")[1]
     if action == "add":
-        await start_add_flow(callback, state)
+        await start_add_flow(callback, state, user)
     elif action == "view":
-        await view_batches(callback)
+        await view_batches(callback, user)
     elif action == "status":
-        await show_status_menu(callback)
+        await show_status_menu(callback, user)
     elif action == "newbatch":
-        await new_batch(callback)
+        await new_batch(callback, user)
 
 
 # === ➕ Додати (спочатку вибір партії) ===
@@ -200,26 +350,37 @@ class AddFlow(StatesGroup):
     chosen_batch_id = State()
 
 
-async def start_add_flow(callback: types.CallbackQuery, state: FSMContext):
+ADD_HINT = (
+    "Введи дані у форматі:\n`ДД.ММ.РРРР, Відділення`\n"
+    "Можна кілька рядків в одному повідомленні або файл CSV/XLSX (дата, відділ)."
+)
+
+
+async def start_add_flow(callback: types.CallbackQuery, state: FSMContext, user: User, cursor=None):
     # список партій
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id, created_at, status FROM batches ORDER BY id DESC")
-    batches = cur.fetchall()
-    conn.close()
+    page = await db.list_batches(user.tenant_id, cursor)
+    if not page.items and cursor:
+        page = await db.list_batches(user.tenant_id)
 
     kb = InlineKeyboardBuilder()
-    for bid, created, status in batches:
+    for bid, created, status in page.items:
         emoji = "🟢" if status == "active" else "⚪"
-        kb.button(text=f"{emoji} Партія {bid} ({created})", callback_data=f"select_batch_{bid}")
-    kb.button(text="🆕 Створити нову партію", callback_data="create_batch_for_add")
-    kb.button(text="🏠 Головне меню", callback_data="go_home")
+        kb.button(text=f"{emoji} Партія {bid} ({display_date(created)})", callback_data=f"select_batch_{bid}")
     kb.adjust(1)
+    if nav := page_nav(page, "add_pg_"):
+        kb.row(*nav)
+    kb.row(InlineKeyboardButton(text="🆕 Створити нову партію", callback_data="create_batch_for_add"))
+    kb.row(InlineKeyboardButton(text="🏠 Головне меню", callback_data="go_home"))
 
     await state.set_state(AddFlow.choosing_batch)
     await callback.message.edit_text("🔹 Вибери партію, до якої додати картридж:", reply_markup=kb.as_markup())
 
 
+@dp.callback_query(F.data.startswith("add_pg_"), AddFlow.choosing_batch)
+async def add_flow_page(callback: types.CallbackQuery, state: FSMContext, user: User):
+    await start_add_flow(callback, state, user, parse_cursor(callback.data.split("_")[2]))
+
+
 @dp.callback_query(F.data == "go_home", AddFlow.choosing_batch)
 async def go_home_from_add(callback: types.CallbackQuery, state: FSMContext):
     await state.clear()
@@ -232,87 +393,102 @@ async def choose_batch_for_add(callback: types.CallbackQuery, state: FSMContext)
     await state.update_data(chosen_batch_id=batch_id)
     await state.set_state(AddFlow.entering_data)
     await callback.message.edit_text(
-        f"🗂️ Обрано партію #{batch_id}\nВведи дані у форматі:\n`ДД.ММ.РРРР, Відділення`",
+        f"🗂️ Обрано партію #{batch_id}\n{ADD_HINT}",
         parse_mode="Markdown"
     )
 
 
 @dp.callback_query(F.data == "create_batch_for_add", AddFlow.choosing_batch)
-async def create_new_batch_for_add(callback: types.CallbackQuery, state: FSMContext):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO batches (created_at, status) VALUES (?, 'active')", (current_date(),))
-    conn.commit()
-    new_id = cur.lastrowid
-    conn.close()
+async def create_new_batch_for_add(callback: types.CallbackQuery, state: FSMContext, user: User):
+    new_id = await db.create_batch(user.tenant_id, current_date())
+    view_cache.invalidate(user.tenant_id)
     await state.update_data(chosen_batch_id=new_id)
     await state.set_state(AddFlow.entering_data)
     await callback.message.edit_text(
-        f"🆕 Створено та обрано партію #{new_id}\nВведи дані у форматі:\n`ДД.ММ.РРРР, Відділення`",
+        f"🆕 Створено та обрано партію #{new_id}\n{ADD_HINT}",
         parse_mode="Markdown"
     )
 
 
-@dp.message(AddFlow.entering_data, F.text)
-async def add_save_info(msg: types.Message, state: FSMContext):
-    if not is_admin(msg.from_user.id):
-        return await msg.answer("⛔ Немає доступу.")
-
-    txt = msg.text.strip()
-    if "," not in txt:
-        return await msg.reply("❌ Формат: `20.10.2025, Бухгалтерія`", parse_mode="Markdown")
-
-    date_str, dept = map(str.strip, txt.split(",", 1))
-    date_received = normalize_date(date_str)
-
+async def save_intake(msg: types.Message, state: FSMContext, user: User, result: intake.IntakeResult):
     data = await state.get_data()
     batch_id = data.get("chosen_batch_id")
     if not batch_id:
         await state.clear()
         return await msg.answer("⚠️ Партію не вибрано. Спробуйте ще раз.")
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO cartridges (date_received, department, status, batch_id)
-        VALUES (?, ?, ?, ?)
-    """, (date_received, dept, "⛔ Вилучено у працівника", batch_id))
-    conn.commit()
-    conn.close()
+    if not result.rows:
+        text = "❌ Жодного рядка не додано. Формат: 20.10.2025, Бухгалтерія"
+        if result.errors:
+            text += "\n\n" + intake.format_errors(result.errors)
+        return await msg.reply(text)
 
-    sync_to_sheets()
+    # одна транзакція на все повідомлення/файл і одна синхронізація
+    added = await db.add_cartridges(user.tenant_id, result.rows, STATUS_WITHDRAWN, batch_id)
     await state.clear()
-    await msg.answer(f"✅ Додано картридж до партії #{batch_id}")
+    if not added:
+        return await msg.answer("⚠️ Партію не знайдено. Спробуйте ще раз.")
+    data_changed(user.tenant_id, batch_id)
+
+    text = f"✅ Додано картриджів до партії #{batch_id}: {added}"
+    if result.errors:
+        text += f"\n\n⚠️ Пропущено рядків: {len(result.errors)}\n" + intake.format_errors(result.errors)
+    await msg.answer(text)
     await show_main_menu(msg)
 
 
+# команди (/find, /export…) обробляють свої хендлери, навіть посеред додавання
+@dp.message(AddFlow.entering_data, F.text, ~F.text.startswith("/"))
+async def add_save_info(msg: types.Message, state: FSMContext, user: User):
+    await save_intake(msg, state, user, intake.parse_text(msg.text))
+
+
+@dp.message(AddFlow.entering_data, F.document)
+async def add_save_file(msg: types.Message, state: FSMContext, user: User):
+    try:
+        data = await bot.download(msg.document)
+        # розбір файлу — блокуюча робота, виносимо з циклу подій
+        result = await asyncio.to_thread(intake.parse_document, msg.document.file_name, data)
+    except Exception as e:
+        return await msg.reply(f"❌ Не вдалося прочитати файл: {e}")
+    await save_intake(msg, state, user, result)
+
+
 # === 👁️ Перегляд партій ===
-async def view_batches(callback: types.CallbackQuery):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT b.id, b.created_at, b.status, COUNT(c.id)
-        FROM batches b
-        LEFT JOIN cartridges c ON b.id = c.batch_id
-        GROUP BY b.id
-        ORDER BY b.id DESC
-    """)
-    batches = cur.fetchall()
-    conn.close()
-
-    if not batches:
-        return await callback.message.edit_text("📦 Партій ще немає.", reply_markup=main_menu_kb())
+async def view_batches(callback: types.CallbackQuery, user: User, cursor=None):
+    tenant_id = user.tenant_id
+    view = await view_cache.get_or_render(("view", tenant_id, cursor), list_scope(tenant_id),
+                                          lambda: render_batches(tenant_id, cursor))
+    await show_view(callback, view)
+
+
+async def render_batches(tenant_id: int, cursor=None) -> View:
+    page = await db.list_batch_summaries(tenant_id, cursor)
+    if not page.items and cursor:
+        page = await db.list_batch_summaries(tenant_id)
+
+    if not page.items:
+        return View("📦 Партій ще немає.", main_menu_kb())
 
     text = "📦 *Список партій:*\n\n"
     kb = InlineKeyboardBuilder()
-    for bid, created, status, cnt in batches:
-        emoji = "🟢" if status == "active" else "⚪"
-        text += f"{emoji} Партія {bid} | 📅 {created} | 🖨️ {cnt} шт.\n"
+    for b in page.items:
+        bid = b.id
+        emoji = "🟢" if b.status == "active" else "⚪"
+        text += (f"{emoji} Партія {bid} | 📅 {display_date(b.created_at)} | 🖨️ {b.count} шт.\n"
+                 f"      ⛔ {b.withdrawn} · 🔄 {b.sent} · ✅ {b.returned} · 📦 {b.issued}\n")
         kb.button(text=f"📋 Відкрити {bid}", callback_data=f"open_batch_{bid}")
         kb.button(text=f"🗑️ Видалити {bid}", callback_data=f"ask_del_batch_{bid}")
-    kb.button(text="🏠 Головне меню", callback_data="go_home_plain")
     kb.adjust(1)
-    await callback.message.edit_text(text, parse_mode="Markdown", reply_markup=kb.as_markup())
+    if nav := page_nav(page, "view_pg_"):
+        kb.row(*nav)
+    kb.row(InlineKeyboardButton(text="🏠 Головне меню", callback_data="go_home_plain"))
+    return View(text, kb.as_markup(), "Markdown")
+
+
+@dp.callback_query(F.data.startswith("view_pg_"))
+async def view_batches_page(callback: types.CallbackQuery, user: User):
+    await view_batches(callback, user, parse_cursor(callback.data.split("_")[2]))
 
 
 @dp.callback_query(F.data == "go_home_plain")
@@ -321,44 +497,63 @@ async def go_home_plain(callback: types.CallbackQuery):
 
 
 @dp.callback_query(F.data.startswith("open_batch_"))
-async def open_batch(callback: types.CallbackQuery):
-    batch_id = int(callback.data.split("_")[2])
+async def open_batch(callback: types.CallbackQuery, user: User):
+    parts = callback.data.split("_")
+    await show_batch(callback, user, int(parts[2]), parts[3] if len(parts) > 3 else None)
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id, created_at, status FROM batches WHERE id=?", (batch_id,))
-    b = cur.fetchone()
-    cur.execute("""
-        SELECT id, date_received, department, status, date_sent, date_returned, date_given
-        FROM cartridges
-        WHERE batch_id=?
-        ORDER BY id ASC
-    """, (batch_id,))
-    carts = cur.fetchall()
-    conn.close()
 
-    if not b:
+async def show_batch(callback: types.CallbackQuery, user: User, batch_id: int, cursor_raw: str | None = None):
+    tenant_id = user.tenant_id
+    view = await view_cache.get_or_render(
+        ("batch", tenant_id, batch_id, cursor_raw), batch_scope(tenant_id, batch_id),
+        lambda: render_batch(tenant_id, batch_id, cursor_raw),
+    )
+    if view is None:
         return await callback.answer("Партію не знайдено", show_alert=True)
+    await show_view(callback, view)
+
+
+def cart_line(r: db.Cartridge) -> str:
+    d_recv, d_sent, d_ret, d_giv = map(display_date, (r.date_received, r.date_sent, r.date_returned, r.date_given))
+    return f"#{r.id} • {r.department} • {r.status}\n🗓 {d_recv or '—'} | → {d_sent or '—'} | ⤴ {d_ret or '—'} | ✔ {d_giv or '—'}"
+
+
+async def render_batch(tenant_id: int, batch_id: int, cursor_raw: str | None = None) -> View | None:
+    b = await db.get_batch_summary(tenant_id, batch_id)
+    if not b:
+        return None
+
+    page = await db.batch_cartridges(tenant_id, batch_id, parse_cursor(cursor_raw))
+    if not page.items and cursor_raw:
+        cursor_raw = None
+        page = await db.batch_cartridges(tenant_id, batch_id)
+    carts = page.items
 
-    header = f"📦 *Партія #{b[0]}* • 📅 {b[1]} • Статус: {b[2]}"
+    header = f"📦 *Партія #{b.id}* • 📅 {display_date(b.created_at)} • Статус: {b.status} • 🖨️ {b.count} шт."
     if not carts:
         body = "\n\n(Записів немає)"
     else:
-        def row_text(r):
-            cid, d_recv, dept, status, d_sent, d_ret, d_giv = r
-            return f"#{cid} • {dept} • {status}\n🗓 {d_recv or '—'} | → {d_sent or '—'} | ⤴ {d_ret or '—'} | ✔ {d_giv or '—'}"
-        body = "\n\n" + "\n".join(row_text(r) for r in carts)
+        body = "\n\n" + "\n".join(cart_line(r) for r in carts)
 
     kb = InlineKeyboardBuilder()
+    suffix = f"_{cursor_raw}" if cursor_raw else ""
     for r in carts:
         cid = r[0]
-        kb.button(text=f"🔧 Статус #{cid}", callback_data=f"edit_cart_{cid}")
+        kb.button(text=f"🔧 Статус #{cid}", callback_data=f"edit_cart_{cid}{suffix}")
         kb.button(text=f"❌ Видалити #{cid}", callback_data=f"ask_del_cart_{cid}")
-    kb.button(text="⬅️ Назад до списку партій", callback_data="menu_view")
-    kb.button(text="🏠 Головне меню", callback_data="go_home_plain")
     kb.adjust(2)
-
-    await callback.message.edit_text(header + body, parse_mode="Markdown", reply_markup=kb.as_markup())
+    if nav := page_nav(page, f"open_batch_{batch_id}_"):
+        kb.row(*nav)
+    if carts:
+        kb.row(
+            InlineKeyboardButton(text="🧰 Масові дії", callback_data=f"bulk_{batch_id}"),
+            InlineKeyboardButton(text="📤 Експорт XLSX", callback_data=f"export_{batch_id}"),
+        )
+    kb.row(
+        InlineKeyboardButton(text="⬅️ Назад до списку партій", callback_data="menu_view"),
+        InlineKeyboardButton(text="🏠 Головне меню", callback_data="go_home_plain"),
+    )
+    return View(header + body, kb.as_markup(), "Markdown")
 
 
 # === 🗑️ Видалення партії (з підтвердженням) ===
@@ -377,37 +572,28 @@ async def ask_del_batch(callback: types.CallbackQuery):
 
 
 @dp.callback_query(F.data.startswith("del_batch_"))
-async def del_batch(callback: types.CallbackQuery):
+async def del_batch(callback: types.CallbackQuery, user: User):
     parts = callback.data.split("_")
     batch_id = int(parts[2])
     confirm = parts[3]
     if confirm != "yes":
-        return await view_batches(callback)
-
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM cartridges WHERE batch_id=?", (batch_id,))
-    cur.execute("DELETE FROM batches WHERE id=?", (batch_id,))
-    conn.commit()
-    conn.close()
-    sync_to_sheets()
+        return await view_batches(callback, user)
+
+    if not await db.delete_batch(user.tenant_id, batch_id):
+        return await callback.answer("Партію не знайдено", show_alert=True)
+    data_changed(user.tenant_id, batch_id)
     await callback.message.edit_text(f"🗑️ Партію #{batch_id} видалено.")
-    await view_batches(callback)
+    await view_batches(callback, user)
 
 
 # === ❌ Видалення картриджа (з підтвердженням) ===
 @dp.callback_query(F.data.startswith("ask_del_cart_"))
-async def ask_del_cart(callback: types.CallbackQuery):
+async def ask_del_cart(callback: types.CallbackQuery, user: User):
     cid = int(callback.data.split("_")[-1])
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT batch_id FROM cartridges WHERE id=?", (cid,))
-    row = cur.fetchone()
-    conn.close()
-    if not row:
+    batch_id = await db.cartridge_batch_id(user.tenant_id, cid)
+    if batch_id is None:
         return await callback.answer("Запис не знайдено", show_alert=True)
-    batch_id = row[0]
 
     kb = InlineKeyboardBuilder()
     kb.button(text="✅ Так, видалити", callback_data=f"del_cart_{cid}_{batch_id}_yes")
@@ -421,146 +607,377 @@ async def ask_del_cart(callback: types.CallbackQuery):
 
 
 @dp.callback_query(F.data.startswith("del_cart_"))
-async def del_cart(callback: types.CallbackQuery):
+async def del_cart(callback: types.CallbackQuery, user: User):
     _, _, cid, batch_id, confirm = callback.data.split("_")
     cid = int(cid); batch_id = int(batch_id)
     if confirm != "yes":
-        return await open_batch(callback)
-
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM cartridges WHERE id=?", (cid,))
-    conn.commit()
-    conn.close()
-    sync_to_sheets()
+        return await show_batch(callback, user, batch_id)
+
+    if not await db.delete_cartridge(user.tenant_id, cid):
+        return await callback.answer("Запис не знайдено", show_alert=True)
+    data_changed(user.tenant_id, batch_id)
     await callback.message.edit_text(f"✅ Картридж #{cid} видалено.")
-    await open_batch(callback)
+    await show_batch(callback, user, batch_id)
 
 
 # === 🔧 Зміна статусу (через перегляд партії) ===
-def status_kb_for_cart(cid: int):
+# курсор сторінки партії передається далі, щоб повернутися на ту саму сторінку
+def status_kb_for_cart(cid: int, cursor_raw: str | None = None):
+    suffix = f"_{cursor_raw}" if cursor_raw else ""
     kb = InlineKeyboardBuilder()
-    kb.button(text="⛔ Вилучено", callback_data=f"set_{cid}_s1")
-    kb.button(text="🔄 Відправлено", callback_data=f"set_{cid}_s2")
-    kb.button(text="✅ Прибуло", callback_data=f"set_{cid}_s3")
-    kb.button(text="📦 Видано", callback_data=f"set_{cid}_s4")
-    kb.button(text="⬅️ Назад", callback_data=f"back_cart_{cid}")
+    kb.button(text="⛔ Вилучено", callback_data=f"set_{cid}_s1{suffix}")
+    kb.button(text="🔄 Відправлено", callback_data=f"set_{cid}_s2{suffix}")
+    kb.button(text="✅ Прибуло", callback_data=f"set_{cid}_s3{suffix}")
+    kb.button(text="📦 Видано", callback_data=f"set_{cid}_s4{suffix}")
+    kb.button(text="⬅️ Назад", callback_data=f"back_cart_{cid}{suffix}")
     kb.adjust(2)
     return kb.as_markup()
 
 
 @dp.callback_query(F.data.startswith("edit_cart_"))
 async def edit_cart(callback: types.CallbackQuery):
-    cid = int(callback.data.split("_")[2])
-    await callback.message.edit_reply_markup(reply_markup=status_kb_for_cart(cid))
+    parts = callback.data.split("_")
+    cid = int(parts[2])
+    await callback.message.edit_reply_markup(
+        reply_markup=status_kb_for_cart(cid, parts[3] if len(parts) > 3 else None)
+    )
 
 
 @dp.callback_query(F.data.startswith("back_cart_"))
-async def back_cart(callback: types.CallbackQuery):
-    cid = int(callback.data.split("_")[2])
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT batch_id FROM cartridges WHERE id=?", (cid,))
-    row = cur.fetchone()
-    conn.close()
-    if not row:
+async def back_cart(callback: types.CallbackQuery, user: User):
+    parts = callback.data.split("_")
+    cid = int(parts[2])
+    bid = await db.cartridge_batch_id(user.tenant_id, cid)
+    if bid is None:
         return await callback.answer("Запис не знайдено", show_alert=True)
-    bid = row[0]
-    await open_batch(callback)
+    await show_batch(callback, user, bid, parts[3] if len(parts) > 3 else None)
 
 
 @dp.callback_query(F.data.startswith("set_"))
-async def set_status(callback: types.CallbackQuery):
-    cid, code = int(callback.data.split("_")[1]), callback.data.split("_")[2]
-    status_map = {
-        "s1": ("⛔ Вилучено у працівника", "date_received"),
-        "s2": ("🔄 Відправлено на фірму", "date_sent"),
-        "s3": ("✅ Прибуло з фірми", "date_returned"),
-        "s4": ("📦 Видано працівнику", "date_given"),
-    }
-    new_status, field = status_map[code]
+async def set_status(callback: types.CallbackQuery, user: User):
+    parts = callback.data.split("_")
+    cid, code = int(parts[1]), parts[2]
+    new_status, field, _ = STATUS_MAP[code]
     today = current_date()
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(f"UPDATE cartridges SET status=?, {field}=? WHERE id=?", (new_status, today, cid))
-    cur.execute("SELECT batch_id FROM cartridges WHERE id=?", (cid,))
-    row = cur.fetchone()
-    conn.commit()
-    conn.close()
-
-    sync_to_sheets()
-    if row:
-        await open_batch(callback)
-    else:
-        await callback.message.edit_text("✅ Статус змінено.")
+    batch_id = await db.set_cartridge_status(user.tenant_id, cid, new_status, field, today)
+    if batch_id is None:
+        return await callback.answer("Запис не знайдено", show_alert=True)
+
+    data_changed(user.tenant_id, batch_id)
+    await show_batch(callback, user, batch_id, parts[3] if len(parts) > 3 else None)
+
+
+# === 🧰 Масова зміна статусу ===
+def bulk_kb(batch_id: int):
+    kb = InlineKeyboardBuilder()
+    for code, (label, _, _) in STATUS_MAP.items():
+        kb.button(text=f"Усі → {label}", callback_data=f"bulkall_{batch_id}_{code}")
+    kb.button(text="☑️ Вибрати картриджі", callback_data=f"pick_{batch_id}")
+    kb.button(text="⬅️ Назад", callback_data=f"open_batch_{batch_id}")
+    kb.adjust(1)
+    return kb.as_markup()
+
+
+@dp.callback_query(F.data.startswith("bulk_"))
+async def bulk_menu(callback: types.CallbackQuery):
+    batch_id = int(callback.data.split("_")[1])
+    await callback.message.edit_reply_markup(reply_markup=bulk_kb(batch_id))
+
+
+@dp.callback_query(F.data.startswith("bulkall_"))
+async def bulk_set_all(callback: types.CallbackQuery, user: User):
+    _, batch_id, code = callback.data.split("_")
+    batch_id = int(batch_id)
+    new_status, field, _ = STATUS_MAP[code]
+
+    changed = await db.set_batch_status(user.tenant_id, batch_id, new_status, field, current_date())
+    if changed:
+        data_changed(user.tenant_id, batch_id)
+    await callback.answer(f"Змінено: {changed}")
+    await show_batch(callback, user, batch_id)
+
+
+# Вибрані картриджі зберігаються у FSM-даних користувача: picked_batch + picked
+async def get_picked(state: FSMContext, batch_id: int) -> list[int]:
+    data = await state.get_data()
+    return data.get("picked", []) if data.get("picked_batch") == batch_id else []
+
+
+async def show_pick(callback: types.CallbackQuery, state: FSMContext, user: User, batch_id: int,
+                    cursor_raw: str | None = None):
+    picked = set(await get_picked(state, batch_id))
+    page = await db.batch_cartridges(user.tenant_id, batch_id, parse_cursor(cursor_raw))
+    if not page.items and cursor_raw:
+        cursor_raw = None
+        page = await db.batch_cartridges(user.tenant_id, batch_id)
+
+    suffix = f"_{cursor_raw}" if cursor_raw else ""
+    kb = InlineKeyboardBuilder()
+    for r in page.items:
+        mark = "☑️" if r.id in picked else "⬜"
+        kb.button(text=f"{mark} #{r.id} • {r.department} • {r.status}", callback_data=f"tog_{batch_id}_{r.id}{suffix}")
+    kb.adjust(1)
+    if nav := page_nav(page, f"pick_{batch_id}_"):
+        kb.row(*nav)
+    if picked:
+        kb.row(*(
+            InlineKeyboardButton(text=f"→ {label.split()[0]}", callback_data=f"pickset_{batch_id}_{code}")
+            for code, (label, _, _) in STATUS_MAP.items()
+        ))
+        kb.row(InlineKeyboardButton(text="✖️ Скинути вибір", callback_data=f"pickclr_{batch_id}{suffix}"))
+    kb.row(InlineKeyboardButton(text="⬅️ Назад до партії", callback_data=f"open_batch_{batch_id}"))
+
+    legend = " · ".join(label for label, _, _ in STATUS_MAP.values())
+    await callback.message.edit_text(
+        f"☑️ Партія #{batch_id} — відміть картриджі\nВибрано: {len(picked)}\n\n{legend}",
+        reply_markup=kb.as_markup()
+    )
+
+
+@dp.callback_query(F.data.startswith("pick_"))
+async def pick_mode(callback: types.CallbackQuery, state: FSMContext, user: User):
+    parts = callback.data.split("_")
+    await show_pick(callback, state, user, int(parts[1]), parts[2] if len(parts) > 2 else None)
+
+
+@dp.callback_query(F.data.startswith("tog_"))
+async def pick_toggle(callback: types.CallbackQuery, state: FSMContext, user: User):
+    parts = callback.data.split("_")
+    batch_id, cid = int(parts[1]), int(parts[2])
+    picked = await get_picked(state, batch_id)
+    picked = [x for x in picked if x != cid] if cid in picked else picked + [cid]
+    await state.update_data(picked_batch=batch_id, picked=picked)
+    await show_pick(callback, state, user, batch_id, parts[3] if len(parts) > 3 else None)
+
+
+@dp.callback_query(F.data.startswith("pickclr_"))
+async def pick_clear(callback: types.CallbackQuery, state: FSMContext, user: User):
+    parts = callback.data.split("_")
+    batch_id = int(parts[1])
+    await state.update_data(picked_batch=None, picked=[])
+    await show_pick(callback, state, user, batch_id, parts[2] if len(parts) > 2 else None)
+
+
+@dp.callback_query(F.data.startswith("pickset_"))
+async def pick_apply(callback: types.CallbackQuery, state: FSMContext, user: User):
+    _, batch_id, code = callback.data.split("_")
+    batch_id = int(batch_id)
+    new_status, field, _ = STATUS_MAP[code]
+    picked = await get_picked(state, batch_id)
+
+    changed = await db.set_cartridges_status(user.tenant_id, batch_id, picked, new_status, field, current_date())
+    await state.update_data(picked_batch=None, picked=[])
+    if changed:
+        data_changed(user.tenant_id, batch_id)
+    await callback.answer(f"Змінено: {changed}")
+    await show_batch(callback, user, batch_id)
 
 
 # === 🔧 Змінити статус (окремий пункт меню) ===
-async def show_status_menu(callback: types.CallbackQuery):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT b.id, b.created_at, COUNT(c.id)
-        FROM batches b
-        LEFT JOIN cartridges c ON b.id = c.batch_id
-        GROUP BY b.id ORDER BY b.id DESC
-    """)
-    batches = cur.fetchall()
-    conn.close()
-
-    if not batches:
-        return await callback.message.edit_text("📦 Партій ще немає.", reply_markup=main_menu_kb())
+async def show_status_menu(callback: types.CallbackQuery, user: User, cursor=None):
+    tenant_id = user.tenant_id
+    view = await view_cache.get_or_render(("smenu", tenant_id, cursor), list_scope(tenant_id),
+                                          lambda: render_status_menu(tenant_id, cursor))
+    await show_view(callback, view)
+
+
+async def render_status_menu(tenant_id: int, cursor=None) -> View:
+    page = await db.list_batch_summaries(tenant_id, cursor)
+    if not page.items and cursor:
+        page = await db.list_batch_summaries(tenant_id)
+
+    if not page.items:
+        return View("📦 Партій ще немає.", main_menu_kb())
 
     kb = InlineKeyboardBuilder()
-    for b in batches:
-        kb.button(text=f"🗂️ Партія {b[0]} ({b[2]} шт.)", callback_data=f"status_batch_{b[0]}")
-    kb.button(text="🏠 Головне меню", callback_data="go_home_plain")
+    for b in page.items:
+        kb.button(text=f"🗂️ Партія {b.id} ({b.count} шт.)", callback_data=f"status_batch_{b.id}")
     kb.adjust(1)
-    await callback.message.edit_text("🔧 Вибери партію:", reply_markup=kb.as_markup())
+    if nav := page_nav(page, "smenu_pg_"):
+        kb.row(*nav)
+    kb.row(InlineKeyboardButton(text="🏠 Головне меню", callback_data="go_home_plain"))
+    return View("🔧 Вибери партію:", kb.as_markup())
+
+
+@dp.callback_query(F.data.startswith("smenu_pg_"))
+async def status_menu_page(callback: types.CallbackQuery, user: User):
+    await show_status_menu(callback, user, parse_cursor(callback.data.split("_")[2]))
 
 
 @dp.callback_query(F.data.startswith("status_batch_"))
-async def status_batch(callback: types.CallbackQuery):
-    batch_id = int(callback.data.split("_")[2])
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id, department, status FROM cartridges WHERE batch_id=?", (batch_id,))
-    rows = cur.fetchall()
-    conn.close()
+async def status_batch(callback: types.CallbackQuery, user: User):
+    parts = callback.data.split("_")
+    batch_id = int(parts[2])
+    cursor = parse_cursor(parts[3] if len(parts) > 3 else None)
+    tenant_id = user.tenant_id
+    view = await view_cache.get_or_render(
+        ("status_batch", tenant_id, batch_id, cursor), batch_scope(tenant_id, batch_id),
+        lambda: render_status_batch(tenant_id, batch_id, cursor),
+    )
+    await show_view(callback, view)
+
+
+async def render_status_batch(tenant_id: int, batch_id: int, cursor=None) -> View:
+    page = await db.batch_cartridges(tenant_id, batch_id, cursor, size=20)
+    if not page.items and cursor:
+        page = await db.batch_cartridges(tenant_id, batch_id, size=20)
 
-    if not rows:
-        return await callback.message.edit_text(f"📭 У партії {batch_id} немає картриджів.", reply_markup=main_menu_kb())
+    if not page.items:
+        return View(f"📭 У партії {batch_id} немає картриджів.", main_menu_kb())
 
     kb = InlineKeyboardBuilder()
-    for r in rows:
-        kb.button(text=f"#{r[0]} | {r[1]} ({r[2]})", callback_data=f"edit_cart_{r[0]}")
-    kb.button(text="⬅️ Назад", callback_data="menu_status")
-    kb.button(text="🏠 Головне меню", callback_data="go_home_plain")
+    for r in page.items:
+        kb.button(text=f"#{r.id} | {r.department} ({r.status})", callback_data=f"edit_cart_{r.id}")
     kb.adjust(1)
-    await callback.message.edit_text(f"🔧 Партія {batch_id} — вибери картридж:", reply_markup=kb.as_markup())
+    if nav := page_nav(page, f"status_batch_{batch_id}_"):
+        kb.row(*nav)
+    kb.row(
+        InlineKeyboardButton(text="⬅️ Назад", callback_data="menu_status"),
+        InlineKeyboardButton(text="🏠 Головне меню", callback_data="go_home_plain"),
+    )
+    return View(f"🔧 Партія {batch_id} — вибери картридж:", kb.as_markup())
+
+
+# === 🔎 Пошук: /find та inline-режим ===
+# Текст запиту зберігається у FSM-даних, callback_data несе лише курсор сторінки
+INLINE_PAGE = 20
+
+
+async def render_find(tenant_id: int, raw: str, cursor=None) -> View:
+    query = parse_query(raw)
+    page = await db.search_cartridges(tenant_id, **query._asdict(), cursor=cursor)
+    if not page.items and cursor:
+        page = await db.search_cartridges(tenant_id, **query._asdict())
+    if not page.items:
+        return View(f"🔎 «{raw}»: нічого не знайдено.")
+
+    text = f"🔎 Результати за запитом «{raw}»:\n\n" + "\n".join(
+        f"{cart_line(r)} • партія {r.batch_id}" for r in page.items
+    )
+    kb = InlineKeyboardBuilder()
+    for r in page.items:
+        kb.button(text=f"🔧 Статус #{r.id}", callback_data=f"edit_cart_{r.id}")
+    kb.adjust(2)
+    if nav := page_nav(page, "find_pg_"):
+        kb.row(*nav)
+    kb.row(InlineKeyboardButton(text="🏠 Головне меню", callback_data="go_home_plain"))
+    return View(text, kb.as_markup())
+
+
+@dp.message(Command("find"))
+async def find(message: types.Message, command: CommandObject, state: FSMContext, user: User):
+    if not command.args:
+        return await message.answer(FIND_HELP)
+    try:
+        view = await render_find(user.tenant_id, command.args.strip())
+    except ValueError as e:
+        return await message.answer(f"❌ {e}\n\n{FIND_HELP}")
+    await state.update_data(find_query=command.args.strip())
+    await message.answer(view.text, reply_markup=view.markup)
+
+
+@dp.callback_query(F.data.startswith("find_pg_"))
+async def find_page(callback: types.CallbackQuery, state: FSMContext, user: User):
+    raw = (await state.get_data()).get("find_query")
+    if not raw:
+        return await callback.answer("Пошук застарів — повторіть /find", show_alert=True)
+    await show_view(callback, await render_find(user.tenant_id, raw, parse_cursor(callback.data.split("_")[2])))
+
+
+@dp.inline_query()
+async def inline_find(query: types.InlineQuery, user: User):
+    try:
+        search = parse_query(query.query)
+    except ValueError:
+        return await query.answer([], cache_time=5, is_personal=True)
+
+    page = await db.search_cartridges(user.tenant_id, **search._asdict(), cursor=parse_cursor(query.offset),
+                                      size=INLINE_PAGE)
+    me = await bot.me()
+    results = [
+        InlineQueryResultArticle(
+            id=str(r.id),
+            title=f"#{r.id} • {r.department}",
+            description=f"{r.status} • партія {r.batch_id} • 📅 {display_date(r.date_received) or '—'}",
+            input_message_content=InputTextMessageContent(message_text=f"{cart_line(r)} • партія {r.batch_id}"),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(text="🔧 Змінити статус", url=f"https://t.me/{me.username}?start=cart_{r.id}")
+            ]]),
+        )
+        for r in page.items
+    ]
+    next_offset = f"a{page.items[-1].id}" if page.has_next else ""
+    await query.answer(results, cache_time=5, is_personal=True, next_offset=next_offset)
+
+
+async def show_cart_card(message: types.Message, user: User, cid: int):
+    r = await db.get_cartridge(user.tenant_id, cid)
+    if r is None:
+        return await message.answer("Запис не знайдено")
+    await message.answer(f"{cart_line(r)} • партія {r.batch_id}", reply_markup=status_kb_for_cart(cid))
+
+
+# === 📤 Експорт у файл ===
+async def send_export(chat_id: int, tenant_id: int, req: export.ExportRequest):
+    await bot.send_chat_action(chat_id, "upload_document")
+    path, rows = await export.build_export(tenant_id, req)
+    try:
+        if not rows:
+            return await bot.send_message(chat_id, "📭 Немає записів для експорту.")
+        await bot.send_document(chat_id, FSInputFile(path, filename=req.filename), caption=f"📤 Рядків: {rows}")
+    finally:
+        os.unlink(path)
+
+
+@dp.message(Command("export"))
+async def export_cmd(message: types.Message, command: CommandObject, user: User):
+    try:
+        req = export.parse_args(command.args)
+    except ValueError as e:
+        return await message.answer(f"❌ {e}\n\n{export.EXPORT_HELP}")
+    await send_export(message.chat.id, user.tenant_id, req)
+
+
+@dp.callback_query(F.data.startswith("export_"))
+async def export_batch(callback: types.CallbackQuery, user: User):
+    await callback.answer("📤 Готую файл…")
+    await send_export(callback.message.chat.id, user.tenant_id,
+                      export.ExportRequest(batch_id=int(callback.data.split("_")[1])))
 
 
 # === 🆕 Нова партія (окремий пункт меню) ===
-async def new_batch(callback: types.CallbackQuery):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+async def new_batch(callback: types.CallbackQuery, user: User):
     # закриваємо активні та створюємо нову як активну
-    cur.execute("UPDATE batches SET status='closed' WHERE status='active'")
-    cur.execute("INSERT INTO batches (created_at, status) VALUES (?, 'active')", (current_date(),))
-    conn.commit()
-    conn.close()
+    await db.start_new_batch(user.tenant_id, current_date())
 
-    sync_to_sheets()
+    # статус змінюється у всіх закритих партіях офісу
+    view_cache.invalidate_tenant(user.tenant_id)
+    sync_workers.notify(user.tenant_id)
     await callback.message.edit_text("📦 Створено нову партію!", reply_markup=main_menu_kb())
 
 
 # === 🚀 Запуск ===
 async def main():
-    init_db()
+    await init_db()
     print("🤖 Бот запущено…")
-    sync_to_sheets()
-    await dp.start_polling(bot)
+    # воркер сам дочитує outbox (sheet_dirty), що лишився з попереднього запуску
+    await sync_workers.start()
+    backups.start()
+    metrics_runner = None
+    try:
+        if METRICS_PORT:
+            metrics_runner = await metrics.start_metrics_server(METRICS_HOST, METRICS_PORT)
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await sync_workers.stop()
+        await backups.stop()
+        db.database.close()
 
 
 if __name__ == "__main__":
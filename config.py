@@ -0,0 +1,51 @@
+import os
+
+
+# === 🔧 Налаштування ===
+TOKEN = os.getenv("TOKEN")
+ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
+GSHEET_ID = os.getenv("GSHEET_ID")
+DB_PATH = os.path.join(os.path.dirname(__file__), "cartridges.db")
+
+# === 🌐 Режим роботи: polling (за замовчуванням) або webhook ===
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")              # публічна адреса, напр. https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "16"))
+
+# === 💾 FSM: незавершені сценарії старші за цей час (с) видаляються ===
+FSM_TTL = int(os.getenv("FSM_TTL", str(24 * 3600)))
+# кілька процесів бота на одній базі: кеш FSM звіряється з PRAGMA data_version не частіше ніж раз на N с
+FSM_SHARED = os.getenv("FSM_SHARED", "0") == "1"
+FSM_VERSION_CHECK = float(os.getenv("FSM_VERSION_CHECK", "0.25"))
+
+# === ⬇️ Імпорт правок з Google Sheets: інтервал перевірки (с), 0 — лише за /pull ===
+SHEETS_PULL_INTERVAL = int(os.getenv("SHEETS_PULL_INTERVAL", "300"))
+
+# === 📈 Метрики: поріг повільного запиту до БД (мс, 0 — вимкнено) і окремий сервер /metrics ===
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")   # не публічний інтерфейс вебхука
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# токен для /metrics (Authorization: Bearer …); без нього вебхук /metrics не віддає
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# === 🚦 Ліміти вихідних викликів Bot API (повідомлень за секунду) ===
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))          # приватний чат
+TG_GROUP_RATE = float(os.getenv("TG_GROUP_RATE", str(20 / 60)))  # група / канал
+TG_CHAT_BURST = int(os.getenv("TG_CHAT_BURST", "3"))
+
+# === 🗄️ Резервні копії: каталог, інтервали (с, 0 — вимкнено) і ротація стиснених знімків ===
+BACKUP_DIR = os.getenv("BACKUP_DIR", os.path.join(os.path.dirname(__file__), "backups"))
+BACKUP_INTERVAL = int(os.getenv("BACKUP_INTERVAL", "3600"))            # онлайн-копія (backup API)
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", str(24 * 3600)))  # VACUUM INTO + gzip
+SNAPSHOT_KEEP_DAILY = int(os.getenv("SNAPSHOT_KEEP_DAILY", "7"))        # останній знімок кожного з N днів
+SNAPSHOT_KEEP_WEEKLY = int(os.getenv("SNAPSHOT_KEEP_WEEKLY", "8"))      # … і кожного з N тижнів
+
+# === 📦 Архів: закриті партії без руху довше за N днів переносяться в окремий файл (0 — вимкнено) ===
+# Файл копіюється і знімається разом з базою (backup.py); в /find, /export і таблиці архівних партій немає.
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH", os.path.join(os.path.dirname(__file__), "archive.db"))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "730"))
@@ -0,0 +1,1190 @@
+import asyncio
+import functools
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, NamedTuple
+
+from config import DB_PATH
+
+
+# === ⚙️ Підключення ===
+# Одне довгоживуче з'єднання в режимі WAL; всі запити виконуються в окремому
+# потоці БД, тож обробники aiogram ніколи не блокують цикл подій.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # ~16 МБ сторінкового кешу
+    "PRAGMA mmap_size=134217728",    # 128 МБ
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+# кеш підготовлених запитів sqlite3 (SQL нижче — константні рядки)
+STATEMENT_CACHE = 256
+
+
+def connect(path: str = DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=STATEMENT_CACHE)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class Database:
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._thread: threading.Thread | None = None
+        # хук метрик: instrument(назва виклику, секунди, [SQL]) — див. metrics.observe_db
+        self.instrument = None
+        self._statements: list[str] = []
+
+    def _trace(self, sql: str):
+        # кроки тригерів sqlite повідомляє як «-- …» — рахуємо лише інструкції верхнього рівня
+        if not sql.startswith("--"):
+            self._statements.append(sql)
+
+    def _invoke(self, fn, args, kwargs):
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._thread = threading.current_thread()
+            if self.instrument is not None:
+                self._conn.set_trace_callback(self._trace)
+        if self.instrument is None:
+            return fn(self._conn, *args, **kwargs)
+        self._statements = []
+        started = time.perf_counter()
+        try:
+            return fn(self._conn, *args, **kwargs)
+        finally:
+            self.instrument(getattr(fn, "__name__", "call"), time.perf_counter() - started, self._statements)
+
+    async def call(self, fn, *args, **kwargs):
+        """Виконує fn(conn, ...) у потоці БД і повертає результат."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._invoke, fn, args, kwargs)
+
+    def call_sync(self, fn, *args, **kwargs):
+        """Те саме для коду, що вже працює в іншому потоці (executor, воркери)."""
+        if threading.current_thread() is self._thread:
+            return fn(self._conn, *args, **kwargs)
+        return self._executor.submit(self._invoke, fn, args, kwargs).result()
+
+    def reader(self) -> sqlite3.Connection:
+        """Окреме з'єднання лише для читання: довгі вибірки не займають потік БД (WAL)."""
+        conn = connect(self.path)
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def close(self):
+        def _close(conn):
+            conn.close()
+            self._conn = None
+        if self._conn is not None:
+            self.call_sync(_close)
+
+
+database = Database()
+
+
+def repository(fn):
+    """Робить з fn(conn, ...) асинхронну функцію, що виконується в потоці БД.
+
+    Синхронний варіант доступний як fn.sync — для фонових потоків.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await database.call(fn, *args, **kwargs)
+    wrapper.sync = functools.partial(database.call_sync, fn)
+    return wrapper
+
+
+# === 🧰 Загальні помічники ===
+@repository
+def fetchall(conn, sql: str, params=()) -> list[tuple]:
+    return conn.execute(sql, params).fetchall()
+
+
+@repository
+def fetchone(conn, sql: str, params=()) -> tuple | None:
+    return conn.execute(sql, params).fetchone()
+
+
+@repository
+def execute(conn, sql: str, params=()) -> int:
+    with conn:
+        return conn.execute(sql, params).rowcount
+
+
+# === 🗓️ Дати ===
+# У базі дати зберігаються в ISO-8601 (сортуються й фільтруються діапазоном),
+# ДД.ММ.РРРР — лише формат відображення.
+DATE_FMT = "%Y-%m-%d"
+DISPLAY_FMT = "%d.%m.%Y"
+
+
+def display_date(value: str | None) -> str | None:
+    if not value:
+        return value
+    try:
+        return datetime.strptime(value, DATE_FMT).strftime(DISPLAY_FMT)
+    except ValueError:
+        return value
+
+
+# === 🏷️ Статуси ===
+# код кнопки → (статус, поле дати, колонка лічильника в batch_summary)
+STATUS_MAP = {
+    "s1": ("⛔ Вилучено у працівника", "date_received", "withdrawn"),
+    "s2": ("🔄 Відправлено на фірму", "date_sent", "sent"),
+    "s3": ("✅ Прибуло з фірми", "date_returned", "returned"),
+    "s4": ("📦 Видано працівнику", "date_given", "issued"),
+}
+STATUS_WITHDRAWN = STATUS_MAP["s1"][0]
+
+
+# === 📁 Схема та міграції ===
+# Версія схеми зберігається в PRAGMA user_version; кожна міграція виконується
+# в одній транзакції, тож база ніколи не лишається в проміжному стані.
+SYNC_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS cartridges_dirty_ins AFTER INSERT ON cartridges BEGIN
+        INSERT INTO sheet_dirty(cartridge_id) VALUES (NEW.id)
+        ON CONFLICT(cartridge_id) DO UPDATE SET seq = seq + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS cartridges_dirty_upd AFTER UPDATE ON cartridges BEGIN
+        INSERT INTO sheet_dirty(cartridge_id) VALUES (NEW.id)
+        ON CONFLICT(cartridge_id) DO UPDATE SET seq = seq + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS cartridges_dirty_del AFTER DELETE ON cartridges BEGIN
+        INSERT INTO sheet_dirty(cartridge_id) VALUES (OLD.id)
+        ON CONFLICT(cartridge_id) DO UPDATE SET seq = seq + 1;
+    END;
+"""
+
+# v1 — початкова схема (як її створював старий init_db) + журнал синхронізації
+M1_BASELINE = """
+    CREATE TABLE IF NOT EXISTS cartridges(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date_received TEXT,
+        department TEXT,
+        status TEXT,
+        date_sent TEXT,
+        date_returned TEXT,
+        date_given TEXT,
+        batch_id INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS batches(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT,
+        status TEXT
+    );
+
+    -- журнал змін для синхронізації з Google Sheets:
+    -- sheet_dirty — id картриджів, змінених після останньої синхронізації
+    --               (seq росте з кожною зміною, щоб не загубити правки під час синку)
+    -- sheet_rows  — карта id картриджа → номер рядка в аркуші
+    CREATE TABLE IF NOT EXISTS sheet_dirty(
+        cartridge_id INTEGER PRIMARY KEY,
+        seq INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE TABLE IF NOT EXISTS sheet_rows(
+        cartridge_id INTEGER PRIMARY KEY,
+        row INTEGER NOT NULL
+    );
+""" + SYNC_TRIGGERS
+
+
+def _iso(col: str) -> str:
+    """SQL-вираз: ДД.ММ.РРРР → РРРР-ММ-ДД (інші значення лишаються як є)."""
+    return (
+        f"CASE WHEN {col} GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]' "
+        f"THEN substr({col}, 7, 4) || '-' || substr({col}, 4, 2) || '-' || substr({col}, 1, 2) "
+        f"ELSE {col} END"
+    )
+
+
+# v2 — ISO-дати, зовнішній ключ на партію з ON DELETE CASCADE та індекси
+M2_ISO_DATES_FK_INDEXES = f"""
+    -- партії, на які ще посилаються картриджі, але яких уже немає
+    INSERT INTO batches (id, created_at, status)
+    SELECT DISTINCT batch_id, NULL, 'closed' FROM cartridges
+    WHERE batch_id IS NOT NULL AND batch_id NOT IN (SELECT id FROM batches);
+
+    UPDATE batches SET created_at = {_iso("created_at")};
+
+    CREATE TABLE cartridges_new(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date_received TEXT,
+        department TEXT,
+        status TEXT,
+        date_sent TEXT,
+        date_returned TEXT,
+        date_given TEXT,
+        batch_id INTEGER REFERENCES batches(id) ON DELETE CASCADE
+    );
+    INSERT INTO cartridges_new
+    SELECT id, {_iso("date_received")}, department, status,
+           {_iso("date_sent")}, {_iso("date_returned")}, {_iso("date_given")}, batch_id
+    FROM cartridges;
+    DROP TABLE cartridges;
+    ALTER TABLE cartridges_new RENAME TO cartridges;
+
+    CREATE INDEX idx_cartridges_batch ON cartridges(batch_id, id);
+    CREATE INDEX idx_cartridges_status ON cartridges(status);
+    CREATE INDEX idx_cartridges_department ON cartridges(department);
+    CREATE INDEX idx_batches_status ON batches(status);
+""" + SYNC_TRIGGERS
+
+
+def _m2(conn):
+    # перебудова таблиці скидає лічильник AUTOINCREMENT до max(id) — зберігаємо старий
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='cartridges'").fetchone()
+    _run_script(conn, M2_ISO_DATES_FK_INDEXES)
+    if row:
+        conn.execute("UPDATE sqlite_sequence SET seq=max(seq, ?) WHERE name='cartridges'", row)
+
+
+def _summary_delta(row: str, sign: str) -> str:
+    cols = [f"total = total {sign} 1"] + [
+        f"{col} = {col} {sign} ({row}.status = '{label}')" for label, _, col in STATUS_MAP.values()
+    ]
+    return ", ".join(cols)
+
+
+# v3 — денормалізовані лічильники партій, які підтримують тригери
+M3_BATCH_SUMMARY = f"""
+    CREATE TABLE batch_summary(
+        batch_id INTEGER PRIMARY KEY REFERENCES batches(id) ON DELETE CASCADE,
+        total INTEGER NOT NULL DEFAULT 0,
+        withdrawn INTEGER NOT NULL DEFAULT 0,
+        sent INTEGER NOT NULL DEFAULT 0,
+        returned INTEGER NOT NULL DEFAULT 0,
+        issued INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TRIGGER batches_summary_ins AFTER INSERT ON batches BEGIN
+        INSERT OR IGNORE INTO batch_summary(batch_id) VALUES (NEW.id);
+    END;
+    CREATE TRIGGER cartridges_summary_ins AFTER INSERT ON cartridges BEGIN
+        UPDATE batch_summary SET {_summary_delta("NEW", "+")} WHERE batch_id = NEW.batch_id;
+    END;
+    CREATE TRIGGER cartridges_summary_del AFTER DELETE ON cartridges BEGIN
+        UPDATE batch_summary SET {_summary_delta("OLD", "-")} WHERE batch_id = OLD.batch_id;
+    END;
+    CREATE TRIGGER cartridges_summary_upd AFTER UPDATE OF status, batch_id ON cartridges BEGIN
+        UPDATE batch_summary SET {_summary_delta("OLD", "-")} WHERE batch_id = OLD.batch_id;
+        UPDATE batch_summary SET {_summary_delta("NEW", "+")} WHERE batch_id = NEW.batch_id;
+    END;
+"""
+
+
+def _m3(conn):
+    _run_script(conn, M3_BATCH_SUMMARY)
+    _rebuild_batch_summary(conn)
+
+
+STATUS_SENT = STATUS_MAP["s2"][0]
+STATUS_RETURNED = STATUS_MAP["s3"][0]
+
+
+def _quarter(ts: str) -> str:
+    return f"strftime('%Y', {ts}) || '-Q' || ((CAST(strftime('%m', {ts}) AS INTEGER) + 2) / 3)"
+
+
+# v4 — журнал переходів статусів і агрегати, що оновлюються з кожною подією:
+#   stats_turnaround — гістограма днів на фірмі (відправлено → прибуло) за кварталом і відділом
+#   stats_weekly     — кількість переходів у кожен статус за тиждень
+M4_EVENTS = f"""
+    CREATE TABLE cartridge_events(
+        id INTEGER PRIMARY KEY,
+        cartridge_id INTEGER NOT NULL,
+        ts TEXT NOT NULL,
+        status TEXT NOT NULL,
+        department TEXT,
+        batch_id INTEGER
+    );
+    CREATE INDEX idx_events_cartridge_ts ON cartridge_events(cartridge_id, ts);
+
+    CREATE TABLE stats_turnaround(
+        period TEXT NOT NULL,
+        department TEXT NOT NULL,
+        days INTEGER NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (period, department, days)
+    ) WITHOUT ROWID;
+    CREATE TABLE stats_weekly(
+        week TEXT NOT NULL,
+        status TEXT NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (week, status)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER cartridges_event_ins AFTER INSERT ON cartridges BEGIN
+        INSERT INTO cartridge_events (cartridge_id, ts, status, department, batch_id)
+        VALUES (NEW.id, strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'), NEW.status, NEW.department, NEW.batch_id);
+    END;
+    CREATE TRIGGER cartridges_event_upd AFTER UPDATE OF status ON cartridges
+    WHEN NEW.status IS NOT OLD.status BEGIN
+        INSERT INTO cartridge_events (cartridge_id, ts, status, department, batch_id)
+        VALUES (NEW.id, strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'), NEW.status, NEW.department, NEW.batch_id);
+    END;
+
+    CREATE TRIGGER events_weekly AFTER INSERT ON cartridge_events
+    WHEN julianday(NEW.ts) IS NOT NULL BEGIN
+        INSERT INTO stats_weekly (week, status, n) VALUES (strftime('%Y-W%W', NEW.ts), NEW.status, 1)
+        ON CONFLICT(week, status) DO UPDATE SET n = n + 1;
+    END;
+    CREATE TRIGGER events_turnaround AFTER INSERT ON cartridge_events
+    WHEN NEW.status = '{STATUS_RETURNED}' AND julianday(NEW.ts) IS NOT NULL BEGIN
+        INSERT INTO stats_turnaround (period, department, days, n)
+        SELECT {_quarter("NEW.ts")}, COALESCE(NEW.department, ''),
+               CAST(julianday(NEW.ts) - julianday(e.ts) AS INTEGER), 1
+        FROM cartridge_events e
+        WHERE e.cartridge_id = NEW.cartridge_id AND e.status = '{STATUS_SENT}'
+          AND e.id != NEW.id AND e.ts <= NEW.ts AND julianday(e.ts) IS NOT NULL
+        ORDER BY e.ts DESC LIMIT 1
+        ON CONFLICT(period, department, days) DO UPDATE SET n = n + 1;
+    END;
+"""
+
+
+def _m4(conn):
+    _run_script(conn, M4_EVENTS)
+    # відновлюємо історію з наявних дат: спершу всі «вилучено», потім «відправлено» і т.д.,
+    # щоб тригер знайшов відправлення раніше за повернення
+    for label, field, _ in STATUS_MAP.values():
+        conn.execute(f"""
+            INSERT INTO cartridge_events (cartridge_id, ts, status, department, batch_id)
+            SELECT id, {field} || 'T00:00:00', ?, department, batch_id
+            FROM cartridges
+            WHERE {field} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+            ORDER BY {field}, id
+        """, (label,))
+
+
+# v5 — стан FSM (aiogram) у тій самій базі, щоб переживати перезапуски
+M5_FSM = """
+    CREATE TABLE fsm_state(
+        key TEXT PRIMARY KEY,
+        state TEXT,
+        data TEXT NOT NULL DEFAULT '{}',
+        updated_at REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_fsm_updated ON fsm_state(updated_at);
+"""
+
+
+# v6 — пошук: FTS5-індекс (триграми — пошук за підрядком) по відділу,
+# який тригери тримають узгодженим з cartridges, та індекси дат
+FTS_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS cartridges_fts_ins AFTER INSERT ON cartridges BEGIN
+        INSERT INTO cartridges_fts(rowid, department) VALUES (NEW.id, NEW.department);
+    END;
+    CREATE TRIGGER IF NOT EXISTS cartridges_fts_del AFTER DELETE ON cartridges BEGIN
+        INSERT INTO cartridges_fts(cartridges_fts, rowid, department) VALUES ('delete', OLD.id, OLD.department);
+    END;
+    CREATE TRIGGER IF NOT EXISTS cartridges_fts_upd AFTER UPDATE OF department ON cartridges BEGIN
+        INSERT INTO cartridges_fts(cartridges_fts, rowid, department) VALUES ('delete', OLD.id, OLD.department);
+        INSERT INTO cartridges_fts(rowid, department) VALUES (NEW.id, NEW.department);
+    END;
+"""
+
+M6_SEARCH = """
+    CREATE VIRTUAL TABLE cartridges_fts USING fts5(
+        department, content='cartridges', content_rowid='id', tokenize='trigram'
+    );
+    INSERT INTO cartridges_fts(cartridges_fts) VALUES ('rebuild');
+    CREATE INDEX idx_cartridges_received ON cartridges(date_received);
+    CREATE INDEX idx_cartridges_sent ON cartridges(date_sent);
+""" + FTS_TRIGGERS
+
+
+# v7 — хеш рядка, як його востаннє записано в аркуш (для імпорту правок з таблиці)
+M7_SHEET_HASH = """
+    ALTER TABLE sheet_rows ADD COLUMN hash TEXT;
+"""
+
+
+# v8 — стан воркера синхронізації (backoff переживає перезапуск)
+M8_SYNC_STATE = """
+    CREATE TABLE sheet_sync_state(
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        attempt INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL,
+        last_error TEXT,
+        last_error_at REAL,
+        last_success_at REAL
+    );
+    INSERT INTO sheet_sync_state (id) VALUES (1);
+"""
+
+
+# v9 — кілька офісів (орендарів) в одній базі: tenants, користувачі з ролями,
+# tenant_id у партіях, картриджах, журналі подій, агрегатах і outbox синхронізації.
+# Стовпці додаються через ALTER TABLE — cartridges не перебудовується, тож тригери
+# FTS і лічильників лишаються як є. Наявні дані належать орендарю 1.
+DEFAULT_TENANT = 1
+
+SYNC_TRIGGERS_V9 = """
+    CREATE TRIGGER cartridges_dirty_ins AFTER INSERT ON cartridges BEGIN
+        INSERT INTO sheet_dirty(cartridge_id, tenant_id) VALUES (NEW.id, NEW.tenant_id)
+        ON CONFLICT(cartridge_id) DO UPDATE SET seq = seq + 1;
+    END;
+    CREATE TRIGGER cartridges_dirty_upd AFTER UPDATE ON cartridges BEGIN
+        INSERT INTO sheet_dirty(cartridge_id, tenant_id) VALUES (NEW.id, NEW.tenant_id)
+        ON CONFLICT(cartridge_id) DO UPDATE SET seq = seq + 1;
+    END;
+    CREATE TRIGGER cartridges_dirty_del AFTER DELETE ON cartridges BEGIN
+        INSERT INTO sheet_dirty(cartridge_id, tenant_id) VALUES (OLD.id, OLD.tenant_id)
+        ON CONFLICT(cartridge_id) DO UPDATE SET seq = seq + 1;
+    END;
+"""
+
+M9_TENANTS = f"""
+    CREATE TABLE tenants(
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        gsheet_id TEXT,                 -- NULL у орендаря 1 — таблиця з GSHEET_ID
+        created_at TEXT
+    );
+    INSERT INTO tenants (id, name) VALUES ({DEFAULT_TENANT}, 'Основний');
+
+    -- user_id — Telegram id; власник (owner) керує всіма офісами, tenant_id — офіс, з яким він працює зараз
+    CREATE TABLE users(
+        user_id INTEGER PRIMARY KEY,
+        tenant_id INTEGER NOT NULL REFERENCES tenants(id),
+        role TEXT NOT NULL CHECK (role IN ('owner', 'admin')),
+        name TEXT,
+        added_at TEXT
+    );
+    CREATE INDEX idx_users_tenant ON users(tenant_id);
+
+    ALTER TABLE batches ADD COLUMN tenant_id INTEGER NOT NULL DEFAULT {DEFAULT_TENANT} REFERENCES tenants(id);
+    ALTER TABLE cartridges ADD COLUMN tenant_id INTEGER NOT NULL DEFAULT {DEFAULT_TENANT} REFERENCES tenants(id);
+
+    -- індекси починаються з tenant_id: історія одного офісу не зачіпає вибірки іншого
+    DROP INDEX idx_batches_status;
+    CREATE INDEX idx_batches_tenant ON batches(tenant_id, id);
+    CREATE INDEX idx_batches_tenant_status ON batches(tenant_id, status);
+    DROP INDEX idx_cartridges_status;
+    DROP INDEX idx_cartridges_department;
+    DROP INDEX idx_cartridges_received;
+    DROP INDEX idx_cartridges_sent;
+    CREATE INDEX idx_cartridges_tenant ON cartridges(tenant_id, id);
+    CREATE INDEX idx_cartridges_tenant_batch ON cartridges(tenant_id, batch_id, id);
+    CREATE INDEX idx_cartridges_tenant_status ON cartridges(tenant_id, status, id);
+    CREATE INDEX idx_cartridges_tenant_received ON cartridges(tenant_id, date_received, id);
+    CREATE INDEX idx_cartridges_tenant_sent ON cartridges(tenant_id, date_sent, id);
+
+    -- журнал подій і агрегати статистики
+    ALTER TABLE cartridge_events ADD COLUMN tenant_id INTEGER NOT NULL DEFAULT {DEFAULT_TENANT};
+    DROP TRIGGER cartridges_event_ins;
+    DROP TRIGGER cartridges_event_upd;
+    DROP TRIGGER events_weekly;
+    DROP TRIGGER events_turnaround;
+
+    CREATE TABLE stats_turnaround_new(
+        tenant_id INTEGER NOT NULL,
+        period TEXT NOT NULL,
+        department TEXT NOT NULL,
+        days INTEGER NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (tenant_id, period, department, days)
+    ) WITHOUT ROWID;
+    INSERT INTO stats_turnaround_new SELECT {DEFAULT_TENANT}, period, department, days, n FROM stats_turnaround;
+    DROP TABLE stats_turnaround;
+    ALTER TABLE stats_turnaround_new RENAME TO stats_turnaround;
+
+    CREATE TABLE stats_weekly_new(
+        tenant_id INTEGER NOT NULL,
+        week TEXT NOT NULL,
+        status TEXT NOT NULL,
+        n INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (tenant_id, week, status)
+    ) WITHOUT ROWID;
+    INSERT INTO stats_weekly_new SELECT {DEFAULT_TENANT}, week, status, n FROM stats_weekly;
+    DROP TABLE stats_weekly;
+    ALTER TABLE stats_weekly_new RENAME TO stats_weekly;
+
+    CREATE TRIGGER cartridges_event_ins AFTER INSERT ON cartridges BEGIN
+        INSERT INTO cartridge_events (cartridge_id, ts, status, department, batch_id, tenant_id)
+        VALUES (NEW.id, strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'), NEW.status, NEW.department,
+                NEW.batch_id, NEW.tenant_id);
+    END;
+    CREATE TRIGGER cartridges_event_upd AFTER UPDATE OF status ON cartridges
+    WHEN NEW.status IS NOT OLD.status BEGIN
+        INSERT INTO cartridge_events (cartridge_id, ts, status, department, batch_id, tenant_id)
+        VALUES (NEW.id, strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'), NEW.status, NEW.department,
+                NEW.batch_id, NEW.tenant_id);
+    END;
+    CREATE TRIGGER events_weekly AFTER INSERT ON cartridge_events
+    WHEN julianday(NEW.ts) IS NOT NULL BEGIN
+        INSERT INTO stats_weekly (tenant_id, week, status, n)
+        VALUES (NEW.tenant_id, strftime('%Y-W%W', NEW.ts), NEW.status, 1)
+        ON CONFLICT(tenant_id, week, status) DO UPDATE SET n = n + 1;
+    END;
+    CREATE TRIGGER events_turnaround AFTER INSERT ON cartridge_events
+    WHEN NEW.status = '{STATUS_RETURNED}' AND julianday(NEW.ts) IS NOT NULL BEGIN
+        INSERT INTO stats_turnaround (tenant_id, period, department, days, n)
+        SELECT NEW.tenant_id, {_quarter("NEW.ts")}, COALESCE(NEW.department, ''),
+               CAST(julianday(NEW.ts) - julianday(e.ts) AS INTEGER), 1
+        FROM cartridge_events e
+        WHERE e.cartridge_id = NEW.cartridge_id AND e.status = '{STATUS_SENT}'
+          AND e.id != NEW.id AND e.ts <= NEW.ts AND julianday(e.ts) IS NOT NULL
+        ORDER BY e.ts DESC LIMIT 1
+        ON CONFLICT(tenant_id, period, department, days) DO UPDATE SET n = n + 1;
+    END;
+
+    -- синхронізація: у кожного орендаря свій аркуш, своя карта рядків і свій backoff
+    ALTER TABLE sheet_dirty ADD COLUMN tenant_id INTEGER NOT NULL DEFAULT {DEFAULT_TENANT};
+    ALTER TABLE sheet_rows ADD COLUMN tenant_id INTEGER NOT NULL DEFAULT {DEFAULT_TENANT};
+    CREATE INDEX idx_sheet_dirty_tenant ON sheet_dirty(tenant_id);
+    CREATE INDEX idx_sheet_rows_tenant ON sheet_rows(tenant_id, row);
+    DROP TRIGGER cartridges_dirty_ins;
+    DROP TRIGGER cartridges_dirty_upd;
+    DROP TRIGGER cartridges_dirty_del;
+
+    CREATE TABLE sheet_sync_state_new(
+        tenant_id INTEGER PRIMARY KEY,
+        attempt INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at REAL,
+        last_error TEXT,
+        last_error_at REAL,
+        last_success_at REAL
+    );
+    INSERT INTO sheet_sync_state_new
+    SELECT {DEFAULT_TENANT}, attempt, next_attempt_at, last_error, last_error_at, last_success_at
+    FROM sheet_sync_state;
+    DROP TABLE sheet_sync_state;
+    ALTER TABLE sheet_sync_state_new RENAME TO sheet_sync_state;
+""" + SYNC_TRIGGERS_V9
+
+
+# v10 — окремий FTS-індекс для кожного офісу: пошук в одному офісі не перебирає
+# збіги з історії інших. Тригери кожного індексу спрацьовують лише для свого tenant_id.
+# idx_cartridges_batch дублює (tenant_id, batch_id, id) — видаляємо.
+def _fts_table(tenant_id: int) -> str:
+    return f"cartridges_fts_{int(tenant_id)}"
+
+
+def _create_tenant_fts(conn, tenant_id: int):
+    fts, t = _fts_table(tenant_id), int(tenant_id)
+    _run_script(conn, f"""
+        CREATE VIRTUAL TABLE {fts} USING fts5(
+            department, content='cartridges', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER {fts}_ins AFTER INSERT ON cartridges WHEN NEW.tenant_id = {t} BEGIN
+            INSERT INTO {fts}(rowid, department) VALUES (NEW.id, NEW.department);
+        END;
+        CREATE TRIGGER {fts}_del AFTER DELETE ON cartridges WHEN OLD.tenant_id = {t} BEGIN
+            INSERT INTO {fts}({fts}, rowid, department) VALUES ('delete', OLD.id, OLD.department);
+        END;
+        CREATE TRIGGER {fts}_upd AFTER UPDATE OF department ON cartridges WHEN NEW.tenant_id = {t} BEGIN
+            INSERT INTO {fts}({fts}, rowid, department) VALUES ('delete', OLD.id, OLD.department);
+            INSERT INTO {fts}(rowid, department) VALUES (NEW.id, NEW.department);
+        END;
+    """)
+    # не 'rebuild': він проіндексував би картриджі всіх офісів
+    conn.execute(f"INSERT INTO {fts}(rowid, department) SELECT id, department FROM cartridges WHERE tenant_id = ?",
+                 (t,))
+
+
+def _m10(conn):
+    _run_script(conn, """
+        DROP TRIGGER cartridges_fts_ins;
+        DROP TRIGGER cartridges_fts_del;
+        DROP TRIGGER cartridges_fts_upd;
+        DROP TABLE cartridges_fts;
+        DROP INDEX idx_cartridges_batch;
+    """)
+    for tenant_id, in conn.execute("SELECT id FROM tenants").fetchall():
+        _create_tenant_fts(conn, tenant_id)
+
+
+MIGRATIONS = [
+    M1_BASELINE,
+    _m2,
+    _m3,
+    _m4,
+    M5_FSM,
+    M6_SEARCH,
+    M7_SHEET_HASH,
+    M8_SYNC_STATE,
+    M9_TENANTS,
+    _m10,
+]
+
+
+def _run_script(conn, script: str):
+    # executescript() сам комітить, тому виконуємо інструкції по одній
+    buf = ""
+    for line in script.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            conn.execute(buf)
+            buf = ""
+
+
+def migrate(conn) -> int:
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        # зовнішні ключі не перемикаються всередині транзакції
+        conn.execute("PRAGMA foreign_keys=OFF")
+        try:
+            conn.execute("BEGIN")
+            if callable(step):
+                step(conn)
+            else:
+                _run_script(conn, step)
+            broken = conn.execute("PRAGMA foreign_key_check").fetchall()
+            if broken:
+                raise sqlite3.IntegrityError(f"Порушення зовнішніх ключів після міграції {target}: {broken[:5]}")
+            conn.execute(f"PRAGMA user_version={target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("PRAGMA foreign_keys=ON")
+        print(f"🗄️ Базу оновлено до версії {target}")
+        version = target
+    return version
+
+
+@repository
+def init_schema(conn, today: str, owner_id: int = 0):
+    migrate(conn)
+    with conn:
+        # ADMIN_ID з налаштувань — перший власник; надалі користувачі керуються з бота
+        if owner_id:
+            conn.execute("""
+                INSERT INTO users (user_id, tenant_id, role, added_at) VALUES (?, ?, 'owner', ?)
+                ON CONFLICT(user_id) DO UPDATE SET role='owner'
+            """, (owner_id, DEFAULT_TENANT, today))
+        # гарантуємо хоч одну активну партію в кожного орендаря
+        conn.execute("""
+            INSERT INTO batches (created_at, status, tenant_id)
+            SELECT ?, 'active', t.id FROM tenants t
+            WHERE NOT EXISTS (SELECT 1 FROM batches b WHERE b.tenant_id = t.id AND b.status = 'active')
+        """, (today,))
+
+
+# === 🏢 Орендарі та користувачі ===
+ROLES = ("owner", "admin")
+
+
+class Tenant(NamedTuple):
+    id: int
+    name: str
+    gsheet_id: str | None
+
+
+class User(NamedTuple):
+    user_id: int
+    tenant_id: int
+    role: str
+    name: str | None
+
+
+@repository
+def list_tenants(conn) -> list[Tenant]:
+    return [Tenant(*r) for r in conn.execute("SELECT id, name, gsheet_id FROM tenants ORDER BY id")]
+
+
+@repository
+def create_tenant(conn, name: str, created_at: str) -> int:
+    """Новий офіс одразу з активною партією."""
+    with conn:
+        tenant_id = conn.execute("INSERT INTO tenants (name, created_at) VALUES (?, ?)",
+                                 (name, created_at)).lastrowid
+        conn.execute("INSERT INTO batches (created_at, status, tenant_id) VALUES (?, 'active', ?)",
+                     (created_at, tenant_id))
+        _create_tenant_fts(conn, tenant_id)
+    return tenant_id
+
+
+@repository
+def set_tenant_sheet(conn, tenant_id: int, gsheet_id: str | None) -> bool:
+    with conn:
+        row = conn.execute("SELECT gsheet_id FROM tenants WHERE id=?", (tenant_id,)).fetchone()
+        if row is None:
+            return False
+        if row[0] != gsheet_id:
+            conn.execute("UPDATE tenants SET gsheet_id=? WHERE id=?", (gsheet_id, tenant_id))
+            # карта рядків і хеші належали старій таблиці — нову не імпортуємо, а перебудовуємо
+            conn.execute("DELETE FROM sheet_rows WHERE tenant_id=?", (tenant_id,))
+        return True
+
+
+@repository
+def list_users(conn) -> list[User]:
+    return [User(*r) for r in conn.execute("SELECT user_id, tenant_id, role, name FROM users")]
+
+
+@repository
+def save_user(conn, user: User, added_at: str):
+    with conn:
+        conn.execute("""
+            INSERT INTO users (user_id, tenant_id, role, name, added_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE
+            SET tenant_id=excluded.tenant_id, role=excluded.role, name=COALESCE(excluded.name, name)
+        """, (*user, added_at))
+
+
+@repository
+def delete_user(conn, user_id: int) -> bool:
+    with conn:
+        return conn.execute("DELETE FROM users WHERE user_id=?", (user_id,)).rowcount > 0
+
+
+# === 📄 Посторінкова вибірка ===
+# Keyset-пагінація: курсор ("a", key) — сторінка після key, ("b", key) — перед key.
+# Кожна сторінка — один запит з LIMIT по індексу, незалежно від розміру вибірки.
+Cursor = tuple[str, int]
+
+
+class Page(NamedTuple):
+    items: list
+    has_prev: bool
+    has_next: bool
+
+
+def _page(conn, select: str, where: list[str], params: tuple, key_col: str,
+          descending: bool, cursor: Cursor | None, size: int, factory) -> Page:
+    direction, key = cursor or ("a", None)
+    forward = direction == "a"
+    # рухаючись назад, читаємо у зворотному порядку і розвертаємо сторінку
+    asc = forward != descending
+    if key is not None:
+        where = where + [f"{key_col} {'>' if asc else '<'} ?"]
+        params = params + (key,)
+    rows = conn.execute(
+        f"{select} WHERE {' AND '.join(where) or '1'} "
+        f"ORDER BY {key_col} {'ASC' if asc else 'DESC'} LIMIT ?",
+        params + (size + 1,),
+    ).fetchall()
+    more = len(rows) > size
+    rows = rows[:size]
+    if not forward:
+        rows.reverse()
+    has_prev = key is not None if forward else more
+    has_next = more if forward else key is not None
+    return Page([factory(*r) for r in rows], has_prev, has_next)
+
+
+# === 📦 Партії ===
+class Batch(NamedTuple):
+    id: int
+    created_at: str
+    status: str
+
+
+class BatchSummary(NamedTuple):
+    id: int
+    created_at: str
+    status: str
+    count: int
+    withdrawn: int
+    sent: int
+    returned: int
+    issued: int
+
+
+_SUMMARY_SELECT = """
+    SELECT b.id, b.created_at, b.status,
+           s.total, s.withdrawn, s.sent, s.returned, s.issued
+    FROM batches b
+    JOIN batch_summary s ON s.batch_id = b.id
+"""
+
+
+@repository
+def list_batches(conn, tenant_id: int, cursor: Cursor | None = None, size: int = 10) -> Page:
+    return _page(conn, "SELECT id, created_at, status FROM batches", ["tenant_id=?"], (tenant_id,),
+                 "id", True, cursor, size, Batch)
+
+
+@repository
+def list_batch_summaries(conn, tenant_id: int, cursor: Cursor | None = None, size: int = 10) -> Page:
+    return _page(conn, _SUMMARY_SELECT, ["b.tenant_id=?"], (tenant_id,), "b.id", True, cursor, size, BatchSummary)
+
+
+_SUMMARY_COLUMNS = ("total",) + tuple(col for _, _, col in STATUS_MAP.values())
+
+
+def _rebuild_batch_summary(conn) -> list[int]:
+    """Перераховує лічильники з нуля; повертає id партій, де вони розійшлися."""
+    counts = ", ".join(
+        f"COALESCE(SUM(c.status = '{label}'), 0)" for label, _, _ in STATUS_MAP.values()
+    )
+    fresh = conn.execute(f"""
+        SELECT b.id, COUNT(c.id), {counts}
+        FROM batches b
+        LEFT JOIN cartridges c ON c.batch_id = b.id
+        GROUP BY b.id
+    """).fetchall()
+    stored = {
+        r[0]: r for r in conn.execute(f"SELECT batch_id, {', '.join(_SUMMARY_COLUMNS)} FROM batch_summary")
+    }
+    fixed = [r[0] for r in fresh if stored.pop(r[0], None) != r]
+    # рядки лічильників без партії просто зникають
+    fixed += list(stored)
+    conn.execute("DELETE FROM batch_summary")
+    conn.executemany(
+        f"INSERT INTO batch_summary (batch_id, {', '.join(_SUMMARY_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", fresh
+    )
+    return fixed
+
+
+@repository
+def rebuild_batch_summary(conn) -> list[tuple[int, int]]:
+    """Перераховує лічильники всіх офісів; повертає (офіс, партія) для виправлених партій."""
+    with conn:
+        fixed = _rebuild_batch_summary(conn)
+        return [(tenant_id, batch_id) for batch_id in fixed
+                for tenant_id, in conn.execute("SELECT tenant_id FROM batches WHERE id=?", (batch_id,))]
+
+
+@repository
+def get_batch_summary(conn, tenant_id: int, batch_id: int) -> BatchSummary | None:
+    row = conn.execute(f"{_SUMMARY_SELECT} WHERE b.id=? AND b.tenant_id=?", (batch_id, tenant_id)).fetchone()
+    return BatchSummary(*row) if row else None
+
+
+@repository
+def create_batch(conn, tenant_id: int, created_at: str) -> int:
+    with conn:
+        cur = conn.execute("INSERT INTO batches (created_at, status, tenant_id) VALUES (?, 'active', ?)",
+                           (created_at, tenant_id))
+    return cur.lastrowid
+
+
+@repository
+def start_new_batch(conn, tenant_id: int, created_at: str) -> int:
+    """Закриває активні партії офісу та створює нову активну."""
+    with conn:
+        conn.execute("UPDATE batches SET status='closed' WHERE tenant_id=? AND status='active'", (tenant_id,))
+        cur = conn.execute("INSERT INTO batches (created_at, status, tenant_id) VALUES (?, 'active', ?)",
+                           (created_at, tenant_id))
+    return cur.lastrowid
+
+
+@repository
+def delete_batch(conn, tenant_id: int, batch_id: int) -> bool:
+    # картриджі партії видаляє ON DELETE CASCADE
+    with conn:
+        return conn.execute("DELETE FROM batches WHERE id=? AND tenant_id=?", (batch_id, tenant_id)).rowcount > 0
+
+
+# === 🖨️ Картриджі ===
+class Cartridge(NamedTuple):
+    id: int
+    date_received: str | None
+    department: str
+    status: str
+    date_sent: str | None
+    date_returned: str | None
+    date_given: str | None
+    batch_id: int
+
+
+CARTRIDGE_COLUMNS = "id, date_received, department, status, date_sent, date_returned, date_given, batch_id"
+
+# поле дати, яке заповнюється при переході в статус
+STATUS_DATE_FIELDS = ("date_received", "date_sent", "date_returned", "date_given")
+_SET_STATUS_SQL = {
+    field: f"UPDATE cartridges SET status=?, {field}=? WHERE id=? AND tenant_id=?"
+    for field in STATUS_DATE_FIELDS
+}
+
+
+@repository
+def batch_cartridges(conn, tenant_id: int, batch_id: int, cursor: Cursor | None = None, size: int = 10) -> Page:
+    return _page(conn, f"SELECT {CARTRIDGE_COLUMNS} FROM cartridges", ["tenant_id=?", "batch_id=?"],
+                 (tenant_id, batch_id), "id", False, cursor, size, Cartridge)
+
+
+# === 🔎 Пошук ===
+# trigram-токенізатор шукає лише за 3+ символами; коротші рядки — через LIKE
+FTS_MIN_LEN = 3
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@repository
+def search_cartridges(conn, tenant_id: int, department: str = "", cartridge_id: int | None = None,
+                      status: str | None = None, received: tuple = (None, None), sent: tuple = (None, None),
+                      cursor: Cursor | None = None, size: int = 10) -> Page:
+    """Пошук по всіх партіях офісу, новіші першими. Порожній фільтр не обмежує вибірку."""
+    columns = ", ".join(f"c.{col}" for col in CARTRIDGE_COLUMNS.split(", "))
+    where, params = ["c.tenant_id = ?"], (tenant_id,)
+    if department and len(department) >= FTS_MIN_LEN:
+        # FTS-таблиця офісу веде запит: rowid-и йдуть впорядковано, LIMIT зупиняє перегляд
+        fts = _fts_table(tenant_id)
+        select = f"SELECT {columns} FROM {fts} f JOIN cartridges c ON c.id = f.rowid"
+        where.append(f"{fts} MATCH ?")
+        params += ('"' + department.replace('"', '""') + '"',)
+        key_col = "f.rowid"
+    else:
+        select = f"SELECT {columns} FROM cartridges c"
+        key_col = "c.id"
+        if department:
+            where.append("c.department LIKE ? ESCAPE '\\'")
+            params += (f"%{_like_escape(department)}%",)
+    if cartridge_id is not None:
+        where.append("c.id = ?")
+        params += (cartridge_id,)
+    if status:
+        where.append("c.status = ?")
+        params += (status,)
+    for col, (start, end) in (("date_received", received), ("date_sent", sent)):
+        if start:
+            where.append(f"c.{col} >= ?")
+            params += (start,)
+        if end:
+            where.append(f"c.{col} <= ?")
+            params += (end,)
+    return _page(conn, select, where, params, key_col, True, cursor, size, Cartridge)
+
+
+# === 📤 Потокове читання для експорту ===
+def iter_cartridges(conn, tenant_id: int, batch_id: int | None = None, start: str | None = None,
+                    end: str | None = None, chunk: int = 500) -> Iterator[tuple]:
+    """Картриджі офісу порціями з курсора — пам'ять не залежить від розміру таблиці."""
+    where, params = ["tenant_id = ?"], [tenant_id]
+    if batch_id is not None:
+        where.append("batch_id = ?")
+        params.append(batch_id)
+    if start:
+        where.append("date_received >= ?")
+        params.append(start)
+    if end:
+        where.append("date_received <= ?")
+        params.append(end)
+    # порядок збігається з індексом, щоб SQLite не сортував усю вибірку в тимчасовому B-дереві
+    order = "date_received, id" if start or end else "batch_id, id"
+    cur = conn.execute(
+        f"SELECT {CARTRIDGE_COLUMNS} FROM cartridges WHERE {' AND '.join(where)} ORDER BY {order}",
+        params,
+    )
+    while rows := cur.fetchmany(chunk):
+        yield from rows
+
+
+@repository
+def get_cartridge(conn, tenant_id: int, cid: int) -> Cartridge | None:
+    row = conn.execute(f"SELECT {CARTRIDGE_COLUMNS} FROM cartridges WHERE id=? AND tenant_id=?",
+                       (cid, tenant_id)).fetchone()
+    return Cartridge(*row) if row else None
+
+
+@repository
+def cartridge_batch_id(conn, tenant_id: int, cid: int) -> int | None:
+    row = conn.execute("SELECT batch_id FROM cartridges WHERE id=? AND tenant_id=?", (cid, tenant_id)).fetchone()
+    return row[0] if row else None
+
+
+# tenant_id картриджа береться з партії; партія іншого офісу — нуль вставлених рядків
+_INSERT_CARTRIDGE_SQL = """
+    INSERT INTO cartridges (date_received, department, status, batch_id, tenant_id)
+    SELECT ?, ?, ?, id, tenant_id FROM batches WHERE id=? AND tenant_id=?
+"""
+
+
+@repository
+def add_cartridge(conn, tenant_id: int, date_received: str, department: str, status: str,
+                  batch_id: int) -> int | None:
+    with conn:
+        cur = conn.execute(_INSERT_CARTRIDGE_SQL, (date_received, department, status, batch_id, tenant_id))
+    return cur.lastrowid if cur.rowcount else None
+
+
+@repository
+def add_cartridges(conn, tenant_id: int, rows: list[tuple[str, str]], status: str, batch_id: int) -> int:
+    """Пакетне додавання (дата, відділ) однією транзакцією."""
+    with conn:
+        cur = conn.executemany(_INSERT_CARTRIDGE_SQL,
+                               ((d, dept, status, batch_id, tenant_id) for d, dept in rows))
+    return cur.rowcount
+
+
+@repository
+def set_cartridge_status(conn, tenant_id: int, cid: int, status: str, field: str, date: str) -> int | None:
+    """Змінює статус і повертає id партії (None — картридж не знайдено)."""
+    with conn:
+        conn.execute(_SET_STATUS_SQL[field], (status, date, cid, tenant_id))
+        row = conn.execute("SELECT batch_id FROM cartridges WHERE id=? AND tenant_id=?", (cid, tenant_id)).fetchone()
+    return row[0] if row else None
+
+
+def _bulk_status_sql(field: str, where: str) -> str:
+    # картриджі, що вже мають цей статус, не чіпаємо — їхні дати лишаються
+    return f"UPDATE cartridges SET status=?, {field}=? WHERE {where} AND status != ?"
+
+
+@repository
+def set_batch_status(conn, tenant_id: int, batch_id: int, status: str, field: str, date: str) -> int:
+    """Переводить усю партію в статус одним UPDATE; повертає кількість змінених."""
+    with conn:
+        cur = conn.execute(_bulk_status_sql(field, "tenant_id=? AND batch_id=?"),
+                           (status, date, tenant_id, batch_id, status))
+    return cur.rowcount
+
+
+@repository
+def set_cartridges_status(conn, tenant_id: int, batch_id: int, ids: list[int], status: str, field: str,
+                          date: str) -> int:
+    """Те саме для вибраних картриджів партії (одна транзакція, один UPDATE)."""
+    if not ids:
+        return 0
+    marks = ",".join("?" * len(ids))
+    with conn:
+        cur = conn.execute(
+            _bulk_status_sql(field, f"tenant_id=? AND batch_id=? AND id IN ({marks})"),
+            (status, date, tenant_id, batch_id, *ids, status),
+        )
+    return cur.rowcount
+
+
+@repository
+def delete_cartridge(conn, tenant_id: int, cid: int) -> bool:
+    with conn:
+        return conn.execute("DELETE FROM cartridges WHERE id=? AND tenant_id=?", (cid, tenant_id)).rowcount > 0
+
+
+# === 📊 Статистика ===
+@repository
+def turnaround_histogram(conn, tenant_id: int, period: str) -> list[tuple[str, int, int]]:
+    """(відділ, днів на фірмі, кількість) за квартал «РРРР-QN»."""
+    return conn.execute("""
+        SELECT department, days, n FROM stats_turnaround
+        WHERE tenant_id=? AND period=? ORDER BY department, days
+    """, (tenant_id, period)).fetchall()
+
+
+@repository
+def weekly_throughput(conn, tenant_id: int, weeks: int = 8) -> list[tuple[str, str, int]]:
+    """(тиждень, статус, кількість переходів) за останні weeks тижнів з даними."""
+    return conn.execute("""
+        SELECT week, status, n FROM stats_weekly
+        WHERE tenant_id=?1 AND week IN (
+            SELECT DISTINCT week FROM stats_weekly WHERE tenant_id=?1 ORDER BY week DESC LIMIT ?2
+        )
+        ORDER BY week
+    """, (tenant_id, weeks)).fetchall()
+
+
+@repository
+def status_backlog(conn, tenant_id: int) -> dict[str, int]:
+    """Поточна кількість картриджів у кожному статусі (з лічильників партій)."""
+    cols = [col for _, _, col in STATUS_MAP.values()]
+    row = conn.execute(f"""
+        SELECT {', '.join(f'COALESCE(SUM(s.{c}), 0)' for c in cols)}
+        FROM batches b JOIN batch_summary s ON s.batch_id = b.id
+        WHERE b.tenant_id=?
+    """, (tenant_id,)).fetchone()
+    return dict(zip(cols, row))
+
+
+# === 📦 Архів закритих партій ===
+# Закрита партія, усі картриджі якої видано і жодна дата не новіша за межу, переїжджає
+# в окремий файл (ATTACH) разом з картриджами та їхнім журналом подій; агрегати статистики
+# лишаються в робочій базі. У WAL-режимі коміт у дві бази не атомарний, тому копіювання
+# і видалення — окремі транзакції: після збою партія в гіршому разі буде в обох файлах.
+STATUS_ISSUED = STATUS_MAP["s4"][0]
+
+ARCHIVE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS archive.batches(
+        id INTEGER PRIMARY KEY,
+        tenant_id INTEGER NOT NULL,
+        created_at TEXT,
+        status TEXT,
+        archived_at TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS archive.cartridges(
+        id INTEGER PRIMARY KEY,
+        tenant_id INTEGER NOT NULL,
+        batch_id INTEGER,
+        date_received TEXT,
+        department TEXT,
+        status TEXT,
+        date_sent TEXT,
+        date_returned TEXT,
+        date_given TEXT
+    );
+    CREATE INDEX IF NOT EXISTS archive.idx_cartridges_batch ON cartridges(batch_id, id);
+    CREATE TABLE IF NOT EXISTS archive.cartridge_events(
+        id INTEGER PRIMARY KEY,
+        cartridge_id INTEGER NOT NULL,
+        tenant_id INTEGER NOT NULL,
+        ts TEXT NOT NULL,
+        status TEXT NOT NULL,
+        department TEXT,
+        batch_id INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS archive.idx_events_cartridge_ts ON cartridge_events(cartridge_id, ts);
+"""
+
+ARCHIVE_CANDIDATES = """
+    SELECT b.id FROM batches b
+    WHERE b.status = 'closed' AND COALESCE(b.created_at, '') < :cutoff
+      AND NOT EXISTS (
+          SELECT 1 FROM cartridges c
+          WHERE c.batch_id = b.id
+            AND (c.status IS NOT :issued
+                 OR max(COALESCE(c.date_received, ''), COALESCE(c.date_sent, ''),
+                        COALESCE(c.date_returned, ''), COALESCE(c.date_given, '')) >= :cutoff)
+      )
+    ORDER BY b.id LIMIT :limit
+"""
+
+
+@repository
+def archive_batches(conn, path: str, cutoff: str, archived_at: str, limit: int = 50) -> dict[int, tuple[int, int]]:
+    """Переносить до limit партій без руху з cutoff у файл path; повертає {офіс: (партій, картриджів)}."""
+    ids = [r for r, in conn.execute(ARCHIVE_CANDIDATES, {"cutoff": cutoff, "issued": STATUS_ISSUED, "limit": limit})]
+    if not ids:
+        return {}
+    marks = ",".join("?" * len(ids))
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        conn.executescript(ARCHIVE_SCHEMA)
+        # 1) копія в архів; INSERT OR REPLACE — повтор після збою нічого не дублює
+        with conn:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO archive.batches
+                SELECT id, tenant_id, created_at, status, ? FROM batches WHERE id IN ({marks})
+            """, (archived_at, *ids))
+            conn.execute(f"""
+                INSERT OR REPLACE INTO archive.cartridges
+                SELECT id, tenant_id, batch_id, date_received, department, status, date_sent, date_returned, date_given
+                FROM cartridges WHERE batch_id IN ({marks})
+            """, ids)
+            conn.execute(f"""
+                INSERT OR REPLACE INTO archive.cartridge_events
+                SELECT e.id, e.cartridge_id, e.tenant_id, e.ts, e.status, e.department, e.batch_id
+                FROM cartridges c JOIN cartridge_events e ON e.cartridge_id = c.id
+                WHERE c.batch_id IN ({marks})
+            """, ids)
+        # 2) видалення з робочої бази; тригери оновлюють FTS, лічильники та outbox аркуша
+        with conn:
+            moved = conn.execute(f"""
+                SELECT b.tenant_id, COUNT(DISTINCT b.id), COUNT(c.id)
+                FROM batches b LEFT JOIN cartridges c ON c.batch_id = b.id
+                WHERE b.id IN ({marks}) GROUP BY b.tenant_id
+            """, ids).fetchall()
+            conn.execute(f"""
+                DELETE FROM cartridge_events
+                WHERE cartridge_id IN (SELECT id FROM cartridges WHERE batch_id IN ({marks}))
+            """, ids)
+            # картриджі видаляє ON DELETE CASCADE
+            conn.execute(f"DELETE FROM batches WHERE id IN ({marks})", ids)
+    finally:
+        conn.execute("DETACH DATABASE archive")
+    return {tenant_id: (batches, cartridges) for tenant_id, batches, cartridges in moved}
@@ -0,0 +1,119 @@
+import asyncio
+import csv
+import os
+import tempfile
+from datetime import date, datetime
+from typing import NamedTuple
+
+import db
+from db import DATE_FMT, display_date
+from gsheets import HEADERS
+from intake import normalize_date
+
+
+# === 📤 Експорт у файл (XLSX / CSV) ===
+# Рядки йдуть з курсора окремого з'єднання прямо у файл на диску,
+# тож пам'ять не росте з розміром таблиці, а потік БД бота не зайнятий.
+# Стовпці ті самі, що в аркуші Google Sheets (HEADERS).
+DATE_COLUMNS = (1, 4, 5, 6)
+
+EXPORT_HELP = (
+    "📤 Експорт картриджів у файл:\n"
+    "/export — уся база\n"
+    "/export 12 — партія №12\n"
+    "/export 01.03.2025..31.03.2025 — за датою вилучення (межу можна не вказувати)\n"
+    "Додайте csv, щоб отримати CSV замість XLSX: /export 12 csv"
+)
+
+
+class ExportRequest(NamedTuple):
+    batch_id: int | None = None
+    start: str | None = None
+    end: str | None = None
+    fmt: str = "xlsx"
+
+    @property
+    def filename(self) -> str:
+        if self.batch_id is not None:
+            scope = f"batch{self.batch_id}"
+        elif self.start or self.end:
+            scope = f"{self.start or ''}..{self.end or ''}"
+        else:
+            scope = "all"
+        return f"cartridges_{scope}_{date.today().strftime(DATE_FMT)}.{self.fmt}"
+
+
+def parse_args(text: str | None) -> ExportRequest:
+    fields = {}
+    for token in (text or "").split():
+        lowered = token.lower().lstrip("#")
+        if lowered in ("csv", "xlsx"):
+            fields["fmt"] = lowered
+        elif lowered.isdigit():
+            fields["batch_id"] = int(lowered)
+        elif ".." in token:
+            start, _, end = token.partition("..")
+            for key, value in (("start", start), ("end", end)):
+                if value:
+                    fields[key] = normalize_date(value)
+                    if fields[key] is None:
+                        raise ValueError(f"невідома дата «{value}»")
+        else:
+            raise ValueError(f"незрозумілий параметр «{token}»")
+    return ExportRequest(**fields)
+
+
+def _xlsx_value(i: int, value):
+    if i in DATE_COLUMNS and value:
+        try:
+            return datetime.strptime(value, DATE_FMT).date()
+        except ValueError:
+            return value
+    return value
+
+
+def _write_xlsx(rows, path: str) -> int:
+    from openpyxl import Workbook
+
+    # write_only — рядки пишуться одразу в потік, без моделі всієї книги в пам'яті
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Cartridges")
+    ws.append(HEADERS)
+    n = 0
+    for n, r in enumerate(rows, start=1):
+        ws.append([_xlsx_value(i, v) for i, v in enumerate(r)])
+    wb.save(path)
+    return n
+
+
+def _write_csv(rows, path: str) -> int:
+    # utf-8-sig і «;» — файл коректно відкривається в Excel з українською локаллю
+    n = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(HEADERS)
+        for n, r in enumerate(rows, start=1):
+            writer.writerow([display_date(v) if i in DATE_COLUMNS else v for i, v in enumerate(r)])
+    return n
+
+
+def write_export(tenant_id: int, req: ExportRequest, path: str) -> int:
+    """Блокуюча частина: пише файл і повертає кількість рядків."""
+    conn = db.database.reader()
+    try:
+        rows = db.iter_cartridges(conn, tenant_id, req.batch_id, req.start, req.end)
+        return (_write_csv if req.fmt == "csv" else _write_xlsx)(rows, path)
+    finally:
+        conn.close()
+
+
+async def build_export(tenant_id: int, req: ExportRequest) -> tuple[str, int]:
+    """Створює тимчасовий файл (шлях, кількість рядків); видаляє його викликач."""
+    fd, path = tempfile.mkstemp(suffix=f".{req.fmt}", prefix="export_")
+    os.close(fd)
+    try:
+        n = await asyncio.to_thread(write_export, tenant_id, req, path)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, n
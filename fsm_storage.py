@@ -0,0 +1,131 @@
+import json
+import time
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from config import FSM_TTL, FSM_SHARED, FSM_VERSION_CHECK
+from db import repository
+
+
+# === 💾 Сховище FSM у SQLite ===
+@repository
+def fsm_load(conn, key: str) -> tuple[str | None, str, float] | None:
+    return conn.execute("SELECT state, data, updated_at FROM fsm_state WHERE key=?", (key,)).fetchone()
+
+
+@repository
+def fsm_save(conn, key: str, state: str | None, data: str, updated_at: float):
+    with conn:
+        if state is None and data == "{}":
+            conn.execute("DELETE FROM fsm_state WHERE key=?", (key,))
+        else:
+            conn.execute("""
+                INSERT INTO fsm_state (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    state=excluded.state, data=excluded.data, updated_at=excluded.updated_at
+            """, (key, state, data, updated_at))
+
+
+@repository
+def fsm_data_version(conn) -> int:
+    # змінюється, коли в базу комітить інше з'єднання (інший процес бота); власні записи його не чіпають
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+@repository
+def fsm_purge(conn, cutoff: float) -> int:
+    with conn:
+        return conn.execute("DELETE FROM fsm_state WHERE updated_at < ?", (cutoff,)).rowcount
+
+
+class SQLiteStorage(BaseStorage):
+    """Стан і дані FSM у таблиці fsm_state з write-through кешем у пам'яті.
+
+    Записи пишуться в базу одразу, читання йдуть з кешу без звернення до потоку БД.
+    Якщо базу ділять кілька процесів бота (shared), кеш не частіше ніж раз на
+    version_check секунд звіряється з PRAGMA data_version: після запису іншого процесу
+    він скидається і стан перечитується. Незавершені сценарії старші за ttl видаляються.
+    """
+
+    def __init__(self, ttl: float = FSM_TTL, purge_interval: float = 600,
+                 shared: bool = FSM_SHARED, version_check: float = FSM_VERSION_CHECK):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.shared = shared
+        self.version_check = version_check
+        # ключ → [стан, дані, час оновлення]
+        self._cache: dict[str, list] = {}
+        self._data_version: int | None = None
+        self._version_checked = 0.0
+        self._last_purge = 0.0
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join(str(part) for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id or "",
+            key.business_connection_id or "", key.destiny,
+        ))
+
+    async def _entry(self, key: StorageKey) -> tuple[str, list]:
+        skey = self._key(key)
+        now = time.time()
+        if self.shared and now - self._version_checked >= self.version_check:
+            self._version_checked = now
+            version = await fsm_data_version()
+            if version != self._data_version:
+                self._cache.clear()
+                self._data_version = version
+        entry = self._cache.get(skey)
+        if entry is None:
+            row = await fsm_load(skey)
+            if row is None or now - row[2] > self.ttl:
+                entry = [None, {}, now]
+            else:
+                entry = [row[0], json.loads(row[1]), row[2]]
+            self._cache[skey] = entry
+        elif now - entry[2] > self.ttl:
+            entry[:] = [None, {}, now]
+        return skey, entry
+
+    async def _write(self, skey: str, entry: list):
+        now = time.time()
+        entry[2] = now
+        await fsm_save(skey, entry[0], json.dumps(entry[1], ensure_ascii=False), now)
+        if entry[0] is None and not entry[1]:
+            self._cache.pop(skey, None)
+        if now - self._last_purge > self.purge_interval:
+            await self.purge()
+
+    async def purge(self) -> int:
+        now = time.time()
+        self._last_purge = now
+        cutoff = now - self.ttl
+        for skey in [k for k, e in self._cache.items() if e[2] < cutoff]:
+            del self._cache[skey]
+        removed = await fsm_purge(cutoff)
+        if removed:
+            print(f"🧹 Видалено застарілих станів FSM: {removed}")
+        return removed
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        skey, entry = await self._entry(key)
+        entry[0] = state.state if isinstance(state, State) else state
+        await self._write(skey, entry)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        _, entry = await self._entry(key)
+        return entry[0]
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        skey, entry = await self._entry(key)
+        entry[1] = dict(data)
+        await self._write(skey, entry)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, entry = await self._entry(key)
+        return dict(entry[1])
+
+    async def close(self) -> None:
+        self._cache.clear()
@@ -0,0 +1,663 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+import gspread
+from google.auth.transport.requests import Request
+from oauth2client.service_account import ServiceAccountCredentials
+
+import metrics
+from config import GSHEET_ID, SHEETS_PULL_INTERVAL
+from db import repository, display_date, list_tenants, CARTRIDGE_COLUMNS, DEFAULT_TENANT, STATUS_MAP
+from intake import normalize_date
+
+
+WORKSHEET_TITLE = "Cartridges"
+HEADERS = [
+    "ID", "Дата вилучення", "Відділ", "Статус",
+    "Дата відправлення", "Дата повернення", "Дата видачі", "№ партії"
+]
+# === 🔗 Google Sheets ===
+SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+
+class SheetsClient:
+    """Довгоживучий клієнт: авторизується один раз і тримає HTTP-сесію та аркуш.
+
+    Токен оновлюється лише коли до його завершення лишається менше TOKEN_MARGIN,
+    а на 401 чи зниклий аркуш клієнт перепідключається і повторює дію один раз.
+    """
+
+    TOKEN_MARGIN = timedelta(minutes=5)
+
+    def __init__(self, sheet_id: str | None = GSHEET_ID, title: str = WORKSHEET_TITLE,
+                 tenant_id: int = DEFAULT_TENANT):
+        self.sheet_id = sheet_id
+        self.title = title
+        self.tenant_id = tenant_id
+        self.key_data = os.getenv("GOOGLE_SERVICE_KEY")
+        self._client: gspread.Client | None = None
+        self._sheet: gspread.Spreadsheet | None = None
+        self._ws: gspread.Worksheet | None = None
+        self._lock = threading.RLock()
+        if not self.configured:
+            print(f"⚠️ GOOGLE_SERVICE_KEY або таблиця офісу {tenant_id} не задані.")
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.key_data and self.sheet_id)
+
+    def reset(self, auth: bool = False):
+        self._ws = None
+        self._sheet = None
+        if auth:
+            self._client = None
+
+    def _authorize(self):
+        creds = ServiceAccountCredentials.from_json_keyfile_dict(json.loads(self.key_data), SCOPE)
+        self._client = gspread.authorize(creds)
+        metrics.instrument_http(self._client.http_client)
+        print("🔑 Авторизовано в Google Sheets")
+
+    def _ensure_token(self):
+        creds = self._client.http_client.auth
+        expiry = getattr(creds, "expiry", None)
+        if creds.token and expiry and expiry - datetime.utcnow() > self.TOKEN_MARGIN:
+            return
+        creds.refresh(Request())
+
+    def worksheet(self) -> tuple[gspread.Worksheet, bool]:
+        """Повертає (аркуш, створено_щойно)."""
+        created = False
+        if self._client is None:
+            self._authorize()
+        self._ensure_token()
+        if self._sheet is None:
+            self._sheet = self._client.open_by_key(self.sheet_id)
+        if self._ws is None:
+            try:
+                self._ws = self._sheet.worksheet(self.title)
+            except gspread.WorksheetNotFound:
+                self._ws = self._sheet.add_worksheet(title=self.title, rows="2000", cols="8")
+                created = True
+        return self._ws, created
+
+    def run(self, fn, *args):
+        """Викликає fn(ws, created, *args) з одним прозорим перепідключенням."""
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    ws, created = self.worksheet()
+                    return fn(ws, created, *args)
+                except gspread.WorksheetNotFound:
+                    self.reset()
+                except gspread.exceptions.APIError as e:
+                    if e.code == 401:
+                        self.reset(auth=True)
+                    elif e.code in (400, 404) and self._ws is not None and not self._worksheet_exists():
+                        self.reset()
+                    else:
+                        raise
+                    if attempt == 2:
+                        raise
+                print("🔌 Перепідключення до Google Sheets…")
+            raise gspread.WorksheetNotFound(self.title)
+
+    def _worksheet_exists(self) -> bool:
+        try:
+            return any(ws.id == self._ws.id for ws in self._sheet.worksheets())
+        except gspread.exceptions.APIError:
+            return False
+
+
+def setup_gsheet_format(ws):
+    ws.format("A1:H1", {
+        "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9},
+        "textFormat": {"bold": True},
+        "horizontalAlignment": "CENTER"
+    })
+    ws.freeze(rows=1)
+
+
+# === 🧾 Стан синхронізації в SQLite ===
+# SQLite обмежує кількість параметрів у запиті
+_CHUNK = 900
+
+
+# Кожен офіс синхронізується зі своєю таблицею: стан, outbox і карта рядків
+# відбираються за tenant_id.
+@repository
+def load_sync_state(conn, tenant_id: int) -> tuple[dict, dict, bool]:
+    """(брудні id → seq, карта id → рядок, чи є взагалі картриджі)."""
+    dirty = dict(conn.execute("SELECT cartridge_id, seq FROM sheet_dirty WHERE tenant_id=?", (tenant_id,)))
+    row_map = dict(conn.execute("SELECT cartridge_id, row FROM sheet_rows WHERE tenant_id=?", (tenant_id,)))
+    has_rows = conn.execute("SELECT EXISTS(SELECT 1 FROM cartridges WHERE tenant_id=?)", (tenant_id,)).fetchone()[0]
+    return dirty, row_map, bool(has_rows)
+
+
+@repository
+def fetch_rows(conn, tenant_id: int, ids) -> dict[int, tuple]:
+    rows = {}
+    ids = list(ids)
+    for i in range(0, len(ids), _CHUNK):
+        chunk = ids[i:i + _CHUNK]
+        marks = ",".join("?" * len(chunk))
+        cur = conn.execute(f"SELECT {CARTRIDGE_COLUMNS} FROM cartridges WHERE tenant_id=? AND id IN ({marks})",
+                           (tenant_id, *chunk))
+        rows.update((r[0], r) for r in cur.fetchall())
+    return rows
+
+
+@repository
+def fetch_all_rows(conn, tenant_id: int) -> list[tuple]:
+    return conn.execute(
+        f"SELECT {CARTRIDGE_COLUMNS} FROM cartridges WHERE tenant_id=? ORDER BY batch_id ASC, id ASC", (tenant_id,)
+    ).fetchall()
+
+
+@repository
+def save_sync_state(conn, tenant_id: int, old_map: dict, new_map: dict, dirty: dict, full: bool, hashes: dict):
+    with conn:
+        if full:
+            conn.execute("DELETE FROM sheet_rows WHERE tenant_id=?", (tenant_id,))
+            changed = new_map.items()
+        else:
+            conn.executemany("DELETE FROM sheet_rows WHERE cartridge_id=?",
+                             [(cid,) for cid in old_map if cid not in new_map])
+            changed = [(cid, row) for cid, row in new_map.items() if old_map.get(cid) != row]
+        conn.executemany("""
+            INSERT INTO sheet_rows (cartridge_id, row, tenant_id) VALUES (?, ?, ?)
+            ON CONFLICT(cartridge_id) DO UPDATE SET row=excluded.row
+        """, ((cid, row, tenant_id) for cid, row in changed))
+        conn.executemany("UPDATE sheet_rows SET hash=? WHERE cartridge_id=?",
+                         [(h, cid) for cid, h in hashes.items()])
+        # знімаємо лише ті позначки, що не змінилися під час синхронізації
+        conn.executemany("DELETE FROM sheet_dirty WHERE cartridge_id=? AND seq=?", dirty.items())
+
+
+@repository
+def pending_changes(conn, tenant_id: int) -> int:
+    return conn.execute("SELECT COUNT(*) FROM sheet_dirty WHERE tenant_id=?", (tenant_id,)).fetchone()[0]
+
+
+def _ts(value: float | None) -> datetime | None:
+    return datetime.fromtimestamp(value) if value else None
+
+
+def _epoch(value: datetime | None) -> float | None:
+    return value.timestamp() if value else None
+
+
+@repository
+def load_worker_state(conn, tenant_id: int) -> tuple:
+    """(спроба, наступна спроба, остання помилка, коли, остання успішна синхронізація)."""
+    row = conn.execute("""
+        SELECT attempt, next_attempt_at, last_error, last_error_at, last_success_at
+        FROM sheet_sync_state WHERE tenant_id=?
+    """, (tenant_id,)).fetchone()
+    attempt, next_at, error, error_at, success_at = row or (0, None, None, None, None)
+    return attempt, next_at, error, _ts(error_at), _ts(success_at)
+
+
+@repository
+def save_worker_state(conn, tenant_id: int, attempt: int, next_at: float | None, error: str | None,
+                      error_at: datetime | None, success_at: datetime | None):
+    with conn:
+        conn.execute("""
+            INSERT INTO sheet_sync_state
+                (tenant_id, attempt, next_attempt_at, last_error, last_error_at, last_success_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(tenant_id) DO UPDATE
+            SET attempt=excluded.attempt, next_attempt_at=excluded.next_attempt_at, last_error=excluded.last_error,
+                last_error_at=excluded.last_error_at, last_success_at=excluded.last_success_at
+        """, (tenant_id, attempt, next_at, error, _epoch(error_at), _epoch(success_at)))
+
+
+@repository
+def load_pull_state(conn, tenant_id: int) -> tuple[dict, set]:
+    """(id → хеш рядка в аркуші, id змінених у боті після останньої синхронізації)."""
+    hashes = dict(conn.execute("SELECT cartridge_id, hash FROM sheet_rows WHERE tenant_id=?", (tenant_id,)))
+    dirty = {cid for cid, in conn.execute("SELECT cartridge_id FROM sheet_dirty WHERE tenant_id=?", (tenant_id,))}
+    return hashes, dirty
+
+
+@repository
+def apply_sheet_edits(conn, tenant_id: int, edits: list[tuple[int, tuple]],
+                      same: dict, restore: list[int] = ()) -> tuple[list[int], list[int]]:
+    """Правки з аркуша однією транзакцією → (застосовані id, змінені тим часом у боті).
+
+    restore — id, чиї рядки треба перезаписати з бази при наступному вивантаженні.
+    """
+    applied, raced = [], []
+    with conn:
+        for cid, c in edits:
+            cur = conn.execute("""
+                UPDATE cartridges
+                SET date_received=?, department=?, status=?, date_sent=?, date_returned=?, date_given=?
+                WHERE id=? AND tenant_id=? AND NOT EXISTS (SELECT 1 FROM sheet_dirty WHERE cartridge_id=?)
+            """, (c[1], c[2], c[3], c[4] or None, c[5] or None, c[6] or None, cid, tenant_id, cid))
+            (applied if cur.rowcount else raced).append(cid)
+        conn.executemany("UPDATE sheet_rows SET hash=? WHERE cartridge_id=?",
+                         [(h, cid) for cid, h in same.items()])
+        conn.executemany("""
+            INSERT INTO sheet_dirty(cartridge_id, tenant_id) VALUES (?, ?)
+            ON CONFLICT(cartridge_id) DO UPDATE SET seq = seq + 1
+        """, [(cid, tenant_id) for cid in restore])
+    return applied, raced
+
+
+# RAW: клітинки пишуться як є. USER_ENTERED дозволяв Sheets перетворювати текст
+# («007» → 7, «1/2» → дату), і імпорт бачив у цьому правки персоналу.
+VALUE_INPUT = "RAW"
+
+
+def _sheet_row(r) -> list:
+    cid, d_recv, dept, status, d_sent, d_ret, d_giv, batch_id = r
+    return [cid, display_date(d_recv), dept, status,
+            display_date(d_sent), display_date(d_ret), display_date(d_giv), batch_id]
+
+
+def _map_is_valid(ws, row_map: dict) -> bool:
+    """Звіряє карту рядків зі стовпцем ID в аркуші.
+
+    Один запит на читання, але він щоразу повертає весь стовпець (N клітинок, ~10 байт кожна):
+    лише так видно рядки, видалені чи переставлені в аркуші вручну.
+    """
+    ids = ws.col_values(1)
+    if not ids or ids[0] != HEADERS[0] or len(ids) - 1 != len(row_map):
+        return False
+    return all(row <= len(ids) and ids[row - 1] == str(cid) for cid, row in row_map.items())
+
+
+def _full_rebuild(ws, tenant_id: int) -> tuple[dict, dict]:
+    rows = fetch_all_rows.sync(tenant_id)
+    ws.clear()
+    ws.append_rows([HEADERS] + [_sheet_row(r) for r in rows], value_input_option=VALUE_INPUT)
+    setup_gsheet_format(ws)
+    return {r[0]: i + 2 for i, r in enumerate(rows)}, {r[0]: row_hash(_canon(r)) for r in rows}
+
+
+def _apply_changes(ws, tenant_id: int, dirty: dict, row_map: dict) -> tuple[dict, dict]:
+    rows = fetch_rows.sync(tenant_id, dirty)
+
+    # 1) видалені картриджі — прибираємо їхні рядки одним batchUpdate (знизу вгору)
+    gone = sorted((row_map[cid] for cid in dirty if cid not in rows and cid in row_map), reverse=True)
+    if gone:
+        ws.spreadsheet.batch_update({"requests": [
+            {"deleteDimension": {"range": {
+                "sheetId": ws.id, "dimension": "ROWS", "startIndex": r - 1, "endIndex": r
+            }}}
+            for r in gone
+        ]})
+    gone.reverse()
+    new_map = {
+        cid: row - bisect_left(gone, row)
+        for cid, row in row_map.items()
+        if cid in rows or cid not in dirty
+    }
+
+    # 2) змінені та нові — одним batch_update по діапазонах
+    last_row = max(new_map.values(), default=1)
+    updates = []
+    for cid in sorted(rows):
+        row = new_map.get(cid)
+        if row is None:
+            last_row += 1
+            row = new_map[cid] = last_row
+        updates.append({"range": f"A{row}:H{row}", "values": [_sheet_row(rows[cid])]})
+    if last_row > ws.row_count:
+        ws.add_rows(last_row - ws.row_count)
+    if updates:
+        ws.batch_update(updates, value_input_option=VALUE_INPUT)
+    return new_map, {cid: row_hash(_canon(r)) for cid, r in rows.items()}
+
+
+def _sync(ws, created: bool, tenant_id: int, dirty: dict, row_map: dict, full: bool):
+    full = full or created
+    if not full and not _map_is_valid(ws, row_map):
+        print("⚠️ Карта рядків аркуша застаріла — повна перебудова")
+        full = True
+
+    report = None
+    if full and not created:
+        # повна перебудова перезаписує весь аркуш — спершу забираємо з нього правки
+        report = _pull(ws, tenant_id)
+    if full:
+        new_map, hashes = _full_rebuild(ws, tenant_id)
+    else:
+        new_map, hashes = _apply_changes(ws, tenant_id, dirty, row_map)
+    save_sync_state.sync(tenant_id, row_map, new_map, dirty, full, hashes)
+    print(f"✅ Офіс {tenant_id}: дані синхронізовано з Google Sheets ({'повністю' if full else f'{len(dirty)} змін'})")
+    return report
+
+
+def sync_to_sheets(client: SheetsClient, full: bool = False) -> "PullReport | None":
+    """Блокуюча синхронізація офісу client.tenant_id; помилки API пробрасуються нагору (їх обробляє воркер).
+
+    Повертає звіт імпорту, якщо перед повною перебудовою забиралися правки з аркуша.
+    """
+    if not client.configured:
+        return None
+
+    dirty, row_map, has_rows = load_sync_state.sync(client.tenant_id)
+    if not full and not dirty and (row_map or not has_rows):
+        return None
+    return client.run(_sync, client.tenant_id, dirty, row_map, full)
+
+
+# === ⬇️ Імпорт правок, зроблених прямо в аркуші ===
+# Для кожного рядка зберігається хеш нормалізованих значень, як їх востаннє записано
+# в аркуш. Рядок з тим самим хешем не змінювався — його навіть не звіряємо з базою.
+_DATE_CELLS = (1, 4, 5, 6)
+_STATUS_ALIASES = {
+    alias.lower(): label
+    for code, (label, _, _) in STATUS_MAP.items()
+    for alias in (code, label, label.split(" ", 1)[1])
+}
+_STATUS_LABELS = {label for label, _, _ in STATUS_MAP.values()}
+
+
+class PullReport(NamedTuple):
+    checked: int
+    applied: list[int]
+    conflicts: list[tuple[int, str]]     # (id картриджа, причина)
+    errors: list[tuple[int, str]]        # (рядок аркуша, причина)
+
+
+def _canon(values) -> tuple[str, ...]:
+    """Рядок аркуша або бази у спільному вигляді: дати ISO, статус — повна назва."""
+    cells = [("" if v is None else str(v)).strip() for v in list(values)[:len(HEADERS)]]
+    cells += [""] * (len(HEADERS) - len(cells))
+    for i in _DATE_CELLS:
+        cells[i] = normalize_date(cells[i]) or cells[i]
+    cells[3] = _STATUS_ALIASES.get(cells[3].lower(), cells[3])
+    return tuple(cells)
+
+
+def row_hash(canon: tuple[str, ...]) -> str:
+    return hashlib.blake2b("\x1f".join(canon).encode(), digest_size=8).hexdigest()
+
+
+def _validate(canon: tuple, current: tuple) -> str | None:
+    if canon[7] != current[7]:
+        return "№ партії змінюється лише в боті"
+    if not canon[2]:
+        return "не вказано відділ"
+    if canon[3] not in _STATUS_LABELS:
+        return f"невідомий статус «{canon[3]}»"
+    if not canon[1]:
+        return "не вказано дату вилучення"
+    for i in _DATE_CELLS:
+        if canon[i] and normalize_date(canon[i]) != canon[i]:
+            return f"невідома дата «{canon[i]}» ({HEADERS[i]})"
+    return None
+
+
+def _pull(ws, tenant_id: int) -> PullReport:
+    values = ws.get_all_values()
+    hashes, dirty = load_pull_state.sync(tenant_id)
+
+    errors, seen, candidates = [], set(), {}
+    for row_no, cells in enumerate(values[1:], start=2):
+        if not any(c.strip() for c in cells):
+            continue
+        canon = _canon(cells)
+        if not canon[0].isdigit():
+            errors.append((row_no, f"некоректний ID «{canon[0]}»"))
+            continue
+        cid = int(canon[0])
+        if cid in seen:
+            errors.append((row_no, f"ID {cid} повторюється"))
+            continue
+        seen.add(cid)
+        h = row_hash(canon)
+        if hashes.get(cid) != h:
+            candidates[cid] = (row_no, canon, h)
+
+    current = fetch_rows.sync(tenant_id, candidates) if candidates else {}
+    edits, same, conflicts, restore = [], {}, [], []
+    for cid, (row_no, canon, h) in candidates.items():
+        r = current.get(cid)
+        if r is None:
+            errors.append((row_no, f"картриджа #{cid} немає в базі"))
+            continue
+        db_canon = _canon(r)
+        if canon == db_canon:
+            # аркуш і база збігаються, бракувало лише хеша
+            same[cid] = h
+        elif hashes.get(cid) is None:
+            # рядок без хеша (записаний до міграції, невдалою синхронізацією чи в іншу таблицю):
+            # відмінність може бути і правкою, і застарілим або перетвореним Sheets значенням —
+            # не імпортуємо, а перезаписуємо версією бота
+            conflicts.append((cid, "немає збереженої версії рядка — лишається версія бота"))
+            restore.append(cid)
+        elif cid in dirty:
+            conflicts.append((cid, "змінено і в боті, і в таблиці — лишається версія бота"))
+        elif problem := _validate(canon, db_canon):
+            errors.append((row_no, f"#{cid}: {problem}"))
+        else:
+            edits.append((cid, canon))
+
+    applied, raced = apply_sheet_edits.sync(tenant_id, edits, same, restore)
+    conflicts += [(cid, "змінено в боті під час імпорту — лишається версія бота") for cid in raced]
+    if applied or conflicts:
+        print(f"⬇️ Імпорт з Google Sheets: застосовано {len(applied)}, конфліктів {len(conflicts)}")
+    return PullReport(len(seen), applied, conflicts, errors)
+
+
+def pull_from_sheets(client: SheetsClient) -> PullReport | None:
+    """Блокуючий імпорт правок з аркуша (один запит на читання)."""
+    if not client.configured:
+        return None
+    return client.run(lambda ws, created: _pull(ws, client.tenant_id) if not created else PullReport(0, [], [], []))
+
+
+# === 🔁 Фоновий воркер синхронізації ===
+class SheetsSyncWorker:
+    """Збирає сповіщення про зміни в черзі та виконує одну синхронізацію на пачку.
+
+    Outbox — таблиця sheet_dirty: тригери пишуть її в тій самій транзакції, що й зміну,
+    тож жодна правка не губиться. Лічильник спроб і час наступної зберігаються в базі:
+    після перезапуску воркер дочитує outbox з тим самим backoff, без повної перебудови.
+    Блокуючий gspread працює в executor-і, тож цикл подій бота не зупиняється.
+    Кожні pull_interval секунд (і за викликом pull()) забирає правки з аркуша;
+    on_import викликається, коли імпорт змінив дані в базі.
+    """
+
+    def __init__(self, client: SheetsClient, debounce: float = 2.0, retry_base: float = 5.0,
+                 retry_max: float = 300.0, pull_interval: float = SHEETS_PULL_INTERVAL, on_import=None):
+        self.client = client
+        self.tenant_id = client.tenant_id
+        self.debounce = debounce
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.pull_interval = pull_interval
+        self.on_import = on_import
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.last_success: datetime | None = None
+        self.last_error: str | None = None
+        self.last_error_at: datetime | None = None
+        self.last_pull: datetime | None = None
+        self.last_pull_report: PullReport | None = None
+        self.attempt = 0
+        self.next_attempt_at: float | None = None
+        self.running = False
+        self._task: asyncio.Task | None = None
+        self._pull_task: asyncio.Task | None = None
+        # імпорт і вивантаження не перетинаються
+        self._lock = asyncio.Lock()
+
+    def notify(self, full: bool = False):
+        self.queue.put_nowait(full)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        if self._pull_task is None and self.pull_interval > 0 and self.client.configured:
+            self._pull_task = asyncio.create_task(self._pull_loop())
+
+    async def stop(self):
+        for task in (self._task, self._pull_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = self._pull_task = None
+
+    def _drain(self) -> bool:
+        full = False
+        while not self.queue.empty():
+            full |= self.queue.get_nowait()
+        return full
+
+    async def _restore(self):
+        (self.attempt, self.next_attempt_at, self.last_error,
+         self.last_error_at, self.last_success) = await load_worker_state(self.tenant_id)
+        if self.client.configured and (pending := await pending_changes(self.tenant_id)):
+            print(f"📬 Офіс {self.tenant_id}: незавершені зміни для Google Sheets: {pending} — дочитуємо")
+        # без змін sync_to_sheets нічого не робить, тож сповіщення на старті нічого не коштує
+        self.notify()
+
+    async def _save_state(self):
+        await save_worker_state(self.tenant_id, self.attempt, self.next_attempt_at, self.last_error,
+                                self.last_error_at, self.last_success)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        await self._restore()
+        while True:
+            full = await self.queue.get()
+            # чекаємо, поки вщухне серія змін, і зливаємо її в одну синхронізацію
+            await asyncio.sleep(self.debounce)
+            full |= self._drain()
+
+            while True:
+                # backoff, що лишився з попередньої помилки (зокрема до перезапуску)
+                wait = self.next_attempt_at - time.time() if self.next_attempt_at else 0
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    full |= self._drain()
+                self.running = True
+                try:
+                    async with self._lock:
+                        report = await loop.run_in_executor(None, sync_to_sheets, self.client, full)
+                    if report is not None:
+                        self._pulled(report)
+                except Exception as e:
+                    self.attempt += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    self.last_error_at = datetime.now()
+                    delay = min(self.retry_base * 2 ** (self.attempt - 1), self.retry_max)
+                    self.next_attempt_at = time.time() + delay
+                    print(f"⚠️ Офіс {self.tenant_id}: помилка синхронізації "
+                          f"(спроба {self.attempt}, повтор через {delay:.0f} с):", e)
+                    await self._save_state()
+                else:
+                    self.last_success = datetime.now()
+                    self.attempt = 0
+                    self.next_attempt_at = None
+                    await self._save_state()
+                    break
+                finally:
+                    self.running = False
+
+    def _pulled(self, report: PullReport):
+        self.last_pull = datetime.now()
+        self.last_pull_report = report
+        if report.applied and self.on_import:
+            self.on_import(self.tenant_id)
+        if report.applied or report.conflicts:
+            # вивантажуємо імпортовані рядки в нормалізованому вигляді, а конфліктні — версією бота
+            self.notify()
+
+    async def pull(self) -> PullReport | None:
+        """Імпорт правок з аркуша зараз; помилки API пробрасуються викликачу."""
+        async with self._lock:
+            report = await asyncio.get_running_loop().run_in_executor(None, pull_from_sheets, self.client)
+        if report is not None:
+            self._pulled(report)
+        return report
+
+    async def _pull_loop(self):
+        while True:
+            await asyncio.sleep(self.pull_interval)
+            try:
+                await self.pull()
+            except Exception as e:
+                print("⚠️ Помилка імпорту з Google Sheets:", e)
+
+    async def status(self) -> dict:
+        return {
+            "last_success": self.last_success,
+            "last_pull": self.last_pull,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+            "configured": self.client.configured,
+            "pending_changes": await pending_changes(self.tenant_id),
+            "queued": self.queue.qsize(),
+            "attempt": self.attempt,
+            "next_attempt": _ts(self.next_attempt_at),
+            "running": self.running,
+        }
+
+
+class SheetsSyncPool:
+    """Воркери синхронізації всіх офісів: у кожного своя таблиця, outbox і backoff.
+
+    Офіс 1 без власної таблиці вивантажується в GSHEET_ID з налаштувань.
+    refresh() перечитує офіси і перезапускає лише ті воркери, чия таблиця змінилася.
+    """
+
+    def __init__(self, **worker_kwargs):
+        self.worker_kwargs = worker_kwargs
+        self.workers: dict[int, SheetsSyncWorker] = {}
+        self.started = False
+
+    @staticmethod
+    def sheet_for(tenant) -> str | None:
+        return tenant.gsheet_id or (GSHEET_ID if tenant.id == DEFAULT_TENANT else None)
+
+    async def refresh(self):
+        for tenant in await list_tenants():
+            sheet_id = self.sheet_for(tenant)
+            worker = self.workers.get(tenant.id)
+            if worker is not None and worker.client.sheet_id == sheet_id:
+                continue
+            if worker is not None:
+                await worker.stop()
+            worker = self.workers[tenant.id] = SheetsSyncWorker(
+                SheetsClient(sheet_id, tenant_id=tenant.id), **self.worker_kwargs
+            )
+            if self.started:
+                worker.start()
+
+    def get(self, tenant_id: int) -> SheetsSyncWorker:
+        return self.workers[tenant_id]
+
+    def notify(self, tenant_id: int, full: bool = False):
+        if worker := self.workers.get(tenant_id):
+            worker.notify(full)
+
+    async def start(self):
+        await self.refresh()
+        self.started = True
+        for worker in self.workers.values():
+            worker.start()
+
+    async def stop(self):
+        self.started = False
+        for worker in self.workers.values():
+            await worker.stop()
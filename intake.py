@@ -0,0 +1,112 @@
+import csv
+import io
+from datetime import date, datetime
+from typing import Iterable, Iterator, NamedTuple
+
+from db import DATE_FMT
+
+
+# === 📥 Розбір вхідних даних для пакетного додавання ===
+DATE_FORMATS = ("%d.%m.%Y", "%d.%m.%y", "%Y-%m-%d", "%d-%m-%Y", "%Y/%m/%d", "%d/%m/%Y")
+MAX_ERRORS_SHOWN = 20
+
+
+class IntakeResult(NamedTuple):
+    rows: list[tuple[str, str]]          # (дата ISO, відділ)
+    errors: list[tuple[int, str]]        # (номер рядка, опис помилки)
+
+
+def normalize_date(value) -> str | None:
+    if isinstance(value, (datetime, date)):
+        return value.strftime(DATE_FMT)
+    text = str(value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime(DATE_FMT)
+        except ValueError:
+            continue
+    return None
+
+
+def _cell(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def _collect(records: Iterable[tuple[int, list]], skip_header: bool) -> IntakeResult:
+    rows, errors = [], []
+    for line_no, cells in records:
+        raw_date, dept = (list(cells[:2]) + [None, None])[:2]
+        if not _cell(raw_date) and not _cell(dept):
+            continue
+        dept = _cell(dept)
+        date_received = normalize_date(raw_date)
+        if date_received is None:
+            # перший рядок файлу без дати вважаємо заголовком
+            if not (skip_header and line_no == 1):
+                errors.append((line_no, f"невідома дата «{_cell(raw_date)}»"))
+            continue
+        if not dept:
+            errors.append((line_no, "не вказано відділ"))
+            continue
+        rows.append((date_received, dept))
+    return IntakeResult(rows, errors)
+
+
+def parse_text(text: str) -> IntakeResult:
+    """Повідомлення: по одному `ДД.ММ.РРРР, Відділ` на рядок."""
+    def records():
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            yield line_no, line.split(",", 1)
+    return _collect(records(), skip_header=False)
+
+
+def _csv_records(stream: io.TextIOBase) -> Iterator[tuple[int, list]]:
+    # роздільник визначаємо за першим рядком: «,», «;» (Excel) або табуляція
+    first = stream.readline()
+    delimiter = max(",;\t", key=first.count)
+    stream.seek(0)
+    for line_no, cells in enumerate(csv.reader(stream, delimiter=delimiter), start=1):
+        yield line_no, cells
+
+
+def parse_csv(data: io.BufferedIOBase) -> IntakeResult:
+    # Excel в українській локалі зберігає CSV у cp1251
+    for encoding in ("utf-8-sig", "cp1251"):
+        data.seek(0)
+        stream = io.TextIOWrapper(data, encoding=encoding, newline="")
+        try:
+            return _collect(_csv_records(stream), skip_header=True)
+        except UnicodeDecodeError:
+            continue
+        finally:
+            stream.detach()
+    raise ValueError("не вдалося визначити кодування CSV")
+
+
+def parse_xlsx(data: io.BufferedIOBase) -> IntakeResult:
+    from openpyxl import load_workbook
+
+    # read_only — рядки читаються потоково, без завантаження всієї книги в пам'ять
+    wb = load_workbook(data, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        records = enumerate(ws.iter_rows(max_col=2, values_only=True), start=1)
+        return _collect(records, skip_header=True)
+    finally:
+        wb.close()
+
+
+def parse_document(filename: str, data: io.BufferedIOBase) -> IntakeResult:
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        return parse_xlsx(data)
+    if name.endswith((".csv", ".txt")):
+        return parse_csv(data)
+    raise ValueError("підтримуються лише файли .csv та .xlsx")
+
+
+def format_errors(errors: list[tuple[int, str]]) -> str:
+    lines = [f"• рядок {line_no}: {reason}" for line_no, reason in errors[:MAX_ERRORS_SHOWN]]
+    if len(errors) > MAX_ERRORS_SHOWN:
+        lines.append(f"… і ще {len(errors) - MAX_ERRORS_SHOWN}")
+    return "\n".join(lines)
@@ -0,0 +1,241 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from aiohttp import web
+
+from config import SLOW_QUERY_MS, METRICS_TOKEN
+
+
+# === 📈 Метрики (формат Prometheus) ===
+# Без зовнішніх залежностей: лічильники й гістограми тримаються в пам'яті процесу,
+# /metrics віддає їх текстом, /perf — коротким зведенням для адміністратора.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT = 512   # останні заміри на серію — для перцентилів у /perf
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: tuple = ()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names + extra[:1], values + extra[1:])]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.series: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), n: float = 1):
+        with self._lock:
+            self.series[labels] = self.series.get(labels, 0) + n
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, n in sorted(self.series.items()):
+            lines.append(f"{self.name}{_labels(self.labels, values)} {n:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        # мітки → [лічильники кошиків, сума, кількість, останні заміри]
+        self.series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            s = self.series.get(labels)
+            if s is None:
+                s = self.series[labels] = [[0] * len(BUCKETS), 0.0, 0, deque(maxlen=RECENT)]
+            i = bisect_left(BUCKETS, value)
+            if i < len(BUCKETS):
+                s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+            s[3].append(value)
+
+    def percentile(self, labels: tuple, q: float) -> float:
+        recent = sorted(self.series[labels][3])
+        return recent[min(len(recent) - 1, int(q * len(recent)))]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (buckets, total, count, _) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS, buckets):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, ('le', f'{bound:g}'))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels, values, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {count}")
+        return lines
+
+
+handler_seconds = Histogram("bot_handler_seconds", "Час обробки апдейта", ("event", "handler"))
+handler_errors = Counter("bot_handler_errors_total", "Апдейти, що завершилися винятком", ("event", "handler"))
+db_seconds = Histogram("db_call_seconds", "Час виклику репозиторію в потоці БД", ("call",))
+db_statements = Counter("db_statements_total", "SQL-інструкції (без кроків тригерів)", ("call",))
+sheets_requests = Counter("sheets_requests_total", "HTTP-запити до Google Sheets API", ("op",))
+sheets_failures = Counter("sheets_failures_total", "Невдалі запити до Google Sheets API", ("op",))
+sheets_bytes = Counter("sheets_bytes_sent_total", "Байтів надіслано в Google Sheets API")
+tg_coalesced = Counter("tg_edits_coalesced_total", "Редагування, злиті з новішим до відправлення")
+tg_retry_after = Counter("tg_retry_after_total", "Відповіді 429 (flood control) від Bot API")
+METRICS = (handler_seconds, handler_errors, db_seconds, db_statements, sheets_requests, sheets_failures, sheets_bytes,
+           tg_coalesced, tg_retry_after)
+
+# повільні виклики БД: (коли, мс, виклик, SQL)
+slow_queries: deque = deque(maxlen=50)
+started_at = datetime.now()
+
+
+def render() -> str:
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# === ⏱️ Обробники aiogram ===
+def callback_prefix(data: str) -> str:
+    """open_batch_12_a40 → open_batch_, set_5_s2 → set_, menu_view → menu_view."""
+    parts = data.split("_")
+    for i, part in enumerate(parts):
+        if any(ch.isdigit() for ch in part):
+            return "_".join(parts[:i]) + "_"
+    return data
+
+
+def update_key(update: Update) -> tuple[str, str]:
+    event = update.event_type
+    if update.callback_query:
+        return event, callback_prefix(update.callback_query.data or "")
+    if update.message:
+        text = update.message.text or ""
+        if text.startswith("/"):
+            return event, text.split(maxsplit=1)[0].split("@")[0]
+        return event, "document" if update.message.document else "text"
+    return event, event
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Зовнішній middleware апдейтів: час від фільтрів до відповіді, з розбивкою за префіксом."""
+
+    async def __call__(self, handler: Callable[[Update, dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: dict[str, Any]) -> Any:
+        key = update_key(event)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(key)
+            raise
+        finally:
+            handler_seconds.observe(key, time.perf_counter() - started)
+
+
+# === 🗄️ SQLite ===
+def observe_db(call: str, seconds: float, statements: list[str]):
+    """Хук Database.instrument: викликається в потоці БД після кожного виклику репозиторію."""
+    db_seconds.observe((call,), seconds)
+    db_statements.inc((call,), len(statements))
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        sql = "; ".join(" ".join(s.split()) for s in statements)
+        slow_queries.append((datetime.now(), seconds * 1000, call, sql))
+        print(f"🐢 Повільний запит {call}: {seconds * 1000:.1f} мс — {sql[:300]}")
+
+
+# === 📗 Google Sheets ===
+def _sheets_op(method: str, endpoint: str) -> str:
+    """…/values/A1:append → «POST append», …/{id}:batchUpdate → «POST batchUpdate»."""
+    tail = endpoint.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+    if ":" in tail and not tail.split(":", 1)[1][:1].isupper():
+        op = tail.split(":", 1)[1]
+    else:
+        op = "values" if "/values" in endpoint else "metadata"
+    return f"{method.upper()} {op}"
+
+
+def _count_bytes(response):
+    body = getattr(getattr(response, "request", None), "body", None)
+    if body:
+        sheets_bytes.inc((), len(body))
+
+
+def instrument_http(http_client):
+    """Обгортає gspread HTTPClient.request: кількість запитів, байти та помилки."""
+    request = http_client.request
+
+    def counted(method, endpoint, *args, **kwargs):
+        op = _sheets_op(method, endpoint)
+        sheets_requests.inc((op,))
+        try:
+            response = request(method, endpoint, *args, **kwargs)
+        except Exception as e:
+            sheets_failures.inc((op,))
+            # APIError несе відповідь — тіло запиту все одно пішло в мережу
+            _count_bytes(getattr(e, "response", None))
+            raise
+        _count_bytes(response)
+        return response
+
+    http_client.request = counted
+
+
+# === 🧾 /perf та /metrics ===
+def perf_report(top: int = 8) -> str:
+    lines = [f"⏱️ Продуктивність з {started_at:%d.%m.%Y %H:%M}", "", "Обробники (p50 / p99, мс · кількість):"]
+    series = sorted(handler_seconds.series.items(), key=lambda kv: -kv[1][2])
+    for (event, name), s in series[:top]:
+        errors = handler_errors.series.get((event, name), 0)
+        lines.append(f"• {name}: {handler_seconds.percentile((event, name), .5) * 1000:.1f} / "
+                     f"{handler_seconds.percentile((event, name), .99) * 1000:.1f} · {s[2]}"
+                     + (f" · помилок {errors:g}" if errors else ""))
+    if not series:
+        lines.append("ще немає даних")
+
+    lines += ["", "БД (сумарно, мс · викликів · SQL):"]
+    calls = sorted(db_seconds.series.items(), key=lambda kv: -kv[1][1])
+    for (call,), s in calls[:top]:
+        lines.append(f"• {call}: {s[1] * 1000:.0f} · {s[2]} · {db_statements.series.get((call,), 0):g}")
+
+    requests = sum(sheets_requests.series.values())
+    failures = sum(sheets_failures.series.values())
+    sent = sheets_bytes.series.get((), 0)
+    lines += ["", f"Google Sheets: запитів {requests:g}, помилок {failures:g}, надіслано {sent / 1024:.1f} КБ"]
+    lines.append(f"Bot API: злито редагувань {tg_coalesced.series.get((), 0):g}, "
+                 f"flood control {tg_retry_after.series.get((), 0):g}")
+
+    if SLOW_QUERY_MS:
+        lines += ["", f"🐢 Повільні (≥ {SLOW_QUERY_MS} мс): {len(slow_queries)}"]
+        for ts, ms, call, sql in list(slow_queries)[-5:]:
+            lines.append(f"• {ts:%H:%M:%S} {call} {ms:.0f} мс: {sql[:120]}")
+    return "\n".join(lines)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return web.Response(status=401, text="Unauthorized")
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Окремий HTTP-сервер з /metrics (за замовчуванням лише на 127.0.0.1)."""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"📈 Метрики: http://{host}:{port}/metrics")
+    return runner
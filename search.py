@@ -0,0 +1,69 @@
+import re
+from typing import NamedTuple
+
+from db import STATUS_MAP
+from intake import normalize_date
+
+
+# === 🔎 Розбір пошукового запиту /find ===
+FIND_HELP = (
+    "🔎 Пошук картриджів по всіх партіях:\n"
+    "/find Бухгалтерія — відділ (частина назви)\n"
+    "/find #125 або /find 125 — за номером картриджа\n"
+    "/find s2 — за статусом: " + " · ".join(f"{code} {label}" for code, (label, _, _) in STATUS_MAP.items()) + "\n"
+    "/find вилуч:01.03.2025..31.03.2025 — дата вилучення\n"
+    "/find відпр:01.03.2025.. — дата відправлення (межу можна не вказувати)\n"
+    "Умови можна поєднувати: /find Кадри s2 відпр:01.03.2025..\n"
+    "Те саме працює в inline-режимі: @бот запит"
+)
+
+_RANGE_FIELDS = {"вилуч": "received", "відпр": "sent"}
+_RANGE_RE = re.compile(r"^(вилуч|відпр):(.*)$", re.IGNORECASE)
+
+
+class SearchQuery(NamedTuple):
+    department: str = ""
+    cartridge_id: int | None = None
+    status: str | None = None
+    received: tuple[str | None, str | None] = (None, None)
+    sent: tuple[str | None, str | None] = (None, None)
+
+
+def _date_range(raw: str) -> tuple[str | None, str | None]:
+    start, sep, end = raw.partition("..")
+    if not sep:
+        end = start
+    bounds = []
+    for value in (start, end):
+        value = value.strip()
+        if not value:
+            bounds.append(None)
+            continue
+        iso = normalize_date(value)
+        if iso is None:
+            raise ValueError(f"невідома дата «{value}»")
+        bounds.append(iso)
+    return bounds[0], bounds[1]
+
+
+def parse_query(text: str) -> SearchQuery:
+    """Розбирає запит; ValueError — з описом, що саме не так."""
+    fields = {}
+    words = []
+    for token in text.split():
+        lowered = token.lower()
+        if m := _RANGE_RE.match(token):
+            fields[_RANGE_FIELDS[m.group(1).lower()]] = _date_range(m.group(2))
+        elif lowered in STATUS_MAP:
+            fields["status"] = STATUS_MAP[lowered][0]
+        elif token.startswith("#") and token[1:].isdigit():
+            fields["cartridge_id"] = int(token[1:])
+        else:
+            words.append(token)
+    # запит з одного числа — це номер картриджа, а не частина назви відділу
+    if len(words) == 1 and words[0].isdigit() and not fields:
+        fields["cartridge_id"] = int(words.pop())
+    query = SearchQuery(department=" ".join(words), **fields)
+    if query == SearchQuery():
+        raise ValueError("порожній запит")
+    return query
@@ -0,0 +1,82 @@
+import re
+from collections import defaultdict
+from datetime import date
+
+import db
+from db import STATUS_MAP
+
+
+# === 📊 Звіт /stats ===
+# Усе рахується з агрегатів, які тригери оновлюють при кожній події,
+# тож звіт не переглядає журнал cartridge_events.
+def current_quarter(today: date | None = None) -> str:
+    today = today or date.today()
+    return f"{today.year}-Q{(today.month + 2) // 3}"
+
+
+STATS_USAGE = "Використання: /stats [РРРР-QN], напр. /stats 2025-Q3 — без аргументу поточний квартал."
+
+
+def parse_period(text: str) -> str | None:
+    """«2025-q3» → «2025-Q3»; None, якщо це не квартал."""
+    m = re.fullmatch(r"(\d{4})-Q([1-4])", text.strip().upper())
+    return f"{m[1]}-Q{m[2]}" if m else None
+
+
+def percentile(hist: list[tuple[int, int]], q: float) -> int | None:
+    """Перцентиль за гістограмою [(значення, кількість)], відсортованою за значенням."""
+    total = sum(n for _, n in hist)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for value, n in hist:
+        seen += n
+        if seen >= rank:
+            return value
+    return hist[-1][0]
+
+
+def _summary(hist: list[tuple[int, int]]) -> str:
+    total = sum(n for _, n in hist)
+    avg = sum(v * n for v, n in hist) / total
+    return (f"p50 {percentile(hist, 0.5)} · p90 {percentile(hist, 0.9)} · "
+            f"max {hist[-1][0]} · сер. {avg:.1f} дн. ({total} шт.)")
+
+
+async def build_report(tenant_id: int, period: str | None = None) -> str:
+    period = period or current_quarter()
+    lines = [f"📊 Статистика за {period}", ""]
+
+    by_dept: dict[str, dict[int, int]] = defaultdict(dict)
+    overall: dict[int, int] = defaultdict(int)
+    for dept, days, n in await db.turnaround_histogram(tenant_id, period):
+        by_dept[dept][days] = n
+        overall[days] += n
+
+    lines.append("⏱️ Днів на фірмі (відправлено → прибуло):")
+    if overall:
+        lines.append("Усього: " + _summary(sorted(overall.items())))
+        ranked = sorted(by_dept.items(), key=lambda kv: -sum(kv[1].values()))
+        for dept, hist in ranked[:10]:
+            lines.append(f"• {dept or '—'}: " + _summary(sorted(hist.items())))
+        if len(ranked) > 10:
+            lines.append(f"… і ще відділів: {len(ranked) - 10}")
+    else:
+        lines.append("немає повернень за цей період")
+
+    lines += ["", "📈 Переходи за тижнями:"]
+    weekly: dict[str, dict[str, int]] = defaultdict(dict)
+    for week, status, n in await db.weekly_throughput(tenant_id):
+        weekly[week][status] = n
+    if weekly:
+        for week, counts in weekly.items():
+            parts = [f"{label.split()[0]} {counts.get(label, 0)}" for label, _, _ in STATUS_MAP.values()]
+            lines.append(f"{week}: " + " · ".join(parts))
+    else:
+        lines.append("подій ще немає")
+
+    backlog = await db.status_backlog(tenant_id)
+    lines += ["", "📦 Зараз у статусах:"]
+    lines += [f"{label}: {backlog[col]}" for label, _, col in STATUS_MAP.values()]
+    return "\n".join(lines)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TOKEN", "42:TEST")
+os.environ.setdefault("ADMIN_ID", "1")
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Чиста база з актуальною схемою; власник — користувач 1."""
+    db.database.close()
+    db.database.path = str(tmp_path / "cartridges.db")
+    db.init_schema.sync("2026-01-01", 1)
+    yield db.database
+    db.database.close()
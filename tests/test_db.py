@@ -0,0 +1,22 @@
+import db
+
+
+def test_search_is_isolated_per_tenant(database):
+    other = db.create_tenant.sync("Філія", "2026-01-01")
+    other_batch = db.list_batches.sync(other).items[0].id
+    db.add_cartridges.sync(1, [("2025-01-02", "Бухгалтерія")], db.STATUS_WITHDRAWN, 1)
+    db.add_cartridges.sync(other, [("2025-01-02", "Бухгалтерія філії")], db.STATUS_WITHDRAWN, other_batch)
+
+    own = db.search_cartridges.sync(1, department="бухгал")
+    theirs = db.search_cartridges.sync(other, department="бухгал")
+    assert [c.department for c in own.items] == ["Бухгалтерія"]
+    assert [c.department for c in theirs.items] == ["Бухгалтерія філії"]
+
+    # індекс офісу не містить чужих рядків і стежить за змінами та видаленнями
+    fts = db._fts_table(other)
+    assert db.fetchall.sync(f"SELECT rowid FROM {fts} WHERE {fts} MATCH 'бухгал'") == [(2,)]
+    db.execute.sync("UPDATE cartridges SET department='Склад' WHERE tenant_id=?", (other,))
+    assert db.search_cartridges.sync(other, department="бухгал").items == []
+    assert [c.department for c in db.search_cartridges.sync(other, department="скла").items] == ["Склад"]
+    db.delete_batch.sync(other, other_batch)
+    assert db.search_cartridges.sync(other, department="скла").items == []
@@ -0,0 +1,55 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+import db
+import fsm_storage
+from fsm_storage import SQLiteStorage
+
+KEY = StorageKey(bot_id=42, chat_id=1, user_id=1)
+
+
+def other_process_sets_state(state: str):
+    """Запис з окремого з'єднання — так у базу пише інший процес бота."""
+    conn = db.connect(db.database.path)
+    with conn:
+        conn.execute("UPDATE fsm_state SET state=?", (state,))
+    conn.close()
+
+
+def test_cached_reads_do_not_touch_db(database, monkeypatch):
+    async def scenario():
+        storage = SQLiteStorage()
+        await storage.set_state(KEY, "AddFlow:entering_data")
+        calls = []
+
+        async def call(fn, *args, **kwargs):
+            calls.append(fn.__name__)
+
+        monkeypatch.setattr(database, "call", call)
+        for _ in range(100):
+            assert await storage.get_state(KEY) == "AddFlow:entering_data"
+        assert calls == []
+
+    asyncio.run(scenario())
+
+
+def test_shared_storage_sees_other_process(database, monkeypatch):
+    async def scenario():
+        storage = SQLiteStorage(shared=True, version_check=0)
+        await storage.set_state(KEY, "AddFlow:choosing_batch")
+        assert await storage.get_state(KEY) == "AddFlow:choosing_batch"
+        other_process_sets_state("AddFlow:entering_data")
+        assert await storage.get_state(KEY) == "AddFlow:entering_data"
+
+        # звірка не частіше за version_check: між перевірками читання йдуть з кешу
+        storage.version_check = 60
+        other_process_sets_state("AddFlow:choosing_batch")
+        checks = []
+        original = fsm_storage.fsm_data_version
+        monkeypatch.setattr(fsm_storage, "fsm_data_version", lambda: checks.append(1) or original())
+        for _ in range(10):
+            await storage.get_state(KEY)
+        assert checks == []
+
+    asyncio.run(scenario())
@@ -0,0 +1,210 @@
+import re
+
+import db
+import gsheets
+
+
+class SheetStub:
+    """Аркуш, що зберігає відформатовані значення так, як їх повернув би get_all_values.
+
+    USER_ENTERED імітує автотипізацію Sheets: числа втрачають провідні нулі, «1/2» стає датою.
+    """
+
+    def __init__(self):
+        self.values: list[list[str]] = []
+        self.row_count = 1000
+        self.id = 0
+        self.spreadsheet = self
+
+    @staticmethod
+    def _entered(value, option: str) -> str:
+        text = "" if value is None else str(value)
+        if option == "USER_ENTERED":
+            if re.fullmatch(r"-?\d+", text):
+                return str(int(text))
+            if m := re.fullmatch(r"(\d{1,2})/(\d{1,2})", text):
+                return f"{m[1]}/{m[2]}/2026"
+        return text
+
+    def _put(self, row: int, cells: list, option: str):
+        while len(self.values) < row:
+            self.values.append([])
+        self.values[row - 1] = [self._entered(v, option) for v in cells]
+
+    def clear(self):
+        self.values = []
+
+    def append_rows(self, rows, value_input_option="RAW"):
+        for cells in rows:
+            self._put(len(self.values) + 1, cells, value_input_option)
+
+    def batch_update(self, updates, value_input_option="RAW"):
+        if "requests" in updates:
+            for req in updates["requests"]:
+                del self.values[req["deleteDimension"]["range"]["startIndex"]]
+            return
+        for u in updates:
+            self._put(int(re.match(r"A(\d+)", u["range"])[1]), u["values"][0], value_input_option)
+
+    def add_rows(self, n):
+        self.row_count += n
+
+    def format(self, *args, **kwargs):
+        pass
+
+    def freeze(self, *args, **kwargs):
+        pass
+
+    def col_values(self, col):
+        return [r[col - 1] if len(r) >= col else "" for r in self.values]
+
+    def get_all_values(self):
+        return [list(r) for r in self.values]
+
+
+def push(ws, created=False):
+    dirty, row_map, _ = gsheets.load_sync_state.sync(1)
+    return gsheets._sync(ws, created, 1, dirty, row_map, False)
+
+
+def assert_sheet_matches_db(ws):
+    """Аркуш містить рівно рядки бази, а збережена карта вказує на їхні фактичні позиції."""
+    assert ws.values[0] == gsheets.HEADERS
+    expected = sorted([str(v) if v is not None else "" for v in gsheets._sheet_row(r)]
+                      for r in gsheets.fetch_all_rows.sync(1))
+    assert sorted(ws.values[1:], key=lambda cells: int(cells[0])) == expected
+    _, row_map, _ = gsheets.load_sync_state.sync(1)
+    assert {cid: ws.values[row - 1][0] for cid, row in row_map.items()} == {cid: str(cid) for cid in row_map}
+    assert len(row_map) == len(expected)
+
+
+def test_incremental_sync_follows_db(database):
+    db.add_cartridges.sync(1, [("2025-01-02", f"Відділ {i}") for i in range(1, 6)], db.STATUS_WITHDRAWN, 1)
+    ws = SheetStub()
+    push(ws, created=True)
+    assert_sheet_matches_db(ws)
+
+    # нові картриджі дописуються в кінець
+    batch = db.create_batch.sync(1, "2025-02-01")
+    db.add_cartridges.sync(1, [("2025-02-02", "Склад"), ("2025-02-03", "Каса")], db.STATUS_WITHDRAWN, batch)
+    push(ws)
+    assert_sheet_matches_db(ws)
+    assert [cells[0] for cells in ws.values[-2:]] == ["6", "7"]
+
+    # видалення посередині: рядок прибрано, нижчі зсунуто вгору, карта перерахована
+    db.delete_cartridge.sync(1, 2)
+    db.delete_cartridge.sync(1, 4)
+    push(ws)
+    assert_sheet_matches_db(ws)
+    assert [cells[0] for cells in ws.values[1:]] == ["1", "3", "5", "6", "7"]
+
+    # зміна статусу переписує лише свій рядок
+    sent = db.STATUS_MAP["s2"][0]
+    db.set_cartridge_status.sync(1, 5, sent, "date_sent", "2025-03-01")
+    before = [list(cells) for cells in ws.values]
+    push(ws)
+    assert_sheet_matches_db(ws)
+    changed = [i for i, (a, b) in enumerate(zip(before, ws.values)) if a != b]
+    assert changed == [3] and ws.values[3][3] == sent and ws.values[3][4] == "01.03.2025"
+
+    # видалення після вставки в тій самій пачці змін
+    db.add_cartridges.sync(1, [("2025-03-02", "Охорона")], db.STATUS_WITHDRAWN, batch)
+    db.delete_cartridge.sync(1, 1)
+    push(ws)
+    assert_sheet_matches_db(ws)
+
+
+def test_manual_row_deletion_invalidates_map(database):
+    db.add_cartridges.sync(1, [("2025-01-02", f"Відділ {i}") for i in range(1, 5)], db.STATUS_WITHDRAWN, 1)
+    ws = SheetStub()
+    push(ws, created=True)
+    _, row_map, _ = gsheets.load_sync_state.sync(1)
+    assert gsheets._map_is_valid(ws, row_map)
+
+    # персонал видалив рядок руками — карта більше не відповідає аркушу
+    del ws.values[2]
+    assert not gsheets._map_is_valid(ws, row_map)
+    db.set_cartridge_status.sync(1, 4, db.STATUS_MAP["s2"][0], "date_sent", "2025-02-01")
+    push(ws)
+    assert_sheet_matches_db(ws)
+    assert [cells[0] for cells in ws.values[1:]] == ["1", "2", "3", "4"]
+
+
+def test_push_then_pull_changes_nothing(database):
+    db.add_cartridges.sync(1, [("2025-01-02", "007"), ("2025-01-03", "1/2"), ("2025-01-04", "Бухгалтерія")],
+                           db.STATUS_WITHDRAWN, 1)
+    ws = SheetStub()
+    push(ws, created=True)
+    before = db.fetchall.sync("SELECT * FROM cartridges ORDER BY id")
+
+    report = gsheets._pull(ws, 1)
+    assert (report.applied, report.conflicts, report.errors) == ([], [], [])
+
+    # інкрементне вивантаження теж не має давати «правок»
+    db.set_cartridge_status.sync(1, 1, db.STATUS_MAP["s2"][0], "date_sent", "2025-02-01")
+    push(ws)
+    report = gsheets._pull(ws, 1)
+    assert (report.applied, report.conflicts, report.errors) == ([], [], [])
+    assert ws.values[1][2] == "007"
+    assert len(db.fetchall.sync("SELECT * FROM cartridges ORDER BY id")) == len(before)
+    assert db.fetchone.sync("SELECT department FROM cartridges WHERE id=2") == ("1/2",)
+
+
+def test_pull_applies_real_edit(database):
+    db.add_cartridges.sync(1, [("2025-01-02", "007")], db.STATUS_WITHDRAWN, 1)
+    ws = SheetStub()
+    push(ws, created=True)
+
+    ws.values[1][2] = "Склад"
+    report = gsheets._pull(ws, 1)
+    assert report.applied == [1]
+    assert db.fetchone.sync("SELECT department FROM cartridges WHERE id=1") == ("Склад",)
+
+
+def baseline_sheet(rows) -> SheetStub:
+    """Аркуш, вивантажений версією до міграції: USER_ENTERED і без хешів у sheet_rows."""
+    ws = SheetStub()
+    ws.append_rows([gsheets.HEADERS] + [gsheets._sheet_row(r) for r in rows], value_input_option="USER_ENTERED")
+    db.execute.sync("DELETE FROM sheet_dirty")
+    db.execute.sync("DELETE FROM sheet_rows")
+    for i, r in enumerate(rows):
+        db.execute.sync("INSERT INTO sheet_rows (cartridge_id, row, tenant_id) VALUES (?, ?, 1)", (r[0], i + 2))
+    return ws
+
+
+def test_migrated_sheet_does_not_overwrite_db(database):
+    db.add_cartridges.sync(1, [("2025-01-02", "007"), ("2025-01-03", "Склад")], db.STATUS_WITHDRAWN, 1)
+    ws = baseline_sheet(gsheets.fetch_all_rows.sync(1))
+    assert ws.values[1][2] == "7"
+
+    # періодичний імпорт: «7» — не правка персоналу, рядок перезаписується версією бота
+    report = gsheets._pull(ws, 1)
+    assert report.applied == []
+    assert [cid for cid, _ in report.conflicts] == [1]
+    assert db.fetchone.sync("SELECT department FROM cartridges WHERE id=1") == ("007",)
+    push(ws)
+    assert ws.values[1][2] == "007"
+    report = gsheets._pull(ws, 1)
+    assert (report.applied, report.conflicts, report.errors) == ([], [], [])
+
+    # повна перебудова після міграції теж не імпортує застарілих значень
+    ws = baseline_sheet(gsheets.fetch_all_rows.sync(1))
+    dirty, row_map, _ = gsheets.load_sync_state.sync(1)
+    report = gsheets._sync(ws, False, 1, dirty, row_map, True)
+    assert report.applied == []
+    assert db.fetchone.sync("SELECT department FROM cartridges WHERE id=1") == ("007",)
+    assert ws.values[1][2] == "007"
+
+
+def test_new_sheet_id_forgets_row_hashes(database):
+    db.add_cartridges.sync(1, [("2025-01-02", "Склад")], db.STATUS_WITHDRAWN, 1)
+    push(SheetStub(), created=True)
+    assert db.set_tenant_sheet.sync(1, "other-sheet")
+    assert db.fetchone.sync("SELECT COUNT(*) FROM sheet_rows") == (0,)
+
+    # у новій таблиці вже є чужі дані з тим самим ID
+    ws = SheetStub()
+    ws.append_rows([gsheets.HEADERS, [1, "01.01.2020", "Чуже", db.STATUS_WITHDRAWN, "", "", "", 1]])
+    report = gsheets._pull(ws, 1)
+    assert report.applied == []
+    assert db.fetchone.sync("SELECT department FROM cartridges WHERE id=1") == ("Склад",)
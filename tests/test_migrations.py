@@ -0,0 +1,93 @@
+import sqlite3
+
+import db
+
+# схема, яку створював init_db до версіонованих міграцій (user_version = 0)
+BASELINE = """
+    CREATE TABLE cartridges(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date_received TEXT,
+        department TEXT,
+        status TEXT,
+        date_sent TEXT,
+        date_returned TEXT,
+        date_given TEXT,
+        batch_id INTEGER
+    );
+    CREATE TABLE batches(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT,
+        status TEXT
+    );
+"""
+WITHDRAWN, SENT, RETURNED, ISSUED = (label for label, _, _ in db.STATUS_MAP.values())
+LEGACY_CARTRIDGES = [
+    # id, дата вилучення, відділ, статус, відправлено, прибуло, видано, партія
+    (1, "03.02.2024", "Бухгалтерія", WITHDRAWN, None, None, None, 1),
+    (2, "05.02.2024", "Склад", RETURNED, "06.02.2024", "16.02.2024", None, 1),
+    (3, "01.03.2024", "Каса", ISSUED, "02.03.2024", "04.03.2024", "05.03.2024", 2),
+    (4, "10.03.2024", "Бухгалтерія", SENT, "11.03.2024", None, None, 7),   # партії 7 немає
+    (5, "12.03.2024", "Відділ кадрів", WITHDRAWN, None, None, None, None),
+    (6, "вчора", "Склад", WITHDRAWN, None, None, None, 2),               # нерозпізнана дата
+]
+
+
+def legacy_database(path: str):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE)
+    conn.executemany("INSERT INTO batches VALUES (?, ?, ?)",
+                     [(1, "01.02.2024", "closed"), (2, "01.03.2024", "active")])
+    conn.executemany("INSERT INTO cartridges VALUES (?, ?, ?, ?, ?, ?, ?, ?)", LEGACY_CARTRIDGES)
+    # видалений картридж з більшим id — AUTOINCREMENT не має видати його номер повторно
+    conn.execute("INSERT INTO cartridges (id, department) VALUES (10, 'тимчасовий')")
+    conn.execute("DELETE FROM cartridges WHERE id=10")
+    conn.commit()
+    conn.close()
+
+
+def test_migrate_legacy_database(tmp_path):
+    db.database.close()
+    db.database.path = str(tmp_path / "legacy.db")
+    legacy_database(db.database.path)
+    try:
+        db.init_schema.sync("2026-01-01", 1)
+
+        assert db.fetchone.sync("PRAGMA user_version") == (len(db.MIGRATIONS),)
+        assert db.fetchone.sync("PRAGMA integrity_check") == ("ok",)
+        assert db.fetchall.sync("PRAGMA foreign_key_check") == []
+
+        # жоден рядок не загубився, дати — ISO, нерозпізнане лишилося як було
+        rows = db.fetchall.sync(f"SELECT {db.CARTRIDGE_COLUMNS} FROM cartridges ORDER BY id")
+        assert [r[0] for r in rows] == [1, 2, 3, 4, 5, 6]
+        assert rows[1][1:7] == ("2024-02-05", "Склад", RETURNED, "2024-02-06", "2024-02-16", None)
+        assert rows[2][4:7] == ("2024-03-02", "2024-03-04", "2024-03-05")
+        assert rows[5][1] == "вчора"
+        assert db.fetchall.sync("SELECT id, created_at, status FROM batches ORDER BY id") == [
+            (1, "2024-02-01", "closed"), (2, "2024-03-01", "active"), (7, None, "closed"),
+        ]
+        assert rows[4][7] is None
+        assert db.fetchall.sync("SELECT DISTINCT tenant_id FROM cartridges") == [(db.DEFAULT_TENANT,)]
+        assert db.fetchone.sync("SELECT seq FROM sqlite_sequence WHERE name='cartridges'") == (10,)
+
+        # лічильники партій збігаються з фактичними статусами, перерахунку не потрібно
+        assert db.fetchall.sync("SELECT batch_id, total, withdrawn, sent, returned, issued "
+                                "FROM batch_summary ORDER BY batch_id") == [
+            (1, 2, 1, 0, 1, 0), (2, 2, 1, 0, 0, 1), (7, 1, 0, 1, 0, 0),
+        ]
+        assert db.database.call_sync(db._rebuild_batch_summary) == []
+
+        # історія відновлена з дат, а час «на фірмі» для прибулих — у статистиці
+        assert db.fetchall.sync("SELECT ts, status FROM cartridge_events WHERE cartridge_id=2 ORDER BY ts") == [
+            ("2024-02-05T00:00:00", WITHDRAWN), ("2024-02-06T00:00:00", SENT), ("2024-02-16T00:00:00", RETURNED),
+        ]
+        assert db.fetchall.sync("SELECT period, department, days, n FROM stats_turnaround ORDER BY department") == [
+            ("2024-Q1", "Каса", 2, 1), ("2024-Q1", "Склад", 10, 1),
+        ]
+
+        # пошуковий індекс офісу містить усі наявні картриджі
+        found = db.search_cartridges.sync(db.DEFAULT_TENANT, department="бухгал")
+        assert sorted(c.id for c in found.items) == [1, 4]
+        fts = db._fts_table(db.DEFAULT_TENANT)
+        assert db.fetchall.sync(f"SELECT rowid FROM {fts} WHERE {fts} MATCH 'кадр'") == [(5,)]
+    finally:
+        db.database.close()
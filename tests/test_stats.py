@@ -0,0 +1,8 @@
+import stats
+
+
+def test_parse_period():
+    assert stats.parse_period("2025-q3") == "2025-Q3"
+    assert stats.parse_period(" 2024-Q1 ") == "2024-Q1"
+    for bad in ("GARBAGE", "2025-Q5", "2025Q3", "25-Q1", "2025-Q3 extra", ""):
+        assert stats.parse_period(bad) is None
@@ -0,0 +1,47 @@
+import asyncio
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from throttle import OutgoingScheduler
+
+
+class FloodedApi:
+    """make_request, що відповідає 429 на перший запит до flooded_chat."""
+
+    def __init__(self, flooded_chat: int, retry_after: int):
+        self.flooded_chat = flooded_chat
+        self.retry_after = retry_after
+        self.sent: list[tuple[int, float]] = []
+
+    async def __call__(self, bot, method):
+        loop = asyncio.get_running_loop()
+        if method.chat_id == self.flooded_chat and self.retry_after:
+            retry_after, self.retry_after = self.retry_after, 0
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=retry_after)
+        self.sent.append((method.chat_id, loop.time()))
+        return True
+
+
+def test_flooded_chat_does_not_delay_other_chats():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        api = FloodedApi(flooded_chat=5, retry_after=5)
+        scheduler = OutgoingScheduler(global_rate=30, chat_rate=1, burst=1)
+
+        flooded = asyncio.create_task(scheduler(api, None, SendMessage(chat_id=5, text="a")))
+        await asyncio.sleep(0.05)   # чат 5 отримав 429 і чекає retry_after
+        # друга відправка в чат 5 резервує слот далеко в майбутньому
+        queued = asyncio.create_task(scheduler(api, None, SendMessage(chat_id=5, text="b")))
+        await asyncio.sleep(0.05)
+
+        started = loop.time()
+        await scheduler(api, None, SendMessage(chat_id=6, text="c"))
+        elapsed = loop.time() - started
+
+        for task in (flooded, queued):
+            task.cancel()
+        await asyncio.gather(flooded, queued, return_exceptions=True)
+        return elapsed
+
+    assert asyncio.run(scenario()) < 0.5
@@ -0,0 +1,35 @@
+import asyncio
+
+from views import View, ViewCache, batch_scope, list_scope
+
+
+def test_invalidate_tenant_keeps_other_tenants():
+    async def scenario():
+        cache = ViewCache()
+        renders = []
+
+        def render(name):
+            async def _render():
+                renders.append(name)
+                return View(name)
+            return _render
+
+        for tenant_id in (1, 2):
+            await cache.get_or_render(("view", tenant_id), list_scope(tenant_id), render(f"list {tenant_id}"))
+            await cache.get_or_render(("batch", tenant_id), batch_scope(tenant_id, tenant_id * 10),
+                                      render(f"batch {tenant_id}"))
+        cache.invalidate_tenant(1)
+        for tenant_id in (1, 2):
+            await cache.get_or_render(("view", tenant_id), list_scope(tenant_id), render(f"list {tenant_id}"))
+            await cache.get_or_render(("batch", tenant_id), batch_scope(tenant_id, tenant_id * 10),
+                                      render(f"batch {tenant_id}"))
+        assert renders[4:] == ["list 1", "batch 1"]
+
+        # екран, відмальований паралельно зі скиданням офісу, у кеш не потрапляє
+        async def slow():
+            cache.invalidate_tenant(1)
+            return View("stale")
+        await cache.get_or_render(("batch", 1, "new"), batch_scope(1, 99), slow)
+        assert ("batch", 1, "new") not in cache._entries
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiohttp.test_utils import TestClient, TestServer
+
+import metrics
+import webhook
+
+UPDATE = {"update_id": 1, "message": {
+    "message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"},
+    "from": {"id": 1, "is_bot": False, "first_name": "A"}, "text": "hi",
+}}
+
+
+async def webhook_client(limit: int = 1) -> tuple[TestClient, list, asyncio.Event]:
+    dp = Dispatcher()
+    seen, release = [], asyncio.Event()
+
+    @dp.message()
+    async def slow(message):
+        seen.append(message.text)
+        await release.wait()
+
+    app = webhook.create_app(dp, Bot("42:TEST"), secret="s3cret", path="/wh", limit=limit)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    return client, seen, release
+
+
+def test_updates_are_acknowledged_and_limited():
+    async def scenario():
+        client, seen, release = await webhook_client(limit=1)
+        try:
+            bad = await client.post("/wh", json=UPDATE, headers={"X-Telegram-Bot-Api-Secret-Token": "no"})
+            assert bad.status == 401
+            for i in range(3):
+                resp = await client.post("/wh", json=dict(UPDATE, update_id=i + 1),
+                                         headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"})
+                assert resp.status == 200
+            await asyncio.sleep(0.05)
+            handler = client.app["request_handler"]
+            # Telegram отримав відповідь одразу, а обробляється не більше limit оновлень
+            assert (seen, handler.in_flight, handler.queued) == (["hi"], 1, 2)
+            release.set()
+            await asyncio.sleep(0.05)
+            assert (len(seen), handler.processed, handler.queued) == (3, 3, 0)
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
+
+
+def test_metrics_on_public_listener_require_token(monkeypatch):
+    async def scenario():
+        client, _, _ = await webhook_client()
+        try:
+            assert (await client.get("/metrics")).status == 404
+        finally:
+            await client.close()
+
+        monkeypatch.setattr(webhook, "METRICS_TOKEN", "t0ken")
+        monkeypatch.setattr(metrics, "METRICS_TOKEN", "t0ken")
+        client, _, _ = await webhook_client()
+        try:
+            assert (await client.get("/metrics")).status == 401
+            resp = await client.get("/metrics", headers={"Authorization": "Bearer t0ken"})
+            assert resp.status == 200
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
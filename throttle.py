@@ -0,0 +1,203 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, EditMessageReplyMarkup, EditMessageText, TelegramMethod
+from aiogram.types import CallbackQuery
+
+import metrics
+from config import TG_GLOBAL_RATE, TG_CHAT_RATE, TG_GROUP_RATE, TG_CHAT_BURST
+
+
+# === 🚦 Планувальник вихідних викликів Bot API ===
+# Усі запити бота йдуть через middleware сесії: повідомлення й редагування
+# чекають своєї черги в межах лімітів чату та глобального, 429 (retry_after)
+# блокує чат на вказаний час, а кілька редагувань одного повідомлення,
+# що чекають у черзі, зливаються в одне — надсилається лише останнє.
+MAX_RETRIES = 3
+MAX_CHATS = 1000   # скільки лімітів чатів тримати в пам'яті
+
+
+class RateLimit:
+    """GCRA: rate подій за секунду, до burst поспіль; reserve повертає момент відправлення."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self.tat = 0.0              # теоретичний час наступної події
+        self.blocked_until = 0.0    # retry_after від Telegram
+
+    def reserve(self, at: float) -> float:
+        at = max(at, self.tat - self.tolerance, self.blocked_until)
+        self.tat = max(self.tat, at) + self.interval
+        return at
+
+    def block(self, until: float):
+        self.blocked_until = max(self.blocked_until, until)
+
+
+class _PendingEdit:
+    __slots__ = ("method", "future", "sending")
+
+    def __init__(self, method: TelegramMethod):
+        self.method = method
+        self.future = asyncio.get_running_loop().create_future()
+        self.sending = False
+
+
+def _edit_key(method: TelegramMethod) -> tuple | None:
+    if not isinstance(method, (EditMessageText, EditMessageReplyMarkup)):
+        return None
+    if method.inline_message_id:
+        return "inline", method.inline_message_id
+    return method.chat_id, method.message_id
+
+
+def _merge(pending: TelegramMethod, new: TelegramMethod) -> TelegramMethod:
+    # нове редагування лише клавіатури не скасовує текст, що ще не надіслано
+    if isinstance(new, EditMessageReplyMarkup) and isinstance(pending, EditMessageText):
+        return pending.model_copy(update={"reply_markup": new.reply_markup})
+    return new
+
+
+class OutgoingScheduler(BaseRequestMiddleware):
+    def __init__(self, global_rate: float = TG_GLOBAL_RATE, chat_rate: float = TG_CHAT_RATE,
+                 group_rate: float = TG_GROUP_RATE, burst: int = TG_CHAT_BURST):
+        self.global_limit = RateLimit(global_rate, max(1, int(global_rate)))
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.burst = burst
+        self._chats: dict[int | str, RateLimit] = {}
+        self._edits: dict[tuple, _PendingEdit] = {}
+        # callback-запити, на які обробник ще не відповів: id → чат
+        self._callbacks: dict[str, int | None] = {}
+        self._auto_answered: set[str] = set()
+
+    def _chat_limit(self, chat_id: int | str) -> RateLimit:
+        limit = self._chats.get(chat_id)
+        if limit is None:
+            if len(self._chats) >= MAX_CHATS:
+                now = asyncio.get_running_loop().time()
+                self._chats = {k: v for k, v in self._chats.items() if max(v.tat, v.blocked_until) > now}
+            # приватні чати мають додатні id, групи й канали — від'ємні або @username
+            private = isinstance(chat_id, int) and chat_id > 0
+            limit = self._chats[chat_id] = RateLimit(self.chat_rate if private else self.group_rate, self.burst)
+        return limit
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        if isinstance(method, AnswerCallbackQuery):
+            # відповіді на кнопки не чекають у черзі
+            if method.callback_query_id in self._auto_answered:
+                return True
+            self._callbacks.pop(method.callback_query_id, None)
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        key = _edit_key(method)
+        if key is None:
+            if chat_id is None:
+                # getUpdates, answerInlineQuery тощо — без лімітів чату
+                return await make_request(bot, method)
+            return await self._send(make_request, bot, chat_id, lambda: method)
+
+        pending = self._edits.get(key)
+        if pending is not None and not pending.sending:
+            pending.method = _merge(pending.method, method)
+            metrics.tg_coalesced.inc()
+            return await asyncio.shield(pending.future)
+
+        pending = self._edits[key] = _PendingEdit(method)
+        try:
+            result = await self._send(make_request, bot, chat_id, lambda: pending.method, (key, pending))
+        except asyncio.CancelledError:
+            pending.future.cancel()
+            raise
+        except Exception as e:
+            pending.future.set_exception(e)
+            pending.future.exception()  # щоб asyncio не скаржився, якщо злитих викликів не було
+            raise
+        else:
+            pending.future.set_result(result)
+            return result
+        finally:
+            if self._edits.get(key) is pending:
+                del self._edits[key]
+
+    async def _send(self, make_request: NextRequestMiddlewareType, bot: Bot, chat_id,
+                    take: Callable[[], TelegramMethod], edit: tuple[tuple, _PendingEdit] | None = None):
+        loop = asyncio.get_running_loop()
+        chat = self._chat_limit(chat_id) if chat_id is not None else None
+        for attempt in range(MAX_RETRIES + 1):
+            if chat is not None:
+                await self._wait(make_request, bot, chat_id, chat.reserve(loop.time()), chat)
+            # глобальний слот береться лише тоді, коли запит уже може йти: очікування
+            # одного чату (зокрема його flood control) не зсуває ліміт для інших
+            await self._wait(make_request, bot, chat_id, self.global_limit.reserve(loop.time()))
+
+            if edit is not None:
+                edit[1].sending = True
+            try:
+                return await make_request(bot, take())
+            except TelegramRetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                metrics.tg_retry_after.inc()
+                print(f"🚦 Flood control (чат {chat_id}): пауза {e.retry_after} с")
+                (chat or self.global_limit).block(loop.time() + e.retry_after)
+                if edit is not None:
+                    key, pending = edit
+                    newer = self._edits.get(key)
+                    if newer is not None and newer is not pending:
+                        # поки чекали, прийшло новіше редагування — старе вже не потрібне
+                        return await asyncio.shield(newer.future)
+                    pending.sending = False
+
+    async def _wait(self, make_request: NextRequestMiddlewareType, bot: Bot, chat_id, at: float,
+                    chat: RateLimit | None = None):
+        loop = asyncio.get_running_loop()
+        while at > loop.time():
+            # поки запит чекає черги, кнопка в клієнті не повинна «крутитися»
+            await self._answer_waiting(make_request, bot, chat_id)
+            await asyncio.sleep(at - loop.time())
+            if chat is not None:
+                at = max(at, chat.blocked_until)
+
+    async def _answer_waiting(self, make_request: NextRequestMiddlewareType, bot: Bot, chat_id):
+        for query_id in [q for q, c in self._callbacks.items() if c == chat_id]:
+            del self._callbacks[query_id]
+            self._auto_answered.add(query_id)
+            try:
+                await make_request(bot, AnswerCallbackQuery(callback_query_id=query_id))
+            except Exception as e:
+                print(f"⚠️ Не вдалося відповісти на callback {query_id}: {e}")
+
+    # === Облік callback-запитів (див. CallbackAnswerMiddleware) ===
+    def track_callback(self, query: CallbackQuery):
+        self._callbacks[query.id] = query.message.chat.id if query.message else None
+
+    async def release_callback(self, bot: Bot, query_id: str):
+        """Після обробника: відповідаємо за нього, якщо він цього не зробив."""
+        self._auto_answered.discard(query_id)
+        if query_id in self._callbacks:
+            await bot(AnswerCallbackQuery(callback_query_id=query_id))
+
+
+class CallbackAnswerMiddleware(BaseMiddleware):
+    """Кожен callback отримує відповідь: одразу, якщо обробник чекає ліміту чату,
+    і наприкінці, якщо обробник не відповів сам."""
+
+    def __init__(self, scheduler: OutgoingScheduler):
+        self.scheduler = scheduler
+
+    async def __call__(self, handler: Callable[[CallbackQuery, dict[str, Any]], Awaitable[Any]],
+                       event: CallbackQuery, data: dict[str, Any]) -> Any:
+        self.scheduler.track_callback(event)
+        try:
+            return await handler(event, data)
+        finally:
+            try:
+                await self.scheduler.release_callback(data["bot"], event.id)
+            except Exception as e:
+                print(f"⚠️ Не вдалося відповісти на callback {event.id}: {e}")
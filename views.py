@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, NamedTuple
+
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
+
+
+# === 🖼️ Кеш відмальованих екранів ===
+class View(NamedTuple):
+    text: str
+    markup: types.InlineKeyboardMarkup | None = None
+    parse_mode: str | None = None
+
+
+# Область даних, від якої залежить екран: список партій офісу або одна партія.
+# Другий елемент — завжди офіс: так можна скинути всі екрани одного офісу.
+# Ключі екранів теж містять офіс — id партії в чужому офісі дає інший екран.
+def list_scope(tenant_id: int) -> tuple[str, int]:
+    return "batches", tenant_id
+
+
+def batch_scope(tenant_id: int, batch_id: int) -> tuple[str, int, int]:
+    return "batch", tenant_id, batch_id
+
+
+class ViewCache:
+    """LRU-кеш екранів (текст + клавіатура) за ключем «екран + сторінка».
+
+    Кожна область має номер версії; зміна даних піднімає версію й викидає
+    лише записи своєї області. Зміна, що зачіпає багато партій офісу, піднімає
+    версію офісу — решта офісів кеш не втрачає. Версія фіксується до запитів
+    у базу, тож екран, відмальований паралельно зі зміною, у кеш не потрапить.
+    """
+
+    def __init__(self, size: int = 256):
+        self.size = size
+        self._entries: OrderedDict[Hashable, tuple[tuple, tuple[int, int, int], View]] = OrderedDict()
+        self._versions: dict[Hashable, int] = {}
+        self._tenants: dict[int, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _stamp(self, scope: tuple) -> tuple[int, int, int]:
+        return self._epoch, self._tenants.get(scope[1], 0), self._versions.get(scope, 0)
+
+    async def get_or_render(self, key: Hashable, scope: tuple,
+                            render: Callable[[], Awaitable[View | None]]) -> View | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] == self._stamp(scope):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+        self.misses += 1
+        stamp = self._stamp(scope)
+        view = await render()
+        if view is not None and stamp == self._stamp(scope):
+            self._entries[key] = (scope, stamp, view)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return view
+
+    def _bump(self, scope: tuple):
+        self._versions[scope] = self._versions.get(scope, 0) + 1
+        for key in [k for k, (s, _, _) in self._entries.items() if s == scope]:
+            del self._entries[key]
+
+    def invalidate(self, tenant_id: int, batch_id: int | None = None):
+        """Зміна в партії batch_id (або лише у списку партій офісу, якщо None)."""
+        self._bump(list_scope(tenant_id))
+        if batch_id is not None:
+            self._bump(batch_scope(tenant_id, batch_id))
+
+    def invalidate_tenant(self, tenant_id: int):
+        """Зміна в багатьох партіях офісу: скидає список і всі партії лише цього офісу."""
+        self._tenants[tenant_id] = self._tenants.get(tenant_id, 0) + 1
+        for key in [k for k, (s, _, _) in self._entries.items() if s[1] == tenant_id]:
+            del self._entries[key]
+
+    def clear(self):
+        self._epoch += 1
+        self._versions.clear()
+        self._tenants.clear()
+        self._entries.clear()
+
+
+view_cache = ViewCache()
+
+
+def _plain(view: View) -> str:
+    # у старому Markdown бота розмітка — лише *жирний*
+    text = view.text.replace("*", "") if view.parse_mode == "Markdown" else view.text
+    return text.strip()
+
+
+def is_shown(message: types.Message, view: View) -> bool:
+    """Чи повідомлення вже показує саме цей екран."""
+    if message.text is None or message.text.strip() != _plain(view):
+        return False
+    return _markup_dump(message.reply_markup) == _markup_dump(view.markup)
+
+
+def _markup_dump(markup) -> dict | None:
+    # порівнюємо за вмістом: клавіатура з відповіді Telegram — інший екземпляр моделі
+    return markup.model_dump(exclude_none=True) if markup is not None else None
+
+
+async def show_view(callback: types.CallbackQuery, view: View):
+    """edit_text, якщо екран змінився; однаковий екран не редагуємо."""
+    if is_shown(callback.message, view):
+        return
+    try:
+        await callback.message.edit_text(view.text, parse_mode=view.parse_mode, reply_markup=view.markup)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+import metrics
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, MAX_CONCURRENT_UPDATES, METRICS_TOKEN,
+)
+
+
+# === 🌐 Webhook-сервер на aiohttp ===
+# Локально застосунок можна перевірити без Telegram: create_app(dp, bot) і
+# POST оновлення (JSON) на WEBHOOK_PATH із заголовком X-Telegram-Bot-Api-Secret-Token.
+class LimitedRequestHandler(SimpleRequestHandler):
+    """Одразу відповідає Telegram і обробляє оновлення у фоні, не більше limit одночасно.
+
+    Перевизначає лише публічний handle() і далі викликає публічні verify_secret,
+    resolve_bot, feed_raw_update і silent_call_request — приватні методи aiogram
+    (версія закріплена в requirements.txt) не використовуються.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, limit: int, **kwargs):
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self._semaphore = asyncio.Semaphore(limit)
+        self._tasks: set[asyncio.Task] = set()
+        self.in_flight = 0
+        self.processed = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(body="Unauthorized", status=401)
+        update = await request.json(loads=bot.session.json_loads)
+        task = asyncio.create_task(self._feed(bot, update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _feed(self, bot: Bot, update: dict) -> None:
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                result = await self.dispatcher.feed_raw_update(bot=bot, update=update, **self.data)
+                if isinstance(result, TelegramMethod):
+                    await self.dispatcher.silent_call_request(bot=bot, result=result)
+            finally:
+                self.in_flight -= 1
+                self.processed += 1
+
+    @property
+    def queued(self) -> int:
+        return len(self._tasks) - self.in_flight
+
+
+def create_app(dispatcher: Dispatcher, bot: Bot, secret: str | None = WEBHOOK_SECRET,
+               path: str = WEBHOOK_PATH, limit: int = MAX_CONCURRENT_UPDATES) -> web.Application:
+    app = web.Application()
+    handler = LimitedRequestHandler(dispatcher, bot, limit, secret_token=secret)
+    handler.register(app, path=path)
+    started = datetime.now()
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "started": started.isoformat(timespec="seconds"),
+            "in_flight": handler.in_flight,
+            "queued": handler.queued,
+            "processed": handler.processed,
+        })
+
+    app.router.add_get("/healthz", health)
+    # публічний сервер віддає /metrics лише з токеном; інакше — окремий сервер METRICS_HOST:METRICS_PORT
+    if METRICS_TOKEN:
+        app.router.add_get("/metrics", metrics.metrics_handler)
+    app["request_handler"] = handler
+    # startup/shutdown диспетчера прив'язуються до життєвого циклу застосунку
+    setup_application(app, dispatcher, bot=bot)
+    return app
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot):
+    if not WEBHOOK_SECRET:
+        print("⚠️ WEBHOOK_SECRET не задано — запити до вебхука не перевіряються.")
+    app = create_app(dispatcher, bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    print(f"🌐 Вебхук слухає {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+    else:
+        print("⚠️ WEBHOOK_URL не задано — вебхук у Telegram не реєструється (локальний режим).")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()